@@ -0,0 +1,494 @@
+import base64
+import json
+import os.path
+import os
+import socket
+import struct
+import time
+
+
+__all__ = ['Agent', 'AgentClient', 'AgentSocket']
+
+
+# Environment variable with the path of the agent socket (cf. SSH_AUTH_SOCK)
+AGENT_ENV = 'WHISPER_AGENT_SOCK'
+
+# The socket path used when the environment variable is not set
+AGENT_SOCKET = '~/.stellar/agent.sock'
+
+# Timeout (in seconds) for receiving a request from a connected client
+REQUEST_TIMEOUT = 10
+
+# Polling interval (in seconds) of AgentClient.Listen
+LISTEN_INTERVAL = 5
+
+
+def AgentSocket(path = None):
+    '''
+    Return the path of the agent socket.
+
+    Args:
+        path: The requested path, None to use the WHISPER_AGENT_SOCK
+              environment variable or the default path.
+
+    Returns:
+        The absolute path of the socket.
+    '''
+    if path is None:
+        path = os.environ.get(AGENT_ENV, AGENT_SOCKET)
+
+    return os.path.abspath(os.path.expanduser(path))
+
+
+def _message(msg):
+    '''
+    Convert a message to JSON serializable form.
+    '''
+    return [msg[0], msg[1], base64.b64encode(msg[2]).decode()]
+
+
+def _unmessage(msg):
+    '''
+    Convert a message received from the agent back to the original form.
+    '''
+    return [msg[0], msg[1], base64.b64decode(msg[2])]
+
+
+def _receive(conn):
+    '''
+    Receive a newline terminated JSON document.
+
+    Args:
+        conn: The connected socket.
+
+    Returns:
+        The decoded document, None if the connection was closed first.
+    '''
+    data = b''
+    while not data.endswith(b'\n'):
+        chunk = conn.recv(65536)
+        if len(chunk) == 0:
+            return None
+        data += chunk
+
+    return json.loads(data.decode())
+
+
+def _reply(conn, document):
+    '''
+    Send a JSON document terminated by a newline.
+    '''
+    conn.sendall(json.dumps(document, default = str).encode() + b'\n')
+
+
+class Agent:
+    def __init__(self, seed, wallet, store = None, path = None, timeout = 3600):
+        '''
+        Hold an unlocked wallet and serve Whisperer operations to the
+        clients connecting to a unix socket (see AgentClient), so that
+        they neither decrypt the wallet nor load stellar-base themselves.
+        Only the processes of the same user may connect. The requests are
+        served one at a time by a single Whisperer instance.
+
+        Args:
+            seed: The decrypted Stellar secret key.
+            wallet: Path to the wallet file, the clients use the agent only
+                    for this wallet.
+            store: Path to the local store of received messages.
+            path: Path to the socket (see AgentSocket).
+            timeout: Forget the key and stop serving after this many seconds
+                     without requests, 0 to serve until stopped.
+
+        Returns:
+            Instance of the object.
+        '''
+        self.__seed = seed
+        self.__wallet = os.path.realpath(os.path.expanduser(wallet))
+        self.__store = store
+        self.__path = AgentSocket(path)
+        self.__timeout = timeout
+        self.__W = None
+        self.__server = None
+
+
+    def Path(self):
+        '''
+        Return the path of the agent socket.
+
+        Returns:
+            The absolute path of the socket.
+        '''
+        return self.__path
+
+
+    def Bind(self):
+        '''
+        Create the socket, replacing the one of an agent that is no
+        longer running. The socket is accessible to the owner only.
+
+        Returns:
+            True if successful, False if another agent is running.
+        '''
+        if AgentClient(self.__path).Running():
+            print('\nError: an agent is already running on {}!'.format(self.__path))
+            return False
+
+        if os.path.exists(self.__path):
+            os.unlink(self.__path)
+        os.makedirs(os.path.dirname(self.__path), exist_ok = True)
+
+        umask = os.umask(0o177)
+        try:
+            self.__server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.__server.bind(self.__path)
+        finally:
+            os.umask(umask)
+        self.__server.listen(8)
+
+        return True
+
+
+    def Serve(self):
+        '''
+        Serve the requests until stopped or the timeout expires, then
+        forget the key and remove the socket. Bind must be called first.
+
+        Returns:
+            None.
+        '''
+        from stellar_base.keypair import Keypair
+        from whisperer import Whisperer
+        from store import MessageStore
+        from journal import SendJournal
+
+        self.__W = Whisperer(Keypair.from_seed(self.__seed),
+                             MessageStore(self.__store) if self.__store is not None else None,
+                             journal = SendJournal(self.__store) if self.__store is not None else None)
+
+        running = True
+        last = time.monotonic()
+        try:
+            while running:
+                if self.__timeout > 0:
+                    remaining = last + self.__timeout - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.__server.settimeout(remaining)
+
+                try:
+                    conn, _ = self.__server.accept()
+                except socket.timeout:
+                    continue
+
+                with conn:
+                    if not Agent.__trusted(conn):
+                        continue
+                    conn.settimeout(REQUEST_TIMEOUT)
+                    try:
+                        request = _receive(conn)
+                        if request is None:
+                            continue
+                        conn.settimeout(None)
+                        running = request.get('op') != 'stop'
+                        _reply(conn, self.__handle(request))
+                    except (OSError, ValueError):
+                        continue
+
+                last = time.monotonic()
+        finally:
+            self.__W.Forget()
+            self.__W = None
+            self.__seed = None
+            self.__server.close()
+            if os.path.exists(self.__path):
+                os.unlink(self.__path)
+
+
+    @classmethod
+    def __trusted(cls, conn):
+        '''
+        Check that the client runs under the same user as the agent. The
+        check relies on the socket permissions where the peer credentials
+        are not available.
+
+        Args:
+            conn: The connected socket.
+
+        Returns:
+            True if the client may use the agent, False otherwise.
+        '''
+        if not hasattr(socket, 'SO_PEERCRED'):
+            return True
+
+        creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+        _, uid, _ = struct.unpack('3i', creds)
+        return uid == os.getuid()
+
+
+    def __handle(self, request):
+        '''
+        Perform the requested operation.
+
+        Args:
+            request: The request as dictionary with the key 'op' and the
+                     arguments of the operation.
+
+        Returns:
+            The response as dictionary with the key 'result', or 'error'
+            if the operation failed.
+        '''
+        op = request.get('op')
+        W = self.__W
+        try:
+            if op == 'address':
+                result = {'address': W.Address(), 'wallet': self.__wallet}
+            elif op == 'validate':
+                result = W.ValidateAddress(request.get('address'))
+            elif op == 'read':
+                result = [_message(m) for m in W.Read(address = request.get('address'), tail = request.get('tail'),
+                                                       printable = request.get('printable'))]
+            elif op == 'fetch':
+                result = [_message(m) for m in W.Fetch(printable = request.get('printable'))]
+            elif op == 'send':
+                result = W.Send(request.get('address'), base64.b64decode(request.get('msg')), request.get('encoding'))
+            elif op == 'sendmany':
+                result = W.SendMany(request.get('addresses'), base64.b64decode(request.get('msg')),
+                                    request.get('encoding'))
+            elif op == 'resume':
+                result = W.Resume()
+            elif op == 'stop':
+                result = True
+            else:
+                return {'error': 'unknown operation {}'.format(op)}
+        except Exception as e:
+            return {'error': str(e)}
+
+        return {'result': result}
+
+
+class AgentClient:
+    def __init__(self, path = None):
+        '''
+        Client of a running Agent, providing the subset of the Whisperer
+        interface used by whisper.py. Each call is a single request over
+        a new connection to the agent socket.
+
+        Args:
+            path: Path to the socket (see AgentSocket).
+
+        Returns:
+            Instance of the object.
+        '''
+        self.__path = AgentSocket(path)
+        self.__address = None
+
+
+    @classmethod
+    def Connect(cls, wallet, path = None):
+        '''
+        Connect to the agent holding the given wallet.
+
+        Args:
+            wallet: Path to the wallet file.
+            path: Path to the socket (see AgentSocket).
+
+        Returns:
+            The AgentClient instance, or None if no agent holding the
+            wallet is running.
+        '''
+        client = AgentClient(path)
+        if not os.path.exists(client.__path):
+            return None
+
+        try:
+            response = client.__request({'op': 'address'})
+        except (OSError, ValueError):
+            return None
+        if response is None or response.get('result', {}).get('wallet') != os.path.realpath(os.path.expanduser(wallet)):
+            return None
+
+        client.__address = response['result']['address']
+        return client
+
+
+    def __request(self, request):
+        '''
+        Send the request to the agent and wait for the response.
+
+        Args:
+            request: The request as dictionary (see Agent).
+
+        Returns:
+            The response as dictionary, None if the agent closed the
+            connection without a response.
+        '''
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.connect(self.__path)
+            _reply(conn, request)
+            return _receive(conn)
+
+
+    def __call(self, op, default, **args):
+        '''
+        Perform the operation on the agent, reporting the errors.
+
+        Args:
+            op: The name of the operation.
+            default: The value returned if the operation failed.
+            args: The arguments of the operation.
+
+        Returns:
+            The result of the operation.
+        '''
+        args['op'] = op
+        try:
+            response = self.__request(args)
+        except (OSError, ValueError) as e:
+            response = {'error': str(e)}
+        if response is None:
+            response = {'error': 'no response'}
+
+        if 'error' in response:
+            print('\nError: the agent failed to {} ({})!'.format(op, response['error']))
+            return default
+
+        return response['result']
+
+
+    def Running(self):
+        '''
+        Tell if an agent is serving on the socket.
+
+        Returns:
+            True if the agent responds, False otherwise.
+        '''
+        try:
+            return self.__request({'op': 'address'}) is not None
+        except (OSError, ValueError):
+            return False
+
+
+    def Stop(self):
+        '''
+        Ask the agent to forget the key and exit.
+
+        Returns:
+            True if successful, False otherwise.
+        '''
+        return self.__call('stop', False)
+
+
+    def Address(self):
+        '''
+        Return the Stellar address of the account held by the agent.
+
+        Returns:
+            The public address starting with letter 'G'.
+        '''
+        return self.__address
+
+
+    def ValidateAddress(self, address):
+        '''
+        Check the Stellar address (see Whisperer.ValidateAddress).
+
+        Args:
+            address: The Stellar address.
+
+        Returns:
+            True if the address is valid, False otherwise.
+        '''
+        return self.__call('validate', False, address = address)
+
+
+    def Read(self, address = None, tail = 1, printable = False):
+        '''
+        Read the last `tail` received messages (see Whisperer.Read).
+
+        Args:
+            address: This is the public Stellar address of the sender.
+            tail: Read n = `tail` last messages.
+            printable: Convert raw messages to printable characters.
+
+        Returns:
+            The secret messages as [date, sender, message] lists,
+            starting with the most recent.
+        '''
+        return [_unmessage(m) for m in self.__call('read', [], address = address, tail = tail, printable = printable)]
+
+
+    def Fetch(self, printable = False):
+        '''
+        Fetch the messages received since the previous call (see
+        Whisperer.Fetch).
+
+        Args:
+            printable: Convert raw messages to printable characters.
+
+        Returns:
+            The new secret messages as [date, sender, message] lists,
+            in chronological order.
+        '''
+        return [_unmessage(m) for m in self.__call('fetch', [], printable = printable)]
+
+
+    def Listen(self, printable = False):
+        '''
+        Listen for new messages by polling the agent (see Fetch), leaving
+        the agent free to serve other clients in between.
+
+        Args:
+            printable: Convert raw messages to printable characters.
+
+        Returns:
+            Generator of the new secret messages as [date, sender, message]
+            lists, in chronological order.
+        '''
+        while True:
+            for message in self.Fetch(printable):
+                yield message
+            time.sleep(LISTEN_INTERVAL)
+
+
+    def Send(self, address, msg, encoding = None):
+        '''
+        Send the message (see Whisperer.Send).
+
+        Args:
+            address: This is the public Stellar address of your receiver.
+            msg: The message (byte array) that you want to transmit.
+            encoding: The encoding to use for the message, None to select
+                      the one producing the fewest fragments.
+
+        Returns:
+            List with the sending status of each message fragment.
+        '''
+        return self.__call('send', [], address = address, msg = base64.b64encode(msg).decode(), encoding = encoding)
+
+
+    def SendMany(self, addresses, msg, encoding = None):
+        '''
+        Send the message to many addresses (see Whisperer.SendMany).
+
+        Args:
+            addresses: The public Stellar addresses of the receivers.
+            msg: The message (byte array) that you want to transmit.
+            encoding: The encoding to use for the message, None to select
+                      the one producing the fewest fragments.
+
+        Returns:
+            Dictionary with the sending status of the message fragments
+            for each address.
+        '''
+        return self.__call('sendmany', {address: [] for address in addresses}, addresses = addresses,
+                           msg = base64.b64encode(msg).decode(), encoding = encoding)
+
+
+    def Resume(self):
+        '''
+        Complete the interrupted messages (see Whisperer.Resume).
+
+        Returns:
+            List of [recipient, status] lists, one for each resumed message.
+        '''
+        return self.__call('resume', [])
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import aiohttp
+from stellar_base.horizon import HORIZON_TEST, check_horizon_reply
+from stellar_base.exceptions import HorizonError, HorizonRequestError
+
+
+__all__ = ['AsyncHorizon']
+
+
+class AsyncHorizon:
+    def __init__(self, horizon = HORIZON_TEST, connections = 100, timeout = 20):
+        '''
+        Asynchronous client for the subset of the Horizon API used by
+        Whisperer. All requests share a pool of keep-alive connections,
+        so one client can serve many Whisperer instances concurrently.
+        The responses are the decoded JSON documents, and the errors are
+        raised, as by the blocking stellar_base Horizon client.
+
+        Args:
+            horizon: The Horizon base URL, e.g. the URL of a local fake
+                     Horizon server for testing.
+            connections: The maximum number of pooled connections.
+            timeout: The timeout for all requests in seconds.
+
+        Returns:
+            Instance of the object.
+        '''
+        self.horizon = horizon.rstrip('/')
+        self.__connections = connections
+        self.__timeout = timeout
+        self.__session = None
+
+
+    def __client(self):
+        '''
+        Return the HTTP session, creating it on first use so that
+        it is bound to the running event loop.
+
+        Returns:
+            The aiohttp client session.
+        '''
+        if self.__session is None or self.__session.closed:
+            connector = aiohttp.TCPConnector(limit = self.__connections, keepalive_timeout = 60)
+            self.__session = aiohttp.ClientSession(connector = connector,
+                                                   timeout = aiohttp.ClientTimeout(total = self.__timeout))
+        return self.__session
+
+
+    async def __request(self, verb, endpoint, **kwargs):
+        '''
+        Perform a request and decode the JSON response. As with the blocking
+        client, an error reply raises HorizonError, with the status code and
+        the reply in the message, and a failed connection raises
+        HorizonRequestError.
+
+        Args:
+            verb: The HTTP method.
+            endpoint: The API endpoint, relative to the base URL.
+            kwargs: Further arguments of the aiohttp request.
+
+        Returns:
+            The decoded JSON response as dictionary.
+        '''
+        try:
+            async with self.__client().request(verb, self.horizon + endpoint, **kwargs) as resp:
+                text = await resp.text()
+                status = resp.status
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise HorizonRequestError(e)
+
+        try:
+            reply = json.loads(text)
+        except ValueError:
+            raise HorizonError('Invalid horizon reply: [{}] {}'.format(status, text), status)
+
+        return check_horizon_reply(reply)
+
+
+    async def account(self, address):
+        '''
+        Returns the details of a single account.
+
+        Args:
+            address: The Stellar address of the account.
+
+        Returns:
+            The account details as dictionary.
+        '''
+        return await self.__request('GET', '/accounts/{}'.format(address))
+
+
+    async def account_transactions(self, address, cursor = None, order = 'asc', limit = 10):
+        '''
+        Returns a page of transactions that affected the account.
+
+        Args:
+            address: The Stellar address of the account.
+            cursor: The paging token to start after.
+            order: Either 'asc' or 'desc'.
+            limit: The maximum number of records.
+
+        Returns:
+            The page of transactions as dictionary.
+        '''
+        params = {'order': order, 'limit': str(limit)}
+        if cursor is not None:
+            params['cursor'] = str(cursor)
+        return await self.__request('GET', '/accounts/{}/transactions'.format(address), params = params)
+
+
+    async def query(self, rel_url, params = None):
+        '''
+        Returns the response of an arbitrary endpoint, e.g. of a listing
+        with query parameters not covered by the methods above.
+
+        Args:
+            rel_url: The API endpoint, relative to the base URL.
+            params: The query parameters as dictionary.
+
+        Returns:
+            The response as dictionary.
+        '''
+        params = {k: str(v) for k, v in (params or {}).items()}
+        return await self.__request('GET', rel_url, params = params)
+
+
+    async def submit(self, te):
+        '''
+        Submit a transaction to the network.
+
+        Args:
+            te: The signed transaction envelope in XDR.
+
+        Returns:
+            The submission result as dictionary.
+        '''
+        if isinstance(te, bytes):
+            te = te.decode()
+        return await self.__request('POST', '/transactions', data = {'tx': te})
+
+
+    async def Close(self):
+        '''
+        Close all pooled connections.
+        '''
+        if self.__session is not None:
+            await self.__session.close()
+            self.__session = None
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, *args):
+        await self.Close()
@@ -0,0 +1,576 @@
+#!/usr/bin/python3
+
+'''
+Usage:
+  benchmark.py crypto [-n N]
+  benchmark.py codecs [-m M]
+  benchmark.py smaz [-m M]
+  benchmark.py startup [-k K]
+  benchmark.py pipeline [-p P] [-o FILE] [--ahead N]
+  benchmark.py load [-a A] [-m M]
+  benchmark.py scan [-m M] [-w W]
+  benchmark.py -h | --help
+
+Options:
+  -n N          Number of message blocks (memos) to process [default: 10000].
+  -m M          Number of messages to process [default: 10000].
+  -k K          Number of interpreter starts per command line path [default: 5].
+  -a A          Number of accounts [default: 1000].
+  -p P          Number of messages per message size and encoding [default: 50].
+  -w W          Largest number of decrypting threads [default: 8].
+  -o FILE       File collecting the pipeline results of the successive runs
+                [default: benchmark.jsonl].
+  --ahead N     How far ahead of the account sequence number the simulated
+                ledger holds the pipelined transactions, 0 to reject them
+                right away (the pipeline depth if not given).
+  -h --help     Show this screen.
+'''
+from docopt import docopt
+from Crypto.Cipher import AES
+from datetime import datetime
+import subprocess
+import statistics
+import json
+import sys
+import os
+import random
+import time
+
+from cipher import BuildIVs, EncryptBlocks, DecryptBlocks
+from charsets import *
+from smaz import *
+
+
+def Measure(f, *args):
+    '''
+    Measure the execution time of a function call.
+
+    Args:
+        f: The function to call.
+        args: The function arguments.
+
+    Returns:
+        The tuple (result, elapsed time in seconds).
+    '''
+    start = time.perf_counter()
+    res = f(*args)
+    return res, time.perf_counter() - start
+
+
+def Report(name, n, elapsed, unit = 'blocks', note = ''):
+    '''
+    Print the throughput of a benchmarked operation.
+
+    Args:
+        name: Name of the benchmarked operation.
+        n: Number of processed items.
+        elapsed: The elapsed time in seconds.
+        unit: The name of the processed items.
+        note: Text appended to the line.
+
+    Returns:
+        None.
+    '''
+    print(' - {:<32} {:>12.2f} {}/s   ({:.3f} s){}'.format(name, n / elapsed, unit, elapsed, note))
+
+
+def BenchCrypto(n):
+    '''
+    Compare the per-block AES-CBC loop with the batched block encryption
+    and decryption for n random 32 byte memos sharing the same key.
+
+    Args:
+        n: Number of blocks.
+
+    Returns:
+        None.
+    '''
+    k = os.urandom(32)
+    pk = os.urandom(32)
+    blocks = [os.urandom(32) for i in range(0, n)]
+    sequences = range(1000, 1000 + n)
+
+    def loopEncrypt():
+        encrypted = []
+        for i in range(0, n):
+            iv = (int.from_bytes(pk[0:16], 'big') + sequences[i]).to_bytes(17, 'big')[-16:]
+            encrypted += [AES.new(k, AES.MODE_CBC, iv).encrypt(blocks[i])]
+        return encrypted
+
+    def loopDecrypt(encrypted):
+        decrypted = []
+        for i in range(0, n):
+            iv = (int.from_bytes(pk[0:16], 'big') + sequences[i]).to_bytes(17, 'big')[-16:]
+            decrypted += [AES.new(k, AES.MODE_CBC, iv).decrypt(encrypted[i])]
+        return decrypted
+
+    def batchEncrypt():
+        return EncryptBlocks(blocks, k, BuildIVs(pk, sequences))
+
+    def batchDecrypt(encrypted):
+        return DecryptBlocks(encrypted, k, BuildIVs(pk, sequences))
+
+    print('\nAES-CBC block encryption, {} blocks'.format(n))
+    e1, t = Measure(loopEncrypt)
+    Report('per-block encrypt', n, t)
+    e2, t = Measure(batchEncrypt)
+    Report('batched encrypt', n, t)
+    assert e1 == e2
+
+    d1, t = Measure(loopDecrypt, e1)
+    Report('per-block decrypt', n, t)
+    d2, t = Measure(batchDecrypt, e1)
+    Report('batched decrypt', n, t)
+    assert d1 == d2 == blocks
+
+
+def Corpus(n, seed = 1):
+    '''
+    Generate a corpus of short text messages of random length.
+
+    Args:
+        n: Number of messages.
+        seed: Seed of the random generator.
+
+    Returns:
+        List of the messages as UTF-8 encoded byte arrays.
+    '''
+    words = ('the meeting is moved to tomorrow at noon, please confirm. '
+             'payment sent for invoice 42 - thanks! see you at the usual place? '
+             'ok call me when you are back home. where are the keys').split()
+    rnd = random.Random(seed)
+    return [' '.join(rnd.choice(words) for i in range(0, rnd.randint(2, 30))).encode('utf-8') for i in range(0, n)]
+
+
+def BenchCodecs(n):
+    '''
+    Compare the bit string based GSM 03.38 and Sixbit codecs with the
+    table-driven ones on a corpus of n messages.
+
+    Args:
+        n: Number of messages.
+
+    Returns:
+        None.
+    '''
+    from bitstring import BitArray, BitStream
+
+    gsm = ("@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞ\x1bÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+           "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ`¿abcdefghijklmnopqrstuvwxyzäöñüà")
+    sixbit = "@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\\]^_ !\"#$%&'()*+,-./0123456789:;<=>?"
+
+    def bitsEncode(txt, alphabet, width):
+        res = ''
+        for c in txt:
+            idx = alphabet.find(c)
+            res += '{:0{}b}'.format(idx if idx != -1 else 32, width)
+        if len(res) % 8 > 0:
+            res += '0' * (8 - len(res) % 8)
+        return BitArray('0b' + res).bytes
+
+    def bitsDecode(enc, alphabet, width):
+        bits = BitStream(enc)
+        return ''.join(alphabet[idx] for idx in bits.readlist('{}*uint:{}'.format(len(bits) // width, width)))
+
+    msgs = Corpus(n)
+    size = sum(len(m) for m in msgs) / 1e6
+
+    for name, alphabet, width, upper, encode, decode, encodeMany, decodeMany in [
+            ('GSM 03.38', gsm, 7, False, EncodeGSM, DecodeGSM, EncodeGSMMany, DecodeGSMMany),
+            ('Sixbit', sixbit, 6, True, EncodeSixbit, DecodeSixbit, EncodeSixbitMany, DecodeSixbitMany)]:
+
+        txts = [m.decode('utf-8').upper() if upper else m.decode('utf-8') for m in msgs]
+
+        print('\n{} codec, {} messages, {:.2f} MB'.format(name, n, size))
+        e1, t = Measure(lambda: [bitsEncode(m, alphabet, width) for m in txts])
+        Report('bit string encode', size, t, 'MB')
+        e2, t = Measure(lambda: [encode(m) for m in msgs])
+        Report('table-driven encode', size, t, 'MB')
+        e3, t = Measure(encodeMany, msgs)
+        Report('table-driven bulk encode', size, t, 'MB')
+        assert e1 == e2 == e3
+
+        d1, t = Measure(lambda: [bitsDecode(e, alphabet, width) for e in e1])
+        Report('bit string decode', size, t, 'MB')
+        d2, t = Measure(lambda: [decode(e) for e in e1])
+        Report('table-driven decode', size, t, 'MB')
+        d3, t = Measure(decodeMany, e1)
+        Report('table-driven bulk decode', size, t, 'MB')
+        assert d2 == d3 == [m.encode('utf-8') for m in txts]
+
+
+def Fragments(msgs):
+    '''
+    Count the 31 byte fragments needed to send the messages.
+
+    Args:
+        msgs: The encoded messages as byte arrays.
+
+    Returns:
+        The total number of fragments.
+    '''
+    return sum(max(1, (len(m) + 30) // 31) for m in msgs)
+
+
+def BenchSmaz(n):
+    '''
+    Compare the str based smaz compression (pySmaz with the UTF-8 round
+    trip) with the bytes-level implementation and the compression with
+    the trained codebook on a corpus of n messages.
+
+    Args:
+        n: Number of messages.
+
+    Returns:
+        None.
+    '''
+    import lib.smaz
+
+    def legacyCompress(txt):
+        return lib.smaz.compress(txt.decode('ascii', errors = 'ignore')).encode('utf-8')
+
+    def legacyDecompress(comp):
+        return lib.smaz.decompress(comp.decode('utf-8')).encode('utf-8')
+
+    msgs = Corpus(n)
+    size = sum(len(m) for m in msgs)
+
+    print('\nSmaz compression, {} messages, {:.2f} MB, {} fragments uncompressed'.format(n, size / 1e6,
+                                                                                         Fragments(msgs)))
+    for name, compress, decompress in [('str round trip', legacyCompress, legacyDecompress),
+                                       ('bytes-level', Compress, Decompress),
+                                       ('trained codebook', CompressTrained, DecompressTrained)]:
+        comp, t = Measure(lambda: [compress(m) for m in msgs])
+        Report(name + ' compress', size / 1e6, t, 'MB')
+        dec, t = Measure(lambda: [decompress(c) for c in comp])
+        Report(name + ' decompress', size / 1e6, t, 'MB')
+        assert dec == msgs
+        print('   ratio {:.3f}, {} fragments'.format(sum(len(c) for c in comp) / size, Fragments(comp)))
+
+
+# The modules imported by the whisper.py command line paths. The -r and -s
+# paths stop short of the password prompt and the network access, i.e. they
+# import what the path needs and create the Horizon client.
+STARTUP_PATHS = [
+    ('whisper.py -h', ['whisper.py', '-h']),
+    ('whisper.py -r', ['-c', 'import docopt, getpass, textwrap, wallet; '
+                             'from stellar_base.keypair import Keypair; '
+                             'from store import MessageStore; '
+                             'import whisperer; whisperer.DefaultHorizon()']),
+    ('whisper.py -s', ['-c', 'import docopt, getpass, textwrap, wallet; '
+                             'from stellar_base.keypair import Keypair; '
+                             'from store import MessageStore; '
+                             'import whisperer; whisperer.DefaultHorizon(); '
+                             'whisperer.Whisperer.SelectEncoding(b"hello"); '
+                             'import stellar_base.builder']),
+]
+
+
+def ImportTime(args):
+    '''
+    Run a fresh interpreter with -X importtime and collect the import times.
+
+    Args:
+        args: The interpreter arguments, i.e. a script or -c and a command.
+
+    Returns:
+        The tuple (wall time in seconds, total import time in seconds,
+        {top-level module: cumulative import time in seconds}), None if
+        the interpreter failed.
+    '''
+    start = time.perf_counter()
+    res = subprocess.run([sys.executable, '-X', 'importtime'] + args, stdout = subprocess.DEVNULL,
+                         stderr = subprocess.PIPE, universal_newlines = True)
+    wall = time.perf_counter() - start
+    if res.returncode != 0:
+        print('\nError: {} failed!\n{}'.format(' '.join(args), res.stderr.strip().splitlines()[-1]))
+        return None
+
+    total, modules = 0, {}
+    for line in res.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        total += int(own)
+        # nested imports are indented below the module importing them
+        if name[1:3] != '  ':
+            modules[name.strip()] = int(cumulative) / 1e6
+
+    return wall, total / 1e6, modules
+
+
+def BenchStartup(k):
+    '''
+    Measure the start-up time of the whisper.py command line paths,
+    reporting the median of k interpreter starts and the slowest
+    top-level imports.
+
+    Args:
+        k: Number of interpreter starts per path.
+
+    Returns:
+        None.
+    '''
+    print('\nStart-up time, median of {} interpreter starts'.format(k))
+    for name, args in STARTUP_PATHS:
+        runs = [ImportTime(args)]
+        if runs[0] is None:
+            continue
+        runs += [ImportTime(args) for i in range(1, k)]
+        wall = statistics.median(r[0] for r in runs)
+        total = statistics.median(r[1] for r in runs)
+        print(' - {:<32} {:>12.3f} s wall   ({:.3f} s importing)'.format(name, wall, total))
+        slowest = sorted(runs[-1][2].items(), key = lambda m: -m[1])[0:5]
+        print('   ' + ', '.join('{} {:.3f} s'.format(m, t) for m, t in slowest))
+
+
+# The pipeline stages reported by BenchPipeline (see metrics.DESCRIPTIONS)
+PIPELINE_STAGES = ['encode', 'encapsulate', 'dh', 'encrypt', 'sign', 'account', 'submit',
+                   'fetch', 'decrypt', 'reassemble', 'store', 'decode']
+
+# The message sizes (in bytes) and the encodings benchmarked by BenchPipeline
+PIPELINE_SIZES = [16, 64, 256, 1024]
+PIPELINE_ENCODINGS = [None, 0, 1, 2, 3, 4]
+
+
+def Messages(n, size, seed = 1):
+    '''
+    Generate n text messages of the given size from the corpus.
+
+    Args:
+        n: Number of messages.
+        size: The message size in bytes.
+        seed: Seed of the random generator.
+
+    Returns:
+        List of the messages as UTF-8 encoded byte arrays.
+    '''
+    text = b' '.join(Corpus(max(n, 1) * (size // 60 + 2), seed))
+    rnd = random.Random(seed)
+    starts = [rnd.randrange(0, len(text) - size) for i in range(0, n)]
+    return [text[i:i + size] for i in starts]
+
+
+def Revision():
+    '''
+    Return the git revision of the working tree.
+
+    Returns:
+        The abbreviated commit hash, followed by '+' if the tree has
+        uncommitted changes, or None outside a git repository.
+    '''
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd = here, stdout = subprocess.PIPE,
+                                stderr = subprocess.DEVNULL, universal_newlines = True, check = True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd = here,
+                               stdout = subprocess.PIPE, universal_newlines = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return commit + ('+' if dirty else '')
+
+
+def Keypairs(n, seed = 1):
+    '''
+    Generate n deterministic Stellar keypairs.
+
+    Args:
+        n: Number of keypairs.
+        seed: Seed of the random generator.
+
+    Returns:
+        List of the keypairs.
+    '''
+    from stellar_base.keypair import Keypair
+
+    rnd = random.Random(seed)
+    return [Keypair.from_raw_seed(bytes(rnd.getrandbits(8) for j in range(0, 32))) for i in range(0, n)]
+
+
+def BenchPipeline(p, name, ahead = None):
+    '''
+    Send and read messages end-to-end through the simulated ledger
+    for each message size and encoding, reporting the messages per second
+    of Send and Read, the fragments per message and the time spent per
+    message in each pipeline stage. The results are appended to the given
+    file and compared with the previous run stored there with the same
+    ledger configuration.
+
+    Args:
+        p: Number of messages per message size and encoding.
+        name: The file collecting the results, None to not store them.
+        ahead: How far ahead of its account sequence number the ledger
+               holds a transaction (see ledger.Ledger), None for the
+               pipeline depth.
+
+    Returns:
+        None.
+    '''
+    from encoders import GetEncoding
+    from ledger import Ledger
+    from metrics import Metrics
+    import whisperer
+
+    if ahead is None:
+        ahead = whisperer.PIPELINE_DEPTH
+
+    previous = {}
+    if name is not None and os.path.isfile(name):
+        with open(name) as f:
+            runs = [json.loads(l) for l in f if l.strip() != '']
+        runs = [r for r in runs if r.get('ahead', whisperer.PIPELINE_DEPTH) == ahead]
+        if len(runs) > 0:
+            previous = runs[-1]
+
+    def change(key, field, value):
+        old = previous.get('results', {}).get(key, {}).get(field)
+        return '' if old is None or old == 0 else '   {:+.1f}% vs {}'.format(100 * (value / old - 1),
+                                                                            previous.get('revision'))
+
+    print('\nSend and Read through the simulated ledger holding {} transactions ahead, {} messages per size and encoding'
+          .format(ahead, p))
+    results = {}
+    for size in PIPELINE_SIZES:
+        msgs = Messages(p, size)
+        for enc in PIPELINE_ENCODINGS:
+            key = '{} B, encoding {}'.format(size, 'auto' if enc is None else enc)
+            # hold the pipelined submissions that overtook their predecessor
+            horizon = Ledger(ahead = ahead)
+            kpA, B = Keypairs(2, size)
+            for kp in (kpA, B):
+                horizon.Fund(kp.address().decode())
+            metrics = Metrics()
+            A = whisperer.Whisperer(kpA, horizon = horizon, metrics = metrics)
+
+            status, send = Measure(lambda: [A.Send(B.address().decode(), m, enc) for m in msgs])
+            assert all(len(s) > 0 and all(f['success'] for f in s) for s in status)
+            received, read = Measure(whisperer.Whisperer(B, horizon = horizon, metrics = metrics).Read, None, p)
+            expected = [GetEncoding(s[0]['encoding']).Decode(GetEncoding(s[0]['encoding']).Encode(m))
+                        for s, m in zip(status, msgs)]
+            assert [m[2] for m in received[::-1]] == expected
+
+            fragments = sum(len(s) for s in status) / p
+            histograms = metrics.Snapshot()['histograms']
+            results[key] = {'send': p / send, 'read': p / read, 'fragments': fragments,
+                            'retries': horizon.Rejected(),
+                            'stages': {k: 1e6 * histograms[k + '_seconds']['sum'] / p for k in PIPELINE_STAGES
+                                       if k + '_seconds' in histograms}}
+
+            print('\n{}, {:.2f} fragments/message, {} resubmissions'.format(key, fragments, horizon.Rejected()))
+            Report('Send', p, send, 'msgs', change(key, 'send', results[key]['send']))
+            Report('Read', p, read, 'msgs', change(key, 'read', results[key]['read']))
+            print('   ' + ', '.join('{} {:.0f} us'.format(k, t) for k, t in results[key]['stages'].items()))
+
+    if name is not None:
+        with open(name, 'a') as f:
+            f.write(json.dumps({'revision': Revision(), 'date': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+                                'python': sys.version.split()[0], 'messages': p, 'ahead': ahead,
+                                'results': results}) + '\n')
+        print('\nResults appended to {}'.format(name))
+
+
+def BenchLoad(a, m):
+    '''
+    Load test with many accounts on the simulated ledger: m messages are
+    sent between random pairs of a accounts, then every account reads
+    its inbox.
+
+    Args:
+        a: Number of accounts.
+        m: Number of messages.
+
+    Returns:
+        None.
+    '''
+    from ledger import Ledger
+    import whisperer
+
+    horizon = Ledger(capacity = 1000, ahead = whisperer.PIPELINE_DEPTH)
+    W = [whisperer.Whisperer(kp, horizon = horizon) for kp in Keypairs(a)]
+    for w in W:
+        horizon.Fund(w.Address())
+
+    rnd = random.Random(1)
+    pairs = [rnd.sample(range(0, a), 2) for i in range(0, m)]
+    msgs = Corpus(m)
+
+    print('\nLoad test, {} accounts, {} messages'.format(a, m))
+    status, t = Measure(lambda: [W[i].Send(W[j].Address(), msg) for (i, j), msg in zip(pairs, msgs)])
+    Report('Send', m, t, 'msgs')
+    assert all(len(s) > 0 and all(f['success'] for f in s) for s in status)
+    print('   {} transactions in {} ledgers, {} resubmissions'.format(horizon.Transactions(), horizon.Close() - 1,
+                                                                      horizon.Rejected()))
+
+    received, t = Measure(lambda: [w.Read(tail = m) for w in W])
+    Report('Read', m, t, 'msgs')
+    assert sum(len(r) for r in received) == m
+
+
+def BenchScan(m, w):
+    '''
+    Rebuild an inbox of m messages from 20 senders on the simulated
+    ledger, page by page as Read does and with Whisperer.Scan using
+    1, 2, 4, ... up to w decrypting threads.
+
+    Args:
+        m: Number of messages.
+        w: Largest number of threads.
+
+    Returns:
+        None.
+    '''
+    from ledger import Ledger
+    from store import MessageStore
+    import whisperer
+
+    horizon = Ledger(capacity = 1000, ahead = whisperer.PIPELINE_DEPTH)
+    kps = Keypairs(21)
+    W = [whisperer.Whisperer(kp, horizon = horizon) for kp in kps]
+    for whisper in W:
+        horizon.Fund(whisper.Address())
+
+    rnd = random.Random(1)
+    senders = [rnd.randrange(1, len(W)) for i in range(0, m)]
+    print('\nHistory scan, {} messages from {} senders'.format(m, len(W) - 1))
+    status = [W[i].Send(W[0].Address(), msg) for i, msg in zip(senders, Corpus(m))]
+    assert all(len(s) > 0 and all(f['success'] for f in s) for s in status)
+
+    received, t = Measure(lambda: whisperer.Whisperer(kps[0], MessageStore(), horizon).Read(tail = None))
+    Report('Read', len(received), t, 'msgs')
+    assert len(received) == m
+
+    n = 1
+    while n <= w:
+        stats = whisperer.Whisperer(kps[0], MessageStore(), horizon).Scan(n)
+        Report('Scan, {} threads'.format(n), stats['messages'], stats['seconds'], 'msgs',
+               '   {:.0f} transactions/s'.format(stats['transactions_per_second']))
+        assert stats['messages'] == m
+        n *= 2
+
+
+if __name__ == '__main__':
+
+    arguments = docopt(__doc__)
+
+    if arguments.get('crypto'):
+        BenchCrypto(int(arguments.get('-n')))
+
+    if arguments.get('codecs'):
+        BenchCodecs(int(arguments.get('-m')))
+
+    if arguments.get('smaz'):
+        BenchSmaz(int(arguments.get('-m')))
+
+    if arguments.get('startup'):
+        BenchStartup(int(arguments.get('-k')))
+
+    if arguments.get('pipeline'):
+        ahead = arguments.get('--ahead')
+        BenchPipeline(int(arguments.get('-p')), arguments.get('-o'), None if ahead is None else int(ahead))
+
+    if arguments.get('load'):
+        BenchLoad(int(arguments.get('-a')), int(arguments.get('-m')))
+
+    if arguments.get('scan'):
+        BenchScan(int(arguments.get('-m')), int(arguments.get('-w')))
@@ -0,0 +1,300 @@
+__all__ = ['EncodeGSM', 'DecodeGSM', 'EncodeSixbit', 'DecodeSixbit',
+           'EncodeGSMMany', 'DecodeGSMMany', 'EncodeSixbitMany', 'DecodeSixbitMany']
+
+
+# lookup constant strings for the encodings
+__gsm = ("@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞ\x1bÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+         "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ`¿abcdefghijklmnopqrstuvwxyzäöñüà")
+__sixbit = "@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\\]^_ !\"#$%&'()*+,-./0123456789:;<=>?"
+
+
+class _Table(dict):
+    '''
+    Character translation table mapping the unsupported characters to the
+    blank space, for use with str.translate.
+    '''
+    def __missing__(self, key):
+        return ' '
+
+
+# lookup tables between the characters and their indices, the
+# indices are represented by the characters with the same code
+__gsmEncode = _Table({ord(c): chr(i) for i, c in enumerate(__gsm)})
+__gsmDecode = str.maketrans({chr(i): c for i, c in enumerate(__gsm)})
+__sixbitEncode = _Table({ord(c): chr(i) for i, c in enumerate(__sixbit)})
+__sixbitDecode = str.maketrans({chr(i): c for i, c in enumerate(__sixbit)})
+
+# number of characters packed into whole bytes, for 7 and 6 bit characters
+__group = {7: 8, 6: 4}
+
+
+def __masks(bits, offset, lanes, groups):
+    '''
+    Build the masks selecting the two halves of the bits held in each lane.
+
+    Args:
+        bits: The number of bits in each half.
+        offset: The position of the upper half in the lane.
+        lanes: The width of the lanes in bytes.
+        groups: The number of lanes.
+
+    Returns:
+        The tuple (lower, upper) of masks as integers.
+    '''
+    lower = ((1 << bits) - 1).to_bytes(lanes, 'big')
+    upper = (((1 << bits) - 1) << offset).to_bytes(lanes, 'big')
+    return int.from_bytes(lower * groups, 'big'), int.from_bytes(upper * groups, 'big')
+
+
+def __pack(idx, width):
+    '''
+    Pack the character indices into a bit stream. The whole message is
+    processed as one integer: the neighbouring indices are merged pairwise
+    into lanes of twice the width, until each group of characters fills
+    whole bytes.
+
+    Args:
+        idx: The character indices as bytes, one index per byte.
+        width: The number of bits per character (6 or 7).
+
+    Returns:
+        The packed indices as byte array, zero padded to whole bytes.
+    '''
+    group = __group[width]
+    groups = (len(idx) + group - 1) // group
+    x = int.from_bytes(idx + bytes(groups * group - len(idx)), 'big')
+
+    lanes = 2
+    while lanes <= group:
+        half, offset = width * lanes // 2, 8 * lanes // 2
+        lower, upper = __masks(half, offset, lanes, groups * group // lanes)
+        x = (x & lower) | ((x & upper) >> (offset - half))
+        lanes *= 2
+
+    # drop the leading empty byte of each group
+    res = bytearray(x.to_bytes(groups * group, 'big'))
+    del res[::group]
+
+    return bytes(res[0:(len(idx) * width + 7) // 8])
+
+
+def __unpack(packed, width):
+    '''
+    Unpack the bit stream into character indices, the inverse of __pack.
+
+    Args:
+        packed: The packed indices as byte array.
+        width: The number of bits per character (6 or 7).
+
+    Returns:
+        The character indices as bytes, one index per byte, including
+        the indices made of the padding bits.
+    '''
+    group = __group[width]
+    size = group * width // 8
+    groups = (len(packed) + size - 1) // size
+
+    # insert an empty byte in front of each group
+    res = bytearray(groups * group)
+    packed = packed + bytes(groups * size - len(packed))
+    for i in range(0, size):
+        res[i + 1::group] = packed[i::size]
+    x = int.from_bytes(res, 'big')
+
+    lanes = group
+    while lanes >= 2:
+        half, offset = width * lanes // 2, 8 * lanes // 2
+        lower, upper = __masks(half, half, lanes, groups * group // lanes)
+        x = (x & lower) | ((x & upper) << (offset - half))
+        lanes //= 2
+
+    return x.to_bytes(groups * group, 'big')
+
+
+def EncodeGSMMany(txts):
+    '''
+    Encode many text strings into the GSM 03.38 character set at once.
+
+    Args:
+        txts: The original texts as UTF-8 encoded byte arrays.
+
+    Returns:
+        List of the encoded texts as byte arrays.
+    '''
+    return __encodeMany(txts, __gsmEncode, 7, False)
+
+
+def DecodeGSMMany(gsms):
+    '''
+    Decode many messages from the GSM 03.38 character set at once.
+
+    Args:
+        gsms: The GSM 03.38 encoded texts as byte arrays.
+
+    Returns:
+        List of the decoded texts as UTF-8 encoded byte arrays.
+    '''
+    return __decodeMany(gsms, __gsmDecode, 7)
+
+
+def EncodeSixbitMany(txts):
+    '''
+    Encode many text strings into the AIS Sixbit ASCII character set at once.
+
+    Args:
+        txts: The original texts as UTF-8 encoded byte arrays.
+
+    Returns:
+        List of the encoded texts as byte arrays.
+    '''
+    return __encodeMany(txts, __sixbitEncode, 6, True)
+
+
+def DecodeSixbitMany(sixes):
+    '''
+    Decode many messages from the AIS Sixbit ASCII character set at once.
+
+    Args:
+        sixes: The AIS Sixbit encoded texts as byte arrays.
+
+    Returns:
+        List of the decoded texts as UTF-8 encoded byte arrays.
+    '''
+    return __decodeMany(sixes, __sixbitDecode, 6)
+
+
+def __encodeMany(txts, table, width, upper):
+    '''
+    Translate the texts into character indices and pack them all in one go.
+    Each text is padded to whole groups of characters, so that the packed
+    texts start at byte boundaries.
+
+    Args:
+        txts: The original texts as UTF-8 encoded byte arrays.
+        table: The character translation table (see _Table).
+        width: The number of bits per character (6 or 7).
+        upper: Convert the texts to upper case first.
+
+    Returns:
+        List of the encoded texts as byte arrays.
+    '''
+    group = __group[width]
+    size = group * width // 8
+
+    idx = []
+    for txt in txts:
+        txt = txt.decode('utf-8', errors = 'ignore')
+        idx.append((txt.upper() if upper else txt).translate(table).encode('latin-1'))
+    packed = __pack(b''.join(i + bytes(-len(i) % group) for i in idx), width)
+
+    res = []
+    start = 0
+    for i in idx:
+        res.append(packed[start:start + (len(i) * width + 7) // 8])
+        start += (len(i) + group - 1) // group * size
+
+    return res
+
+
+def __decodeMany(packed, table, width):
+    '''
+    Unpack the messages in one go and translate the indices into characters.
+
+    Args:
+        packed: The encoded texts as byte arrays.
+        table: The index translation table.
+        width: The number of bits per character (6 or 7).
+
+    Returns:
+        List of the decoded texts as UTF-8 encoded byte arrays.
+    '''
+    group = __group[width]
+    size = group * width // 8
+
+    idx = __unpack(b''.join(p + bytes(-len(p) % size) for p in packed), width)
+
+    res = []
+    start = 0
+    for p in packed:
+        i = __trim(idx[start:start + len(p) * 8 // width], len(p), width)
+        res.append(i.decode('latin-1').translate(table).encode('utf-8'))
+        start += (len(p) + size - 1) // size * group
+
+    return res
+
+
+def __trim(idx, length, width):
+    '''
+    Drop the last index if it is made of the zero padding bits only.
+    This is the case if the remaining characters fill the same number
+    of bytes, and the last character is the one with index 0.
+
+    Args:
+        idx: The character indices as bytes.
+        length: The length of the encoded message in bytes.
+        width: The number of bits per character (6 or 7).
+
+    Returns:
+        The character indices as bytes.
+    '''
+    if len(idx) > 0 and idx[-1] == 0 and ((len(idx) - 1) * width + 7) // 8 == length:
+        return idx[0:-1]
+
+    return idx
+
+
+def EncodeGSM(txt):
+    '''
+    Encode the text string (provided as byte array) into
+    the GSM 03.38 character set. Extended characters are
+    not supported. Unsupported characters are mapped into
+    blank spaces.
+
+    Args:
+        txt: The original text as UTF-8 encoded byte array.
+
+    Returns:
+        The encoded text as byte array.
+    '''
+    return __encodeMany([txt], __gsmEncode, 7, False)[0]
+
+
+def DecodeGSM(gsm):
+    '''
+    Decode the encoded message from the GSM 03.38 character set.
+
+    Args:
+        gsm: The GSM 03.38 encoded text as byte array.
+
+    Returns:
+        The decoded text as UTF-8 encoded byte array.
+    '''
+    return __decodeMany([gsm], __gsmDecode, 7)[0]
+
+
+def EncodeSixbit(txt):
+    '''
+    Encode the text string (provided as byte array) into
+    the AIS Sixbit ASCII character set. Unsupported characters
+    are mapped into blank spaces.
+
+    Args:
+        txt: The original text encoded as UTF-8 byte array.
+
+    Returns:
+        The encoded text as byte array.
+    '''
+    return __encodeMany([txt], __sixbitEncode, 6, True)[0]
+
+
+def DecodeSixbit(six):
+    '''
+    Decode the encoded message from the AIS Sixbit ASCII character set.
+
+    Args:
+        six: The AIS Sixbit encoded text as byte array.
+
+    Returns:
+        The decoded text as UTF-8 encoded byte array.
+    '''
+    return __decodeMany([six], __sixbitDecode, 6)[0]
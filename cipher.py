@@ -0,0 +1,125 @@
+from Crypto.Cipher import AES
+
+__all__ = ['BuildIVs', 'EncryptBlocks', 'DecryptBlocks']
+
+
+# The message blocks are 32 bytes long, i.e. two AES blocks encrypted in
+# CBC mode. The first AES block is chained to the IV, the second one to the
+# first encrypted AES block. Both chaining steps are plain XORs, so all
+# message blocks encrypted with the same key can be processed with a single
+# ECB pass (two for encryption) over the whole array of blocks.
+
+
+def __xor(a, b):
+    '''
+    XOR two byte arrays of equal length in one go.
+
+    Args:
+        a: The first byte array.
+        b: The second byte array.
+
+    Returns:
+        The XOR of both byte arrays.
+    '''
+    return (int.from_bytes(a, 'big') ^ int.from_bytes(b, 'big')).to_bytes(len(a), 'big')
+
+
+def __halves(data, n):
+    '''
+    Split the concatenated 32 byte blocks into the concatenation
+    of their first and the concatenation of their second halves.
+
+    Args:
+        data: The concatenated blocks.
+        n: The number of blocks.
+
+    Returns:
+        The tuple (first, second) of concatenated halves.
+    '''
+    first = b''.join(data[32 * i:32 * i + 16] for i in range(0, n))
+    second = b''.join(data[32 * i + 16:32 * i + 32] for i in range(0, n))
+    return first, second
+
+
+def __check(blocks):
+    '''
+    Raise ValueError unless all the blocks are 32 bytes long, as the
+    per-block AES-CBC would, instead of misaligning the following blocks.
+
+    Args:
+        blocks: The list of blocks.
+    '''
+    if any(len(b) != 32 for b in blocks):
+        raise ValueError('The message blocks must be 32 bytes long')
+
+
+def BuildIVs(pk, sequences):
+    '''
+    Build the initialization vectors for the given sequence numbers.
+    Each IV is the sum of the first 16 bytes of the recipient public key
+    and the sequence number, truncated to 16 bytes.
+
+    Args:
+        pk: The curve25519 public key of the recipient.
+        sequences: The sequence numbers of the sending account.
+
+    Returns:
+        The concatenated 16 byte IVs as byte array.
+    '''
+    base = int.from_bytes(pk[0:16], 'big')
+    mask = (1 << 128) - 1
+    return b''.join(((base + s) & mask).to_bytes(16, 'big') for s in sequences)
+
+
+def EncryptBlocks(blocks, k, IVs):
+    '''
+    Encrypt the 32 byte blocks in AES-CBC mode, each block with its own IV,
+    using two ECB passes over all the blocks.
+
+    Args:
+        blocks: The list of 32 byte blocks.
+        k: The shared secret.
+        IVs: The concatenated IVs, one for each block (see BuildIVs).
+
+    Returns:
+        List of encrypted blocks (byte arrays).
+    '''
+    n = len(blocks)
+    if n == 0:
+        return []
+    __check(blocks)
+
+    first, second = __halves(b''.join(blocks), n)
+    ecb = AES.new(k, AES.MODE_ECB)
+    c0 = ecb.encrypt(__xor(first, IVs))
+    c1 = ecb.encrypt(__xor(second, c0))
+
+    return [c0[16 * i:16 * i + 16] + c1[16 * i:16 * i + 16] for i in range(0, n)]
+
+
+def DecryptBlocks(encrypted, k, IVs):
+    '''
+    Decrypt the 32 byte blocks encrypted in AES-CBC mode, each block with
+    its own IV, using a single ECB pass over all the blocks.
+
+    Args:
+        encrypted: The list of encrypted 32 byte blocks.
+        k: The shared secret.
+        IVs: The concatenated IVs, one for each block (see BuildIVs).
+
+    Returns:
+        List of decrypted blocks (byte arrays).
+    '''
+    n = len(encrypted)
+    if n == 0:
+        return []
+    __check(encrypted)
+
+    data = b''.join(encrypted)
+    decrypted = AES.new(k, AES.MODE_ECB).decrypt(data)
+
+    # the first half is chained to the IV, the second to the first half
+    mask = b''.join(IVs[16 * i:16 * i + 16] + data[32 * i:32 * i + 16] for i in range(0, n))
+    plain = __xor(decrypted, mask)
+
+    return [plain[32 * i:32 * i + 32] for i in range(0, n)]
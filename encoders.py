@@ -1,177 +1,267 @@
-import lib.smaz
-from bitstring import BitArray, BitStream
+from importlib import import_module
+
+__all__ = ['Encoding', 'ENCODINGS', 'Register', 'GetEncoding',
+           'EncodeGSM', 'DecodeGSM', 'EncodeSixbit', 'DecodeSixbit', 'Compress', 'Decompress',
+           'EncodeGSMMany', 'DecodeGSMMany', 'EncodeSixbitMany', 'DecodeSixbitMany',
+           'CompressTrained', 'DecompressTrained']
 
-__all__ = ['EncodeGSM', 'DecodeGSM', 'EncodeSixbit', 'DecodeSixbit', 'Compress', 'Decompress']
 
+class Encoding:
+    def __init__(self, code, name, module = None, encode = None, decode = None, encodeMany = None,
+                 decodeMany = None, chars = None, binary = False):
+        '''
+        Description of a message encoding. The codec functions are given
+        by name and imported from their module on first use, so that the
+        codecs that are never used are never loaded. Without a module,
+        the message bytes are passed through unchanged.
 
-# lookup constant strings for the encodings
-__gsm = ("@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞ\x1bÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
-         "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ`¿abcdefghijklmnopqrstuvwxyzäöñüà")
-__sixbit = "@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\\]^_ !\"#$%&'()*+,-./0123456789:;<=>?"
+        Args:
+            code: The encoding number in the block header (0 - 7).
+            name: The human readable name of the encoding.
+            module: Name of the module implementing the codec.
+            encode: Name of the function encoding a message.
+            decode: Name of the function decoding a message.
+            encodeMany: Name of the function encoding a list of messages.
+            decodeMany: Name of the function decoding a list of messages.
+            chars: The number of characters per fragment, None if variable.
+            binary: True if the decoded messages are arbitrary bytes
+                    rather than text.
 
+        Returns:
+            Instance of the object.
+        '''
+        self.code = code
+        self.name = name
+        self.chars = chars
+        self.binary = binary
+        self.__module = module
+        self.__names = {'encode': encode, 'decode': decode, 'encodeMany': encodeMany, 'decodeMany': decodeMany}
+        self.__codec = {}
 
-def EncodeGSM(txt):
+
+    def __function(self, kind):
+        '''
+        Return the codec function, importing its module on first use.
+
+        Args:
+            kind: One of 'encode', 'decode', 'encodeMany' or 'decodeMany'.
+
+        Returns:
+            The function, or None if the codec does not provide it.
+        '''
+        if kind not in self.__codec:
+            name = self.__names[kind]
+            self.__codec[kind] = getattr(import_module(self.__module), name) if name is not None else None
+
+        return self.__codec[kind]
+
+
+    def Encode(self, msg):
+        '''
+        Encode the message.
+
+        Args:
+            msg: The message as byte array.
+
+        Returns:
+            The encoded message as byte array.
+        '''
+        if self.__module is None:
+            return msg
+
+        return self.__function('encode')(msg)
+
+
+    def Decode(self, msg):
+        '''
+        Decode the message.
+
+        Args:
+            msg: The encoded message as byte array.
+
+        Returns:
+            The decoded message as byte array.
+        '''
+        if self.__module is None:
+            return msg
+
+        return self.__function('decode')(msg)
+
+
+    def EncodeMany(self, msgs):
+        '''
+        Encode a list of messages, in one go if the codec supports it.
+
+        Args:
+            msgs: The messages as byte arrays.
+
+        Returns:
+            List of the encoded messages.
+        '''
+        if self.__module is not None and self.__function('encodeMany') is not None:
+            return self.__function('encodeMany')(msgs)
+
+        return [self.Encode(m) for m in msgs]
+
+
+    def DecodeMany(self, msgs):
+        '''
+        Decode a list of messages, in one go if the codec supports it.
+
+        Args:
+            msgs: The encoded messages as byte arrays.
+
+        Returns:
+            List of the decoded messages.
+        '''
+        if self.__module is not None and self.__function('decodeMany') is not None:
+            return self.__function('decodeMany')(msgs)
+
+        return [self.Decode(m) for m in msgs]
+
+
+# the registered encodings by their code
+ENCODINGS = {}
+
+
+def Register(encoding):
     '''
-    Encode the text string (provided as byte array) into
-    the GSM 03.38 character set. Extended characters are
-    not supported. Unsupported characters are mapped into
-    blank spaces.
+    Register the encoding, replacing the one with the same code.
 
     Args:
-        txt: The original text as UTF-8 encoded byte array.
+        encoding: The Encoding instance.
 
     Returns:
-        The encoded text as byte array.
+        None.
     '''
-    # ugly hack using binary strings
-    res = ''
-
-    for c in txt.decode('utf-8', errors = 'ignore'):
-        idx = __gsm.find(c)
-        if idx != -1:
-            res += '{:07b}'.format(idx)
-        else:
-            res += '0100000'
+    ENCODINGS[encoding.code] = encoding
 
-    # zero pad the last byte if necessary
-    lastbits = len(res) % 8
-    if lastbits > 0:
-        res += '0' * (8 - lastbits)
 
-    return BitArray('0b' + res).bytes
-
-
-def DecodeGSM(gsm):
+def GetEncoding(code):
     '''
-    Decode the encoded message from the GSM 03.38 character set.
+    Look up the encoding by its code.
 
     Args:
-        gsm: The GSM 03.38 encoded text as byte array.
+        code: The encoding number in the block header.
 
     Returns:
-        The decoded text as UTF-8 encoded byte array.
+        The Encoding instance, None if there is no such encoding.
     '''
-    # convert to bit stream
-    bits = BitStream(gsm)
+    return ENCODINGS.get(code)
 
-    # get the indices, characters, and merge together
-    res = ''.join(__gsm[idx] for idx in bits.readlist('{}'.format(len(bits) // 7) + '*uint:7')).encode('utf-8')
 
-    # strip last character in case we have a perfect wrapping
-    if len(bits) % 7 == 0 and chr(res[-1]):
-        res = res[0:len(res) - 1]
+Register(Encoding(0, 'raw', chars = 31, binary = True))
+Register(Encoding(1, 'GSM 03.38', 'charsets', 'EncodeGSM', 'DecodeGSM', 'EncodeGSMMany', 'DecodeGSMMany',
+                  chars = 35))
+Register(Encoding(2, 'Sixbit ASCII', 'charsets', 'EncodeSixbit', 'DecodeSixbit', 'EncodeSixbitMany',
+                  'DecodeSixbitMany', chars = 41))
+Register(Encoding(3, 'smaz', 'smaz', 'Compress', 'Decompress'))
+Register(Encoding(4, 'trained codebook', 'smaz', 'CompressTrained', 'DecompressTrained'))
 
-    return res
+# reserved for future use, the messages are passed through
+for code in range(5, 8):
+    Register(Encoding(code, 'reserved', chars = 31, binary = True))
 
 
-def EncodeSixbit(txt):
+# the codec functions of the registered encodings, kept for the callers
+# of the former encoders module
+def EncodeGSM(txt):
+    '''
+    Encode the text with the GSM 03.38 charset (encoding 1).
     '''
-    Encode the text string (provided as byte array) into
-    the AIS Sixbit ASCII character set. Unsupported characters
-    are mapped into blank spaces.
+    return GetEncoding(1).Encode(txt)
 
-    Args:
-        txt: The original text encoded as UTF-8 byte array.
 
-    Returns:
-        The encoded text as byte array.
+def DecodeGSM(gsm):
     '''
-    # ugly hack using binary strings
-    res = ''
+    Decode the GSM 03.38 encoded text (encoding 1).
+    '''
+    return GetEncoding(1).Decode(gsm)
 
-    for c in txt.decode('utf-8', errors = 'ignore').upper():
-        idx = __sixbit.find(c)
-        if idx != -1:
-            res += '{:06b}'.format(idx)
-        else:
-            res += '100000'
 
-    # zero pad the last byte if necessary
-    lastbits = len(res) % 8
-    if lastbits > 0:
-        res += '0' * (8 - lastbits)
+def EncodeGSMMany(txts):
+    '''
+    Encode a list of texts with the GSM 03.38 charset (encoding 1).
+    '''
+    return GetEncoding(1).EncodeMany(txts)
 
-    return BitArray('0b' + res).bytes
 
+def DecodeGSMMany(gsms):
+    '''
+    Decode a list of GSM 03.38 encoded texts (encoding 1).
+    '''
+    return GetEncoding(1).DecodeMany(gsms)
 
-def DecodeSixbit(six):
+
+def EncodeSixbit(txt):
     '''
-    Decode the encoded message from the AIS Sixbit ASCII character set.
+    Encode the text with the Sixbit ASCII charset (encoding 2).
+    '''
+    return GetEncoding(2).Encode(txt)
 
-    Args:
-        six: The AIS Sixbit encoded text as byte array.
 
-    Returns:
-        The decoded text as UTF-8 encoded byte array.
+def DecodeSixbit(six):
     '''
-    # convert to bit stream
-    bits = BitStream(six)
+    Decode the Sixbit ASCII encoded text (encoding 2).
+    '''
+    return GetEncoding(2).Decode(six)
+
 
-    # get the indices, characters, and merge together
-    res = ''.join(__sixbit[idx] for idx in bits.readlist('{}'.format(len(bits) // 6) + '*uint:6')).encode('utf-8')
+def EncodeSixbitMany(txts):
+    '''
+    Encode a list of texts with the Sixbit ASCII charset (encoding 2).
+    '''
+    return GetEncoding(2).EncodeMany(txts)
 
-    # strip last character in case we have a perfect wrapping
-    if len(bits) % 6 == 0 and chr(res[-1]):
-        res = res[0:len(res) - 1]
 
-    return res
+def DecodeSixbitMany(sixes):
+    '''
+    Decode a list of Sixbit ASCII encoded texts (encoding 2).
+    '''
+    return GetEncoding(2).DecodeMany(sixes)
 
 
 def Compress(txt):
     '''
-    Compress the text message (provided as byte array).
-    The text will first be coerced to ASCII, as the SMAZ
-    compression algorithm can only process ASCII strings.
+    Compress the text with smaz (encoding 3).
+    '''
+    return GetEncoding(3).Encode(txt)
 
-    Args:
-        txt: The original message encoded as UFT-8 byte array.
 
-    Returns:
-        The smaz compressed text as byte array.
+def Decompress(comp):
     '''
-    return lib.smaz.compress(txt.decode('ascii', errors = 'ignore')).encode('utf-8')
+    Decompress the smaz compressed text (encoding 3).
+    '''
+    return GetEncoding(3).Decode(comp)
 
 
-def Decompress(comp):
+def CompressTrained(txt):
     '''
-    decompress the SMAZ compressed byte array.
+    Compress the text with the trained codebook (encoding 4).
+    '''
+    return GetEncoding(4).Encode(txt)
 
-    Args:
-        txt: The message to be compressed as byte array.
 
-    Returns:
-        The smaz compressed text as UTF-8 encoded byte array.
+def DecompressTrained(comp):
+    '''
+    Decompress the text compressed with the trained codebook (encoding 4).
     '''
-    return lib.smaz.decompress(comp.decode('utf-8')).encode('utf-8')
+    return GetEncoding(4).Decode(comp)
 
 
 if __name__ == '__main__':
 
     m = "This is a test like Lorem Ipsum".encode('utf-8')
 
-    # Test GSM 03.38
-    print('\nGSM 03.38 Encoding test')
-    e = EncodeGSM(m)
-    d = DecodeGSM(e)
-    print(' - Original message: "{}"   length = {}'.format(m.decode('utf-8'), len(m)))
-    print(' - Encoded message:  "{}"   length = {}'.format(e, len(e)))
-    print(' - Decoded message:  "{}"   length = {}'.format(d.decode('utf-8'), len(d)))
-    assert m == d
-
-    # Test Sixbit ASCII
-    print('\nSixbit ASCII Encoding test')
-    e = EncodeSixbit(m)
-    d = DecodeSixbit(e)
-    print(' - Original message: "{}"   length = {}'.format(m.decode('utf-8'), len(m)))
-    print(' - Encoded message:  "{}"   length = {}'.format(e, len(e)))
-    print(' - Decoded message:  "{}"   length = {}'.format(d.decode('utf-8'), len(d)))
-    assert m.upper() == d
-
-    # smaz compression
-    print('\nSmaz Compression test')
-    e = Compress(m)
-    d = Decompress(e)
-    print(' - Original message: "{}"   length = {}'.format(m.decode('utf-8'), len(m)))
-    print(' - Encoded message:  "{}"   length = {}'.format(e, len(e)))
-    print(' - Decoded message:  "{}"   length = {}'.format(d.decode('utf-8'), len(d)))
-    assert m == d
+    for code, encoding in sorted(ENCODINGS.items()):
+        if encoding.binary:
+            continue
+
+        print('\n{} encoding test'.format(encoding.name))
+        e = encoding.Encode(m)
+        d = encoding.Decode(e)
+        print(' - Original message: "{}"   length = {}'.format(m.decode('utf-8'), len(m)))
+        print(' - Encoded message:  "{}"   length = {}'.format(e, len(e)))
+        print(' - Decoded message:  "{}"   length = {}'.format(d.decode('utf-8'), len(d)))
+        assert (m.upper() if code == 2 else m) == d
+        assert encoding.DecodeMany(encoding.EncodeMany([m, m])) == [d, d]
@@ -0,0 +1,142 @@
+import sqlite3
+import threading
+import os.path
+import os
+
+
+__all__ = ['SendJournal']
+
+
+# Database schema, each sent message has the signed transactions of its
+# fragments, which are kept until all of them are confirmed by Horizon
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    encoding INTEGER NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_account ON outbox (account, id);
+CREATE TABLE IF NOT EXISTS fragments (
+    hash TEXT PRIMARY KEY,
+    message INTEGER NOT NULL,
+    sequence INTEGER NOT NULL,
+    envelope BLOB NOT NULL,
+    confirmed INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fragments_message ON fragments (message, sequence);
+'''
+
+
+class SendJournal:
+    def __init__(self, name = ':memory:'):
+        '''
+        Open (or create) the write-ahead journal of the sent messages. The
+        signed fragment transactions of a message are written before the
+        first one is submitted, and each fragment is marked once Horizon
+        confirms it. The messages interrupted by a failure or a crash can
+        therefore be completed later by submitting the remaining fragments,
+        without encrypting and signing them again (see Whisperer.Resume).
+        The journal can share the database file with the MessageStore.
+
+        Args:
+            name: Path to the SQLite database file. By default the
+                  journal is kept in memory only.
+
+        Returns:
+            Instance of the object.
+        '''
+        if name != ':memory:':
+            name = os.path.expanduser(name)
+            if os.path.dirname(name) != '':
+                os.makedirs(os.path.dirname(name), exist_ok = True)
+        self.__db = sqlite3.connect(name, check_same_thread = False)
+        self.__db.executescript(SCHEMA)
+        self.__lock = threading.Lock()
+
+
+    def Begin(self, account, recipient, encoding, length, envelopes):
+        '''
+        Record a message before its fragments are submitted.
+
+        Args:
+            account: The Stellar address of the sender.
+            recipient: The Stellar address of the receiver.
+            encoding: The encoding of the message.
+            length: The length of the message before encoding.
+            envelopes: The (sequence, hash, envelope) tuples of the signed
+                       fragment transactions.
+
+        Returns:
+            The identifier of the journal entry.
+        '''
+        with self.__lock, self.__db:
+            entry = self.__db.execute('INSERT INTO outbox (account, recipient, encoding, length) VALUES (?, ?, ?, ?)',
+                                      (account, recipient, encoding, length)).lastrowid
+            self.__db.executemany('INSERT OR REPLACE INTO fragments VALUES (?, ?, ?, ?, 0)',
+                                  [(h, entry, sequence, envelope) for sequence, h, envelope in envelopes])
+
+        return entry
+
+
+    def Confirm(self, h):
+        '''
+        Mark a fragment as accepted by Horizon.
+
+        Args:
+            h: The hash of the fragment transaction.
+
+        Returns:
+            None.
+        '''
+        with self.__lock, self.__db:
+            self.__db.execute('UPDATE fragments SET confirmed = 1 WHERE hash = ?', (h,))
+
+
+    def Finish(self, entry):
+        '''
+        Remove a message from the journal, once all its fragments are
+        confirmed or when they can no longer be sent.
+
+        Args:
+            entry: The identifier of the journal entry.
+
+        Returns:
+            None.
+        '''
+        with self.__lock, self.__db:
+            self.__db.execute('DELETE FROM fragments WHERE message = ?', (entry,))
+            self.__db.execute('DELETE FROM outbox WHERE id = ?', (entry,))
+
+
+    def Pending(self, account):
+        '''
+        Return the messages of the account that were not completely sent.
+
+        Args:
+            account: The Stellar address of the sender.
+
+        Returns:
+            List of [entry, recipient, encoding, length, fragments] lists,
+            in the order the messages were sent, where fragments is the list
+            of (sequence, hash, envelope, confirmed) tuples of the message.
+        '''
+        with self.__lock:
+            entries = self.__db.execute('SELECT id, recipient, encoding, length FROM outbox WHERE account = ? ORDER BY id',
+                                        (account,)).fetchall()
+            pending = []
+            for entry, recipient, encoding, length in entries:
+                rows = self.__db.execute('SELECT sequence, hash, envelope, confirmed FROM fragments '
+                                         'WHERE message = ? ORDER BY sequence', (entry,))
+                pending.append([entry, recipient, encoding, length,
+                                [(r[0], r[1], r[2], bool(r[3])) for r in rows]])
+
+        return pending
+
+
+    def Close(self):
+        '''
+        Close the underlying database.
+        '''
+        self.__db.close()
@@ -0,0 +1,706 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from decimal import Decimal
+import threading
+import base64
+import json
+import time
+
+from stellar_base.transaction_envelope import TransactionEnvelope
+from stellar_base.operation import CreateAccount, Payment
+from stellar_base.memo import TextMemo, IdMemo, HashMemo, RetHashMemo
+from stellar_base.utils import decode_check
+from stellar_base.exceptions import HorizonError
+from nacl.signing import VerifyKey
+from nacl.exceptions import BadSignatureError
+
+
+__all__ = ['Ledger', 'AsyncLedger']
+
+
+# Number of stroops in one lumen
+STROOPS = 10 ** 7
+
+# Minimum balance (in stroops) of a new account
+BASE_RESERVE = 1 * STROOPS
+
+# Time (in seconds) a transaction submitted ahead of its account sequence
+# number is held for its predecessors, before it is rejected
+HOLD_TIMEOUT = 10
+
+
+class Event:
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        '''
+        Server-sent event of a transaction stream.
+
+        Args:
+            data: The event data, i.e. the JSON encoded record.
+
+        Returns:
+            Instance of the object.
+        '''
+        self.data = data
+
+
+class Ledger:
+    def __init__(self, capacity = 100, interval = 5, start = datetime(2018, 1, 1), verify = True, ahead = 0):
+        '''
+        In-process simulation of the Stellar ledger and of the subset of
+        the Horizon API used by Whisperer, so that many accounts and
+        messages can be tested without network access. An instance can
+        be passed as the horizon argument of Whisperer, or replace the
+        module-wide whisperer.horizon instance.
+
+        The submitted transactions are checked like on the network (the
+        sequence number, the signature, the fee and the balance) and are
+        applied right away. A ledger is closed as soon as it holds
+        `capacity` transactions (or when Close is called), the close time
+        of each ledger being `interval` seconds after the previous one,
+        so the simulation is deterministic. The accounts are created with
+        Fund (as by friendbot) or by a create account operation. Only the
+        payments in lumens and the account creations are supported.
+
+        A transaction whose sequence number is ahead of its account is
+        rejected right away, unless it is at most `ahead` numbers ahead.
+        Such a transaction is held until its predecessors are applied (as
+        in the submission queue of Horizon), so the order in which the
+        pipelined submissions arrive does not matter.
+
+        Args:
+            capacity: The maximum number of transactions per ledger.
+            interval: The simulated time between ledgers in seconds.
+            start: The close time of the first ledger.
+            verify: Check the transaction signatures. Disable for faster
+                    load tests.
+            ahead: How far ahead of its account sequence number a
+                   transaction is held instead of rejected.
+
+        Returns:
+            Instance of the object.
+        '''
+        self.horizon = 'ledger://local'
+        self.__capacity = capacity
+        self.__interval = interval
+        self.__start = start
+        self.__verify = verify
+        self.__ahead = ahead
+        self.__lock = threading.Condition()
+
+        # the current (open) ledger and the number of transactions in it
+        self.__ledger = 2
+        self.__count = 0
+
+        # address -> [sequence number, balance in stroops]
+        self.__accounts = {}
+        # the applied transactions as (paging token, hash, ledger, source,
+        # sequence, fee, memo type, memo, operations) tuples, the operations
+        # being (type, from, to, amount in stroops) tuples
+        self.__transactions = []
+        # paging token -> index of the transaction
+        self.__index = {}
+        # transaction hash -> paging token
+        self.__hashes = {}
+        # address -> paging tokens of the transactions and the payment
+        # operations involving the account
+        self.__history = {}
+        self.__payments = {}
+        # address -> public key of the account
+        self.__keys = {}
+        # number of rejected submissions
+        self.__rejected = 0
+
+
+    def Close(self):
+        '''
+        Close the current ledger, the following transactions are
+        included in the next ledger.
+
+        Returns:
+            The sequence number of the closed ledger.
+        '''
+        with self.__lock:
+            self.__ledger += 1
+            self.__count = 0
+            return self.__ledger - 1
+
+
+    def Fund(self, address, balance = 10000):
+        '''
+        Create and fund the account, like friendbot on the testnet. No
+        transaction is recorded.
+
+        Args:
+            address: The Stellar address of the new account.
+            balance: The starting balance in lumens.
+
+        Returns:
+            True if the account was created, False if it already exists.
+        '''
+        with self.__lock:
+            if address in self.__accounts:
+                return False
+            self.__accounts[address] = [self.__ledger << 32, int(Decimal(balance) * STROOPS)]
+            return True
+
+
+    def Accounts(self):
+        '''
+        Return the number of accounts.
+        '''
+        return len(self.__accounts)
+
+
+    def Transactions(self):
+        '''
+        Return the number of applied transactions.
+        '''
+        return len(self.__transactions)
+
+
+    def Rejected(self):
+        '''
+        Return the number of rejected submissions.
+        '''
+        return self.__rejected
+
+
+    @classmethod
+    def __amount(cls, stroops):
+        '''
+        Format the amount the way Horizon does, e.g. '0.0000001'.
+        '''
+        return '{}.{:07d}'.format(stroops // STROOPS, stroops % STROOPS)
+
+
+    @classmethod
+    def __error(cls, status, title, transaction = None, operations = None):
+        '''
+        Build a Horizon error response.
+
+        Args:
+            status: The HTTP status code.
+            title: The error title.
+            transaction: The transaction result code.
+            operations: The operation result codes.
+
+        Returns:
+            The error response as dictionary.
+        '''
+        response = {'type': 'https://stellar.org/horizon-errors/' + title.lower().replace(' ', '_'),
+                    'title': title, 'status': status}
+        if transaction is not None:
+            codes = {'transaction': transaction}
+            if operations is not None:
+                codes['operations'] = operations
+            response['extras'] = {'result_codes': codes}
+
+        return response
+
+
+    @classmethod
+    def __reply(cls, response):
+        '''
+        Return the response, or raise the error response like the
+        stellar_base Horizon client does (see check_horizon_reply).
+
+        Args:
+            response: The response as dictionary.
+
+        Returns:
+            The response, unless it is an error response.
+        '''
+        if 'status' in response:
+            raise HorizonError('Invalid horizon reply: [{}] {}'.format(response['status'], response),
+                               response['status'])
+
+        return response
+
+
+    def __time(self, ledger):
+        '''
+        Return the close time of the ledger as Horizon timestamp.
+        '''
+        return (self.__start + timedelta(seconds = self.__interval * (ledger - 2))).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+    @classmethod
+    def __memo(cls, memo):
+        '''
+        Return the memo type and value of a transaction record.
+        '''
+        if isinstance(memo, HashMemo):
+            return 'hash', base64.b64encode(bytes(memo.memo_hash)).decode()
+        if isinstance(memo, RetHashMemo):
+            return 'return', base64.b64encode(bytes(memo.memo_return)).decode()
+        if isinstance(memo, TextMemo):
+            return 'text', bytes(memo.text).decode('utf-8', errors = 'replace')
+        if isinstance(memo, IdMemo):
+            return 'id', str(memo.memo_id)
+
+        return 'none', None
+
+
+    def __signed(self, envelope, source, h):
+        '''
+        Check that the transaction is signed by the source account.
+        '''
+        if not self.__verify:
+            return True
+
+        key = self.__keys.get(source)
+        if key is None:
+            key = self.__keys[source] = VerifyKey(decode_check('account', source))
+        for signature in envelope.signatures:
+            try:
+                key.verify(h, bytes(signature.signature))
+                return True
+            except BadSignatureError:
+                pass
+
+        return False
+
+
+    def __apply(self, source, operations):
+        '''
+        Apply the operations of the transaction, or none of them if one
+        fails.
+
+        Args:
+            source: The source account of the transaction.
+            operations: The operations as stellar_base objects.
+
+        Returns:
+            The tuple (applied operations, result codes), where the applied
+            operations are None if one of the operations failed.
+        '''
+        balances = {}
+        def balance(address):
+            if address not in balances:
+                balances[address] = self.__accounts[address][1] if address in self.__accounts else None
+            return balances[address]
+
+        applied, codes, failed = [], [], False
+        for op in operations:
+            sender = op.source or source
+            if balance(sender) is None:
+                codes.append('op_no_source_account')
+                failed = True
+                continue
+
+            if isinstance(op, Payment):
+                amount = int(Decimal(op.amount) * STROOPS)
+                if getattr(op.asset, 'issuer', None) is not None:
+                    codes.append('op_no_trust')
+                elif balance(op.destination) is None:
+                    codes.append('op_no_destination')
+                elif balance(sender) - amount < BASE_RESERVE:
+                    codes.append('op_underfunded')
+                else:
+                    balances[sender] -= amount
+                    balances[op.destination] += amount
+                    applied.append(('payment', sender, op.destination, amount))
+                    codes.append('op_success')
+                    continue
+            elif isinstance(op, CreateAccount):
+                amount = int(Decimal(op.starting_balance) * STROOPS)
+                if balance(op.destination) is not None:
+                    codes.append('op_already_exists')
+                elif amount < BASE_RESERVE:
+                    codes.append('op_low_reserve')
+                elif balance(sender) - amount < BASE_RESERVE:
+                    codes.append('op_underfunded')
+                else:
+                    balances[sender] -= amount
+                    balances[op.destination] = amount
+                    applied.append(('create_account', sender, op.destination, amount))
+                    codes.append('op_success')
+                    continue
+            else:
+                codes.append('op_not_supported')
+            failed = True
+
+        if failed:
+            return None, codes
+
+        for address, b in balances.items():
+            if address in self.__accounts:
+                self.__accounts[address][1] = b
+            else:
+                self.__accounts[address] = [self.__ledger << 32, b]
+
+        return applied, codes
+
+
+    def submit(self, te):
+        '''
+        Submit a transaction to the ledger.
+
+        Args:
+            te: The signed transaction envelope in XDR.
+
+        Returns:
+            The submission result as dictionary, with the keys 'hash' and
+            'ledger'. A rejected transaction raises HorizonError, with the
+            Horizon error response in the message.
+        '''
+        try:
+            envelope = TransactionEnvelope.from_xdr(te)
+            tx = envelope.tx
+            source = tx.source.decode() if isinstance(tx.source, bytes) else tx.source
+            h = envelope.hash_meta()
+        except Exception:
+            with self.__lock:
+                self.__rejected += 1
+            return Ledger.__reply(Ledger.__error(400, 'Transaction Malformed'))
+
+        with self.__lock:
+            self.__hold(source, tx.sequence)
+            response = self.__submit(te, envelope, tx, source, h)
+            if 'hash' not in response:
+                self.__rejected += 1
+        return Ledger.__reply(response)
+
+
+    def __hold(self, source, sequence):
+        '''
+        Wait until the predecessors of a transaction submitted ahead of its
+        account sequence number are applied, for at most HOLD_TIMEOUT
+        seconds. Called with the lock held.
+        '''
+        deadline = time.monotonic() + HOLD_TIMEOUT
+        while True:
+            account = self.__accounts.get(source)
+            remaining = deadline - time.monotonic()
+            if account is None or not account[0] + 1 < sequence <= account[0] + self.__ahead or remaining <= 0:
+                return
+            self.__lock.wait(remaining)
+
+
+    def __submit(self, te, envelope, tx, source, h):
+        '''
+        Check and apply the parsed transaction (see submit).
+        '''
+        account = self.__accounts.get(source)
+        if account is None:
+            return Ledger.__error(400, 'Transaction Failed', 'tx_no_source_account')
+        if tx.sequence != account[0] + 1:
+            return Ledger.__error(400, 'Transaction Failed', 'tx_bad_seq')
+        if not self.__signed(envelope, source, h):
+            return Ledger.__error(400, 'Transaction Failed', 'tx_bad_auth')
+        if account[1] - tx.fee < BASE_RESERVE:
+            return Ledger.__error(400, 'Transaction Failed', 'tx_insufficient_balance')
+
+        # the sequence number and the fee are consumed even if an operation fails
+        account[0] = tx.sequence
+        account[1] -= tx.fee
+        self.__lock.notify_all()
+        applied, codes = self.__apply(source, tx.operations)
+        if applied is None:
+            return Ledger.__error(400, 'Transaction Failed', 'tx_failed', codes)
+
+        if self.__count >= self.__capacity:
+            self.__ledger += 1
+            self.__count = 0
+        self.__count += 1
+
+        token = (self.__ledger << 32) | (self.__count << 12)
+        memo_type, memo = Ledger.__memo(tx.memo)
+        self.__index[token] = len(self.__transactions)
+        self.__hashes[h.hex()] = token
+        self.__transactions.append((token, h, self.__ledger, source, tx.sequence, tx.fee, memo_type, memo,
+                                    tuple(applied)))
+
+        self.__history.setdefault(source, []).append(token)
+        for i, (_, sender, destination, _) in enumerate(applied):
+            for address in (sender, destination):
+                history = self.__history.setdefault(address, [])
+                if len(history) == 0 or history[-1] != token:
+                    history.append(token)
+                payments = self.__payments.setdefault(address, [])
+                if len(payments) == 0 or payments[-1] != token + i + 1:
+                    payments.append(token + i + 1)
+
+        return {'hash': h.hex(), 'ledger': self.__ledger, 'envelope_xdr': te.decode() if isinstance(te, bytes) else te}
+
+
+    def account(self, address):
+        '''
+        Returns the details of a single account.
+
+        Args:
+            address: The Stellar address of the account.
+
+        Returns:
+            The account details as dictionary, HorizonError is raised if
+            the account does not exist.
+        '''
+        with self.__lock:
+            account = self.__accounts.get(address)
+            if account is None:
+                return Ledger.__reply(Ledger.__error(404, 'Resource Missing'))
+
+            return {'id': address, 'account_id': address, 'sequence': str(account[0]),
+                    'balances': [{'asset_type': 'native', 'balance': Ledger.__amount(account[1])}]}
+
+
+    def __transaction(self, token):
+        '''
+        Build the record of the transaction.
+
+        Args:
+            token: The paging token of the transaction.
+
+        Returns:
+            The transaction record as dictionary.
+        '''
+        token, h, ledger, source, sequence, fee, memo_type, memo, operations = \
+            self.__transactions[self.__index[token]]
+        record = {'id': h.hex(), 'paging_token': str(token), 'hash': h.hex(), 'ledger': ledger,
+                  'created_at': self.__time(ledger), 'source_account': source,
+                  'source_account_sequence': str(sequence), 'fee_paid': fee,
+                  'operation_count': len(operations), 'memo_type': memo_type}
+        if memo is not None:
+            record['memo'] = memo
+
+        return record
+
+
+    def __operation(self, token, join):
+        '''
+        Build the record of the payment operation.
+
+        Args:
+            token: The paging token of the operation.
+            join: Embed the record of the transaction.
+
+        Returns:
+            The operation record as dictionary.
+        '''
+        t = self.__transactions[self.__index[token & ~0xFFF]]
+        kind, sender, destination, amount = t[8][(token & 0xFFF) - 1]
+        record = {'id': str(token), 'paging_token': str(token), 'source_account': sender, 'type': kind,
+                  'created_at': self.__time(t[2]), 'transaction_hash': t[1].hex()}
+        if kind == 'payment':
+            record.update({'type_i': 1, 'asset_type': 'native', 'from': sender, 'to': destination,
+                           'amount': Ledger.__amount(amount)})
+        else:
+            record.update({'type_i': 0, 'funder': sender, 'account': destination,
+                           'starting_balance': Ledger.__amount(amount)})
+        if join:
+            record['transaction'] = self.__transaction(token & ~0xFFF)
+
+        return record
+
+
+    def __page(self, tokens, cursor, order, limit):
+        '''
+        Select a page of paging tokens.
+
+        Args:
+            tokens: The ordered paging tokens.
+            cursor: The paging token to start after, None for the start
+                    (or end) of the list.
+            order: Either 'asc' or 'desc'.
+            limit: The maximum number of tokens.
+
+        Returns:
+            The paging tokens of the page in the requested order.
+        '''
+        limit = max(1, min(int(limit), 200))
+        if cursor == 'now':
+            return [] if order == 'asc' else tokens[-limit:][::-1]
+        if order == 'asc':
+            start = 0 if cursor in (None, '') else bisect_right(tokens, int(cursor))
+            return tokens[start:start + limit]
+
+        end = len(tokens) if cursor in (None, '') else bisect_left(tokens, int(cursor))
+        return tokens[max(0, end - limit):end][::-1]
+
+
+    def account_transactions(self, address, cursor = None, order = 'asc', limit = 10, sse = False):
+        '''
+        Returns a page of transactions that affected the account, or the
+        stream of the following transactions.
+
+        Args:
+            address: The Stellar address of the account.
+            cursor: The paging token to start after, 'now' for the latest.
+            order: Either 'asc' or 'desc'.
+            limit: The maximum number of records.
+            sse: Return a generator of server-sent events instead.
+
+        Returns:
+            The page of transactions as dictionary, or the generator of
+            the transaction events.
+        '''
+        if sse:
+            return self.__stream(address, cursor)
+
+        with self.__lock:
+            tokens = self.__page(self.__history.get(address, []), cursor, order, limit)
+            return {'_embedded': {'records': [self.__transaction(token) for token in tokens]}}
+
+
+    def __stream(self, address, cursor):
+        '''
+        Yield the transactions affecting the account after the cursor as
+        they are submitted, the first event being the stream greeting.
+
+        Args:
+            address: The Stellar address of the account.
+            cursor: The paging token to start after, 'now' for the latest.
+
+        Returns:
+            Generator of the transaction events.
+        '''
+        yield Event('"hello"')
+
+        with self.__lock:
+            history = self.__history.setdefault(address, [])
+            i = len(history) if cursor == 'now' else bisect_right(history, int(cursor or 0))
+
+        while True:
+            with self.__lock:
+                while i >= len(history):
+                    self.__lock.wait()
+                records = [self.__transaction(token) for token in history[i:]]
+                i = len(history)
+            for record in records:
+                yield Event(json.dumps(record))
+
+
+    def query(self, rel_url, params = None):
+        '''
+        Returns the response of an endpoint, only the account details, the
+        transactions and payments of an account and the transaction details
+        are supported.
+
+        Args:
+            rel_url: The API endpoint, e.g. '/accounts/{address}/payments'
+                     or '/transactions/{hash}'.
+            params: The query parameters as dictionary, the operations are
+                    joined with their transactions if 'join' is
+                    'transactions'.
+
+        Returns:
+            The response as dictionary, HorizonError is raised for the
+            unknown resources.
+        '''
+        params = params or {}
+        cursor, order, limit = params.get('cursor'), params.get('order', 'asc'), params.get('limit', 10)
+
+        path = rel_url.strip('/').split('/')
+        if len(path) == 2 and path[0] == 'accounts':
+            return self.account(path[1])
+        if len(path) == 2 and path[0] == 'transactions':
+            with self.__lock:
+                if path[1] in self.__hashes:
+                    return self.__transaction(self.__hashes[path[1]])
+        if len(path) == 3 and path[0] == 'accounts' and path[2] == 'transactions':
+            return self.account_transactions(path[1], cursor, order, limit)
+        if len(path) == 3 and path[0] == 'accounts' and path[2] == 'payments':
+            with self.__lock:
+                tokens = self.__page(self.__payments.get(path[1], []), cursor, order, limit)
+                join = params.get('join') == 'transactions'
+                return {'_embedded': {'records': [self.__operation(token, join) for token in tokens]}}
+
+        return Ledger.__reply(Ledger.__error(404, 'Resource Missing'))
+
+
+class AsyncLedger:
+    def __init__(self, ledger):
+        '''
+        Asynchronous interface of a Ledger, for the asynchronous Whisperer
+        methods and the Monitor (see aiohorizon.AsyncHorizon).
+
+        Args:
+            ledger: The simulated Ledger.
+
+        Returns:
+            Instance of the object.
+        '''
+        self.horizon = ledger.horizon
+        self.ledger = ledger
+
+
+    async def account(self, address):
+        return self.ledger.account(address)
+
+
+    async def account_transactions(self, address, cursor = None, order = 'asc', limit = 10):
+        return self.ledger.account_transactions(address, cursor = cursor, order = order, limit = limit)
+
+
+    async def query(self, rel_url, params = None):
+        return self.ledger.query(rel_url, params)
+
+
+    async def submit(self, te):
+        return self.ledger.submit(te)
+
+
+    async def Close(self):
+        pass
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, *args):
+        pass
+
+
+if __name__ == '__main__':
+
+    from stellar_base.keypair import Keypair
+    import whisperer
+
+    class Unavailable:
+        def __init__(self, ledger):
+            '''
+            Ledger failing the submissions of the listed sequence numbers,
+            as an overloaded Horizon would.
+            '''
+            self.ledger = ledger
+            self.failing = set()
+
+        def __getattr__(self, name):
+            return getattr(self.ledger, name)
+
+        def submit(self, te):
+            if TransactionEnvelope.from_xdr(te).tx.sequence in self.failing:
+                raise HorizonError('Invalid horizon reply: [503] Service Unavailable', 503)
+            return self.ledger.submit(te)
+
+    whisperer.PIPELINE_RETRIES = 0
+    ledger = Ledger()
+    alice, bob = Keypair.random(), Keypair.random()
+    for kp in (alice, bob):
+        ledger.Fund(kp.address().decode())
+    horizon = Unavailable(ledger)
+    W = whisperer.Whisperer(alice, horizon = horizon)
+    first, second = b'FIRST-' * 20, b'second message'
+
+    print('\nInterrupted message test')
+    horizon.failing = {int(ledger.account(alice.address().decode())['sequence']) + 3}
+    status = W.Send(bob.address().decode(), first, 0)
+    print(' - First message:  {}'.format([s['success'] for s in status]))
+    assert not status[2]['success']
+
+    # the next message must not follow the fragments of the interrupted one
+    status = W.Send(bob.address().decode(), second, 0)
+    print(' - Second message, Horizon still failing: {}'.format([s['success'] for s in status]))
+    assert status == []
+
+    horizon.failing = set()
+    status = W.Send(bob.address().decode(), second, 0)
+    print(' - Second message: {}'.format([s['success'] for s in status]))
+    assert all(s['success'] for s in status)
+
+    messages = [m[2] for m in whisperer.Whisperer(bob, horizon = ledger).Read(tail = 2)]
+    print(' - Received: {}'.format(messages))
+    assert sorted(messages) == sorted([first, second])
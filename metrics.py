@@ -0,0 +1,242 @@
+from bisect import bisect_left
+import threading
+import time
+
+
+__all__ = ['Metrics', 'NULL_TIMER']
+
+
+# Upper bounds (in seconds) of the timing histogram buckets
+BUCKETS = (0.00001, 0.0001, 0.001, 0.01, 0.1, 1.0, 10.0)
+
+# The metrics recorded by Whisperer, the timing histograms end with
+# _seconds and the counters with _total
+DESCRIPTIONS = {
+    'dh_seconds': 'Time spent computing X25519 shared secrets.',
+    'encode_seconds': 'Time spent encoding messages.',
+    'encapsulate_seconds': 'Time spent splitting messages into blocks.',
+    'encrypt_seconds': 'Time spent encrypting message blocks.',
+    'sign_seconds': 'Time spent building and signing fragment transactions.',
+    'account_seconds': 'Duration of the account sequence number requests.',
+    'submit_seconds': 'Duration of the fragment transaction submissions.',
+    'fetch_seconds': 'Duration of the transaction page requests.',
+    'decrypt_seconds': 'Time spent decrypting message blocks.',
+    'reassemble_seconds': 'Time spent reassembling messages from blocks.',
+    'store_seconds': 'Time spent saving messages to the message store.',
+    'decode_seconds': 'Time spent decoding messages.',
+    'messages_sent_total': 'Messages sent.',
+    'bytes_sent_total': 'Bytes of the sent messages before encoding.',
+    'fragments_sent_total': 'Fragment transactions accepted by Horizon.',
+    'fragments_failed_total': 'Fragment transactions that could not be sent.',
+    'resubmissions_total': 'Fragment transactions resubmitted after a failed or rejected submission.',
+    'request_errors_total': 'Horizon requests that raised an error.',
+    'pages_total': 'Pages of transactions fetched.',
+    'blocks_received_total': 'Message blocks decrypted.',
+    'messages_received_total': 'Messages reassembled.',
+    'bytes_received_total': 'Bytes of the reassembled messages before decoding.',
+}
+
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+
+    def __exit__(self, *args):
+        self.metrics.Observe(self.name, time.perf_counter() - self.start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        pass
+
+
+# The timer used when the metrics are disabled
+NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    def __init__(self, callback = None, buckets = BUCKETS, namespace = 'whisper'):
+        '''
+        Collect the timing histograms and the counters reported by Whisperer
+        instances (see DESCRIPTIONS). One instance can be shared by many
+        Whisperer instances and threads.
+
+        Args:
+            callback: Function called with the name and the value of each
+                      observation, i.e. the duration in seconds for the
+                      histograms and the increment for the counters.
+            buckets: The upper bounds of the histogram buckets in seconds.
+            namespace: Prefix of the exported metric names.
+
+        Returns:
+            Instance of the object.
+        '''
+        self.__callback = callback
+        self.__buckets = tuple(buckets)
+        self.__namespace = namespace
+        self.__lock = threading.Lock()
+        # name -> [bucket counts, sum, count]
+        self.__histograms = {}
+        # name -> value
+        self.__counters = {}
+
+
+    def Time(self, name):
+        '''
+        Time a block of code.
+
+        Args:
+            name: Name of the histogram.
+
+        Returns:
+            Context manager observing the duration of the block.
+        '''
+        return _Timer(self, name)
+
+
+    def Observe(self, name, value):
+        '''
+        Add an observation to a histogram.
+
+        Args:
+            name: Name of the histogram.
+            value: The observed value in seconds.
+
+        Returns:
+            None.
+        '''
+        i = bisect_left(self.__buckets, value)
+        with self.__lock:
+            h = self.__histograms.get(name)
+            if h is None:
+                h = self.__histograms[name] = [[0] * (len(self.__buckets) + 1), 0.0, 0]
+            h[0][i] += 1
+            h[1] += value
+            h[2] += 1
+
+        if self.__callback is not None:
+            self.__callback(name, value)
+
+
+    def Count(self, name, n = 1):
+        '''
+        Increment a counter.
+
+        Args:
+            name: Name of the counter.
+            n: The increment.
+
+        Returns:
+            None.
+        '''
+        with self.__lock:
+            self.__counters[name] = self.__counters.get(name, 0) + n
+
+        if self.__callback is not None:
+            self.__callback(name, n)
+
+
+    def Reset(self):
+        '''
+        Clear all histograms and counters.
+        '''
+        with self.__lock:
+            self.__histograms.clear()
+            self.__counters.clear()
+
+
+    def Snapshot(self):
+        '''
+        Return the current values of the metrics.
+
+        Returns:
+            Dictionary with the keys 'counters' (name -> value) and
+            'histograms' (name -> dictionary with the keys 'count', 'sum'
+            and 'buckets', the cumulative counts per upper bound).
+        '''
+        with self.__lock:
+            histograms = {}
+            for name, (counts, total, count) in self.__histograms.items():
+                cumulative, buckets = 0, []
+                for bound, c in zip(self.__buckets + (float('inf'),), counts):
+                    cumulative += c
+                    buckets.append((bound, cumulative))
+                histograms[name] = {'count': count, 'sum': total, 'buckets': buckets}
+
+            return {'counters': dict(self.__counters), 'histograms': histograms}
+
+
+    def Prometheus(self):
+        '''
+        Export the metrics in the Prometheus text exposition format.
+
+        Returns:
+            The metrics as string.
+        '''
+        snapshot = self.Snapshot()
+        lines = []
+        for name, h in sorted(snapshot['histograms'].items()):
+            metric = '{}_{}'.format(self.__namespace, name)
+            lines.append('# HELP {} {}'.format(metric, DESCRIPTIONS.get(name, name)))
+            lines.append('# TYPE {} histogram'.format(metric))
+            for bound, c in h['buckets']:
+                lines.append('{}_bucket{{le="{}"}} {}'.format(metric, '+Inf' if bound == float('inf') else repr(bound), c))
+            lines.append('{}_sum {}'.format(metric, repr(h['sum'])))
+            lines.append('{}_count {}'.format(metric, h['count']))
+        for name, value in sorted(snapshot['counters'].items()):
+            metric = '{}_{}'.format(self.__namespace, name)
+            lines.append('# HELP {} {}'.format(metric, DESCRIPTIONS.get(name, name)))
+            lines.append('# TYPE {} counter'.format(metric))
+            lines.append('{} {}'.format(metric, value))
+
+        return '\n'.join(lines) + '\n'
+
+
+    def Serve(self, port, address = '127.0.0.1'):
+        '''
+        Serve the metrics to Prometheus over HTTP from a background thread.
+        The metrics are served on the loopback interface only, unless
+        another address is given.
+
+        Args:
+            port: The TCP port.
+            address: The address to listen on, '' for all interfaces.
+
+        Returns:
+            The HTTP server, call its shutdown method to stop serving.
+        '''
+        from http.server import HTTPServer, BaseHTTPRequestHandler
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.Prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer((address, port), Handler)
+        threading.Thread(target = server.serve_forever, daemon = True).start()
+
+        return server
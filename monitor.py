@@ -0,0 +1,162 @@
+import asyncio
+import random
+import time
+
+from whisperer import Whisperer
+
+
+__all__ = ['ThrottledHorizon', 'Monitor']
+
+
+class ThrottledHorizon:
+    def __init__(self, horizon, rate = 10.0, burst = 20):
+        '''
+        Wrap an asynchronous Horizon client with a token bucket rate
+        limiter shared by all requests going through it.
+
+        Args:
+            horizon: The asynchronous Horizon client (see AsyncHorizon).
+            rate: The sustained number of requests per second.
+            burst: The maximum number of requests issued at once.
+
+        Returns:
+            Instance of the object.
+        '''
+        self.horizon = horizon.horizon
+        self.__horizon = horizon
+        self.__rate = float(rate)
+        self.__burst = float(burst)
+        self.__tokens = float(burst)
+        self.__last = time.monotonic()
+        self.__lock = None
+
+
+    async def Acquire(self):
+        '''
+        Wait until a request may be issued.
+        '''
+        if self.__lock is None:
+            self.__lock = asyncio.Lock()
+
+        # the lock keeps the waiting requests in FIFO order
+        async with self.__lock:
+            while True:
+                now = time.monotonic()
+                self.__tokens = min(self.__burst, self.__tokens + (now - self.__last) * self.__rate)
+                self.__last = now
+                if self.__tokens >= 1:
+                    self.__tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.__tokens) / self.__rate)
+
+
+    async def account(self, address):
+        await self.Acquire()
+        return await self.__horizon.account(address)
+
+
+    async def account_transactions(self, address, cursor = None, order = 'asc', limit = 10):
+        await self.Acquire()
+        return await self.__horizon.account_transactions(address, cursor = cursor, order = order, limit = limit)
+
+
+    async def query(self, rel_url, params = None):
+        await self.Acquire()
+        return await self.__horizon.query(rel_url, params)
+
+
+    async def submit(self, te):
+        await self.Acquire()
+        return await self.__horizon.submit(te)
+
+
+class Monitor:
+    def __init__(self, keypairs, horizon, store = None, callback = None, queue = None,
+                 interval = 5.0, rate = 10.0, burst = 20, metrics = None):
+        '''
+        Monitor the inboxes of many accounts concurrently. Each account is
+        polled by its own task, so a slow account does not hold back the
+        others, while all the requests share one Horizon client and rate
+        limiter. The newly received messages are passed to the callback
+        and/or put into the queue as (address, [date, sender, message])
+        tuples, where address is the receiving account.
+
+        Args:
+            keypairs: The Stellar keypairs of the monitored accounts.
+            horizon: The asynchronous Horizon client (see AsyncHorizon).
+            store: The MessageStore shared by all the accounts.
+            callback: Function (or coroutine function) called with the
+                      receiving address and the message.
+            queue: An asyncio.Queue receiving the messages.
+            interval: The polling interval of each account in seconds.
+            rate: The sustained number of Horizon requests per second.
+            burst: The maximum number of Horizon requests issued at once.
+            metrics: The metrics.Metrics instance shared by all the accounts.
+
+        Returns:
+            Instance of the object.
+        '''
+        self.__horizon = ThrottledHorizon(horizon, rate, burst)
+        self.__whisperers = [Whisperer(kp, store, self.__horizon, metrics) for kp in keypairs]
+        self.__callback = callback
+        self.__queue = queue
+        self.__interval = interval
+        self.__running = False
+
+
+    async def __emit(self, address, message):
+        '''
+        Deliver a new message to the callback and the queue.
+        '''
+        if self.__callback is not None:
+            res = self.__callback(address, message)
+            if asyncio.iscoroutine(res):
+                await res
+        if self.__queue is not None:
+            await self.__queue.put((address, message))
+
+
+    async def __poll(self, W):
+        '''
+        Poll the inbox of a single account until stopped. Failures are
+        retried with an exponentially growing delay.
+
+        Args:
+            W: The Whisperer instance of the account.
+        '''
+        # spread the first polls over the polling interval
+        await asyncio.sleep(random.uniform(0, self.__interval))
+
+        delay = self.__interval
+        while self.__running:
+            try:
+                for message in await W.FetchAsync():
+                    await self.__emit(W.Address(), message)
+                delay = self.__interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print('\nError: polling {} failed ({})!'.format(W.Address(), e))
+                delay = min(2 * delay, 60 * self.__interval)
+
+            await asyncio.sleep(delay * random.uniform(0.9, 1.1))
+
+
+    async def Run(self):
+        '''
+        Monitor all the accounts until Stop is called or the task is cancelled.
+        '''
+        self.__running = True
+        tasks = [asyncio.ensure_future(self.__poll(W)) for W in self.__whisperers]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for t in tasks:
+                t.cancel()
+
+
+    def Stop(self):
+        '''
+        Stop monitoring after the polls in progress are finished.
+        '''
+        self.__running = False
@@ -0,0 +1,221 @@
+from datetime import datetime
+import json
+from records import Block, Message
+
+
+__all__ = ['Reassembler']
+
+
+# Maximum time (in seconds) between the first and the last block of a message.
+# If the received transactions were scanned this far back before the first
+# block of a message without finding its predecessor, the message is complete.
+REASSEMBLY_SPAN = 600
+
+
+class Reassembler:
+    def __init__(self, state = None):
+        '''
+        Reassemble messages from decrypted blocks arriving in the order of
+        the transactions of each sender, or in the reverse order when the
+        history is read back. A zero-length block that arrives after a
+        later transaction of its sender, without its successor, is taken
+        for the end of an aborted message.
+
+        The blocks of a message are sent with consecutive sequence numbers
+        of the sending account, all but the last one having zero length in
+        the header. The blocks are therefore kept per sender, keyed by the
+        sequence number, and a message is complete when its last block is
+        preceded by a contiguous run of zero-length blocks that starts right
+        after a known message boundary. The boundary is known when:
+        - the preceding block is the last block of another message, or
+        - an earlier transaction of the same sender was received, so the
+          missing preceding transaction was not addressed to us, or
+        - the received transactions were scanned back REASSEMBLY_SPAN
+          seconds before the first block, or to the beginning of history.
+        Zero-length blocks followed by a gap in the sequence numbers belong
+        to an aborted message and are dropped.
+
+        Args:
+            state: The state returned by State, to resume the reassembly.
+
+        Returns:
+            Instance of the object.
+        '''
+        # sender -> {sequence: Block holding the decrypted block}
+        self.__blocks = {}
+        # sender -> lowest and highest sequence number seen
+        self.__lowest = {}
+        self.__highest = {}
+        # sender -> {sequence of last block: sequence of first block found so far}
+        self.__waiting = {}
+        # timestamp of the oldest scanned transaction, start of history reached
+        self.__edge = None
+        self.__exhausted = False
+
+        if state is not None:
+            self.__load(state)
+
+
+    def __load(self, state):
+        '''
+        Restore the state returned by State.
+        '''
+        try:
+            state = json.loads(state)
+        except (TypeError, ValueError):
+            return
+
+        self.__edge = state.get('edge')
+        self.__exhausted = state.get('exhausted', False)
+        for sender, (lowest, highest, blocks) in state.get('senders', {}).items():
+            self.__lowest[sender] = lowest
+            self.__highest[sender] = highest
+            self.__blocks[sender] = {int(q): Block(sender, int(q), bytes.fromhex(b[0]), b[1], b[2], b[3])
+                                     for q, b in blocks.items()}
+            self.__waiting[sender] = {q: q for q, b in self.__blocks[sender].items() if b.data[0] >> 3 > 0}
+
+
+    def State(self):
+        '''
+        Return the reassembly state, i.e. the blocks of incomplete messages.
+
+        Returns:
+            The state serialized as JSON string.
+        '''
+        senders = {}
+        for sender, blocks in self.__blocks.items():
+            if len(blocks) > 0:
+                senders[sender] = [self.__lowest[sender], self.__highest[sender],
+                                   {q: [b.data.hex(), b.created_at, b.hash, b.paging_token] for q, b in blocks.items()}]
+
+        return json.dumps({'edge': self.__edge, 'exhausted': self.__exhausted, 'senders': senders})
+
+
+    def Waiting(self):
+        '''
+        Tell if there are complete messages waiting for their start
+        to be confirmed by scanning further back in the history.
+
+        Returns:
+            True if there are waiting messages, False otherwise.
+        '''
+        return any(len(w) > 0 for w in self.__waiting.values())
+
+
+    def Add(self, t, block):
+        '''
+        Add the decrypted block.
+
+        Args:
+            t: The Block record of the transaction carrying the block.
+            block: The decrypted 32 byte block.
+
+        Returns:
+            List of the completed messages (Message records).
+        '''
+        sender = t.sender
+        q = t.sequence
+
+        blocks = self.__blocks.setdefault(sender, {})
+        waiting = self.__waiting.setdefault(sender, {})
+        previous = self.__highest.get(sender, q)
+        self.__lowest[sender] = min(q, self.__lowest.get(sender, q))
+        self.__highest[sender] = max(q, previous)
+
+        blocks[q] = Block(sender, q, bytes(block), t.created_at, t.hash, t.paging_token)
+        if block[0] >> 3 > 0:
+            waiting[q] = q
+
+        # drop the zero-length blocks that are not followed by another block,
+        # although the sender already sent a later transaction
+        for s in (previous, q):
+            if s in blocks and blocks[s].data[0] >> 3 == 0 and s + 1 not in blocks and self.__highest[sender] > s:
+                self.__drop(sender, s)
+
+        return self.__resolve(sender)
+
+
+    def Window(self, edge, exhausted):
+        '''
+        Extend the scanned window back to the given transaction timestamp.
+
+        Args:
+            edge: Timestamp of the oldest scanned transaction, None if
+                  unchanged.
+            exhausted: True if the beginning of the history was reached.
+
+        Returns:
+            List of the completed messages (see Add).
+        '''
+        if edge is not None and (self.__edge is None or edge < self.__edge):
+            self.__edge = edge
+        self.__exhausted = self.__exhausted or exhausted
+
+        messages = []
+        for sender in list(self.__waiting.keys()):
+            messages += self.__resolve(sender)
+
+        return messages
+
+
+    @classmethod
+    def __time(cls, created_at):
+        '''
+        Parse the Horizon transaction timestamp.
+
+        Args:
+            created_at: The timestamp, e.g. '2018-04-24T19:01:21Z'.
+
+        Returns:
+            The timestamp as datetime.
+        '''
+        return datetime.strptime(created_at, '%Y-%m-%dT%H:%M:%SZ')
+
+
+    def __drop(self, sender, s):
+        '''
+        Drop the run of zero-length blocks ending with sequence number s.
+        '''
+        blocks = self.__blocks[sender]
+        while s in blocks and blocks[s].data[0] >> 3 == 0:
+            del blocks[s]
+            s -= 1
+
+
+    def __resolve(self, sender):
+        '''
+        Complete the waiting messages of the sender whose start is known.
+
+        Args:
+            sender: The Stellar address of the sender.
+
+        Returns:
+            List of the completed messages (see Add).
+        '''
+        blocks = self.__blocks[sender]
+        waiting = self.__waiting[sender]
+
+        messages = []
+        for last in sorted(waiting.keys()):
+            # extend the run of zero-length blocks preceding the last block
+            first = waiting[last]
+            while first - 1 in blocks and blocks[first - 1].data[0] >> 3 == 0:
+                first -= 1
+            waiting[last] = first
+
+            # check if the message boundary before the run is known
+            if not (first - 1 in blocks or self.__lowest[sender] <= first - 1 or self.__exhausted or
+                    (self.__edge is not None and (Reassembler.__time(blocks[first].created_at) -
+                                                  Reassembler.__time(self.__edge)).total_seconds() >= REASSEMBLY_SPAN)):
+                continue
+
+            # assemble the message
+            end = blocks[last]
+            payload = b''.join(blocks[s].data[1:] for s in range(first, last)) + end.data[1:(end.data[0] >> 3) + 1]
+            messages.append(Message(end.created_at, sender, payload, end.data[0] & 7, end.hash, end.paging_token))
+
+            for s in range(first, last + 1):
+                del blocks[s]
+            del waiting[last]
+
+        return messages
@@ -0,0 +1,87 @@
+import base64
+import binascii
+
+
+__all__ = ['Block', 'Message']
+
+
+class Block:
+    __slots__ = ('sender', 'sequence', 'data', 'created_at', 'hash', 'paging_token')
+
+    def __init__(self, sender, sequence, data, created_at, hash, paging_token):
+        '''
+        A transaction that may carry a message block, reduced to the fields
+        needed for reading the messages. The Horizon transaction records are
+        converted right after they are received (see FromRecord), so that
+        only the 32 byte blocks are kept rather than the JSON documents.
+
+        Args:
+            sender: The Stellar address of the source account.
+            sequence: The sequence number of the transaction.
+            data: The 32 byte block carried in the hash memo, encrypted as
+                  received or decrypted once stored by the Reassembler,
+                  None if the transaction carries no block.
+            created_at: The timestamp, e.g. '2018-04-24T19:01:21Z'.
+            hash: The hash of the transaction.
+            paging_token: The Horizon paging token of the transaction.
+
+        Returns:
+            Instance of the object.
+        '''
+        self.sender = sender
+        self.sequence = sequence
+        self.data = data
+        self.created_at = created_at
+        self.hash = hash
+        self.paging_token = paging_token
+
+
+    @classmethod
+    def FromRecord(cls, t, paging_token = None):
+        '''
+        Extract the block from a Horizon transaction record.
+
+        Args:
+            t: The transaction record as dictionary.
+            paging_token: Replaces the paging token of the transaction.
+
+        Returns:
+            The Block instance.
+        '''
+        data = None
+        if t.get('memo_type') == 'hash':
+            try:
+                data = base64.b64decode(t.get('memo'))
+            except (TypeError, binascii.Error):
+                pass
+            if data is not None and len(data) != 32:
+                data = None
+
+        return Block(t.get('source_account'), int(t.get('source_account_sequence') or 0), data, t.get('created_at'),
+                     t.get('hash'), paging_token if paging_token is not None else t.get('paging_token'))
+
+
+class Message:
+    __slots__ = ('date', 'sender', 'payload', 'encoding', 'hash', 'paging_token')
+
+    def __init__(self, date, sender, payload, encoding, hash, paging_token):
+        '''
+        A reassembled message, before decoding.
+
+        Args:
+            date: The timestamp of the transaction carrying the last block.
+            sender: The Stellar address of the sender.
+            payload: The encoded message as bytes.
+            encoding: The encoding of the message.
+            hash: The hash of the transaction carrying the last block.
+            paging_token: The paging token of that transaction.
+
+        Returns:
+            Instance of the object.
+        '''
+        self.date = date
+        self.sender = sender
+        self.payload = payload
+        self.encoding = encoding
+        self.hash = hash
+        self.paging_token = paging_token
@@ -0,0 +1,143 @@
+import threading
+
+
+__all__ = ['Sequencer']
+
+
+class Sequencer:
+    def __init__(self):
+        '''
+        Allocate the sequence numbers of the sending account locally, so
+        that consecutive messages can be sent without asking Horizon for
+        the account sequence number first. Each message reserves a range
+        of sequence numbers, one per fragment, following the range of the
+        previous message. The sequence number is requested from Horizon
+        only for the first reservation and after Invalidate, i.e. when a
+        submission failed and the account sequence number is no longer
+        known. The reservations can be made from many threads, and from
+        many coroutines of an event loop.
+
+        Returns:
+            Instance of the object.
+        '''
+        self.__lock = threading.Lock()
+        # the last reserved sequence number, None if not known
+        self.__sequence = None
+        # incremented by Invalidate, to drop the outdated synchronizations
+        self.__generation = 0
+
+
+    def __take(self, n):
+        '''
+        Reserve n sequence numbers if the account sequence number is known.
+
+        Args:
+            n: The number of sequence numbers to reserve.
+
+        Returns:
+            The tuple (sequence, generation), where sequence is the sequence
+            number preceding the reserved range, None if the account sequence
+            number must be requested first.
+        '''
+        with self.__lock:
+            if self.__sequence is None:
+                return None, self.__generation
+            sequence = self.__sequence
+            self.__sequence += n
+            return sequence, self.__generation
+
+
+    def __sync(self, sequence, generation):
+        '''
+        Set the account sequence number requested from Horizon, unless
+        another request already did so or it was invalidated meanwhile.
+        '''
+        with self.__lock:
+            if self.__sequence is None and self.__generation == generation:
+                self.__sequence = sequence
+
+
+    def Reserve(self, n, fetch):
+        '''
+        Reserve a range of n consecutive sequence numbers.
+
+        Args:
+            n: The number of sequence numbers to reserve.
+            fetch: Function returning the account sequence number from
+                   Horizon, called only if it is not known.
+
+        Returns:
+            The sequence number preceding the reserved range, i.e. the
+            transactions are sent with the sequence numbers sequence + 1
+            to sequence + n.
+        '''
+        while True:
+            sequence, generation = self.__take(n)
+            if sequence is not None:
+                return sequence
+            self.__sync(fetch(), generation)
+
+
+    async def ReserveAsync(self, n, fetch):
+        '''
+        Asynchronous version of Reserve.
+
+        Args:
+            n: The number of sequence numbers to reserve.
+            fetch: Coroutine function returning the account sequence number
+                   from Horizon, awaited only if it is not known.
+
+        Returns:
+            The sequence number preceding the reserved range.
+        '''
+        while True:
+            sequence, generation = self.__take(n)
+            if sequence is not None:
+                return sequence
+            self.__sync(await fetch(), generation)
+
+
+    def Release(self, sequence, n):
+        '''
+        Return an unused range of sequence numbers. The range can be taken
+        back only if it is the last one reserved, otherwise the account
+        sequence number is invalidated, as the following ranges can no
+        longer be sent.
+
+        Args:
+            sequence: The sequence number returned by Reserve.
+            n: The number of reserved sequence numbers.
+
+        Returns:
+            None.
+        '''
+        with self.__lock:
+            if self.__sequence == sequence + n:
+                self.__sequence = sequence
+            elif self.__sequence is not None:
+                self.__sequence = None
+                self.__generation += 1
+
+
+    def Invalidate(self):
+        '''
+        Forget the account sequence number, so that the next reservation
+        requests it from Horizon.
+
+        Returns:
+            None.
+        '''
+        with self.__lock:
+            self.__sequence = None
+            self.__generation += 1
+
+
+    def Sequence(self):
+        '''
+        Return the last reserved sequence number.
+
+        Returns:
+            The sequence number, None if not known.
+        '''
+        with self.__lock:
+            return self.__sequence
@@ -0,0 +1,278 @@
+from collections import Counter
+import re
+
+__all__ = ['Compress', 'Decompress', 'CompressTrained', 'DecompressTrained', 'TrainCodebook']
+
+
+# the smaz codebook, the code of each entry is its index (0 - 253)
+__smaz = (b" ", b"the", b"e", b"t", b"a", b"of", b"o", b"and", b"i", b"n", b"s", b"e ", b"r", b" th",
+          b" t", b"in", b"he", b"th", b"h", b"he ", b"to", b"\r\n", b"l", b"s ", b"d", b" a", b"an",
+          b"er", b"c", b" o", b"d ", b"on", b" of", b"re", b"of ", b"t ", b", ", b"is", b"u", b"at",
+          b"   ", b"n ", b"or", b"which", b"f", b"m", b"as", b"it", b"that", b"\n", b"was", b"en",
+          b"  ", b" w", b"es", b" an", b" i", b"\r", b"f ", b"g", b"p", b"nd", b" s", b"nd ", b"ed ",
+          b"w", b"ed", b"http://", b"for", b"te", b"ing", b"y ", b"The", b" c", b"ti", b"r ", b"his",
+          b"st", b" in", b"ar", b"nt", b",", b" to", b"y", b"ng", b" h", b"with", b"le", b"al", b"to ",
+          b"b", b"ou", b"be", b"were", b" b", b"se", b"o ", b"ent", b"ha", b"ng ", b"their", b"\"",
+          b"hi", b"from", b" f", b"in ", b"de", b"ion", b"me", b"v", b".", b"ve", b"all", b"re ",
+          b"ri", b"ro", b"is ", b"co", b"f t", b"are", b"ea", b". ", b"her", b" m", b"er ", b" p",
+          b"es ", b"by", b"they", b"di", b"ra", b"ic", b"not", b"s, ", b"d t", b"at ", b"ce", b"la",
+          b"h ", b"ne", b"as ", b"tio", b"on ", b"n t", b"io", b"we", b" a ", b"om", b", a", b"s o",
+          b"ur", b"li", b"ll", b"ch", b"had", b"this", b"e t", b"g ", b"e\r\n", b" wh", b"ere",
+          b" co", b"e o", b"a ", b"us", b" d", b"ss", b"\n\r\n", b"\r\n\r", b"=\"", b" be", b" e",
+          b"s a", b"ma", b"one", b"t t", b"or ", b"but", b"el", b"so", b"l ", b"e s", b"s,", b"no",
+          b"ter", b" wa", b"iv", b"ho", b"e a", b" r", b"hat", b"s t", b"ns", b"ch ", b"wh", b"tr",
+          b"ut", b"/", b"have", b"ly ", b"ta", b" ha", b" on", b"tha", b"-", b" l", b"ati", b"en ",
+          b"pe", b" re", b"there", b"ass", b"si", b" fo", b"wa", b"ec", b"our", b"who", b"its", b"z",
+          b"fo", b"rs", b">", b"ot", b"un", b"<", b"im", b"th ", b"nc", b"ate", b"><", b"ver", b"ad",
+          b" we", b"ly", b"ee", b" n", b"id", b" cl", b"ac", b"il", b"</", b"rt", b" wi", b"div",
+          b"e, ", b" it", b"whi", b" ma", b"ge", b"x", b"e c", b"men", b".com")
+
+def __trie(codebook):
+    '''
+    Build the trie of the codebook entries. Each node maps the next byte
+    to the tuple (code of the entry ending there or None, child node).
+
+    Args:
+        codebook: The codebook entries as byte arrays.
+
+    Returns:
+        The root node of the trie.
+    '''
+    root = {}
+    for c, e in enumerate(codebook):
+        node = root
+        for i, b in enumerate(e):
+            code, child = node.get(b, (None, {}))
+            node[b] = (bytes([c]) if i == len(e) - 1 else code, child)
+            node = child
+
+    return root
+
+
+__smazTrie = __trie(__smaz)
+
+# the codebook trained on the sample messages in training.txt (see TrainCodebook)
+__trained = (b' ', b' a', b' m', b' mor', b' the ', b' w', b'!', b"'", b"'s ", b"'s mee", b"'s meet ", b"'t ",
+             b',', b', ', b', I ', b', c', b', see ', b'.', b'0', b'1', b'2', b'3', b'4', b'5', b'6', b'7',
+             b'8', b'9', b'?', b'A', b'C', b'Ca', b'D', b'E', b'F', b'Fri', b'Friday', b'G', b'H', b'I',
+             b'I ', b'I will ', b'L', b'M', b'P', b'Please ', b'R', b'S', b'T', b'Th', b'Thank', b'The ',
+             b'W', b'Wh', b'What ', b'Y', b'Yes', b'You', b'a', b'ac', b'ag', b'ain ', b'al', b'an', b'and ',
+             b'ank', b'as', b'as ', b'at ', b'ay', b'b', b'bal', b'balan', b'balanc', b'balance ', b'be ',
+             b'be ther', b'bout ', b'c', b'cal', b'call', b'call ', b'ck', b'ck the ', b'con', b'cou',
+             b'coun', b'd', b'd ', b'day', b'day.', b'dd', b'ddres', b'ddress ', b'do', b'e', b'e ', b'e a',
+             b'e at ', b'e.', b'e?', b'ee', b'en', b'er', b'er ', b'es', b'et', b'ew', b'f', b'fin', b'fine',
+             b'for', b'for m', b'for the ', b'g', b'ge', b'go', b'h', b'ha', b'has ', b'has b', b'has bee',
+             b'he', b'hen you ', b'hou', b'i', b'ic', b'ice ', b'id ', b'ig', b'igh', b'in', b'in ', b'ing',
+             b'ir', b'is ', b'it ', b'j', b'k', b'k ', b'k.', b'l', b'l ', b'la', b'las', b'last ', b'lat',
+             b'ld ', b'le', b'leas', b'lease ', b'let', b'lo', b'm', b'm ', b'ma', b'me ', b'mee', b'men',
+             b'mon', b'mone', b'mor', b'my ', b'n', b'n ', b'n you ', b'nee', b'need ', b'new', b'ning',
+             b'ning.', b'no', b'now', b'o', b'of', b'ome ', b'on', b'on ', b'on the ', b"on't ", b'on.',
+             b'or', b'ou', b'out ', b'ow', b'ow a', b'p', b'pay', b'paymen', b'payment ', b'pe', b'pr', b'q',
+             b'r', b're', b're ', b're you ', b'rea', b'res', b'ri', b's', b's ', b's.', b'se', b'see ',
+             b'sen', b'send ', b'send me ', b'so', b'soon.', b't', b't ', b't the ', b't, ', b't.', b'tal',
+             b'te', b'ter', b'th', b'the ', b'ther', b'thing', b'this ', b'to', b'to ', b'today.', b'tomor',
+             b'tomorr', b'tr', b'u', b'un', b'us', b'v', b've ', b've a', b'ver', b'w', b'was ', b'way',
+             b'we ', b'wi', b'wil', b'will ', b'with', b'x', b'y', b'y ', b'y b', b'y.', b'you', b'you ',
+             b'your', b'ything', b'z')
+__trainedTrie = __trie(__trained)
+
+# the verbatim block codes
+__smazVerbatim = re.compile(b'[\xfe\xff]')
+
+
+def __verbatim(data):
+    '''
+    Encode the bytes not found in the smaz codebook: a single byte is
+    prefixed with code 254, longer runs (up to 256 bytes each) with
+    code 255 and the run length minus one.
+
+    Args:
+        data: The unmatched bytes.
+
+    Returns:
+        The encoded bytes.
+    '''
+    res = b''
+    for i in range(0, len(data), 256):
+        chunk = data[i:i + 256]
+        res += (b'\xfe' if len(chunk) == 1 else bytes([255, len(chunk) - 1])) + chunk
+
+    return res
+
+
+def __compress(txt, trie):
+    '''
+    Compress the message by replacing the longest codebook entries found
+    in the trie with their codes, the other bytes are kept verbatim.
+
+    Args:
+        txt: The original message as byte array.
+        trie: The trie of the codebook (see __trie).
+
+    Returns:
+        The compressed message as byte array.
+    '''
+    res = []
+    start = 0
+    pos = 0
+    while pos < len(txt):
+        # walk the trie to find the longest codebook entry at the current position
+        code = None
+        node = trie
+        for i in range(pos, len(txt)):
+            found, node = node.get(txt[i], (None, None))
+            if found is not None:
+                code, end = found, i + 1
+            if not node:
+                break
+
+        if code is None:
+            pos += 1
+            continue
+
+        if start < pos:
+            res.append(__verbatim(txt[start:pos]))
+        res.append(code)
+        pos = start = end
+
+    if start < pos:
+        res.append(__verbatim(txt[start:pos]))
+
+    return b''.join(res)
+
+
+def __decompress(comp, codebook):
+    '''
+    Decompress the message compressed with the codebook. The input
+    is not trusted: a verbatim run cut short by the end of the input
+    yields the bytes present.
+
+    Args:
+        comp: The compressed message as byte array.
+        codebook: The codebook entries as byte arrays.
+
+    Returns:
+        The decompressed message as byte array.
+    '''
+    res = []
+    pos = 0
+    while pos < len(comp):
+        # translate the run of codebook codes up to the next verbatim block
+        verbatim = __smazVerbatim.search(comp, pos)
+        end = verbatim.start() if verbatim is not None else len(comp)
+        res += map(codebook.__getitem__, comp[pos:end])
+        if end == len(comp):
+            break
+
+        # copy the verbatim bytes, a truncated run ends the message
+        if comp[end] == 254:
+            res.append(comp[end + 1:end + 2])
+            pos = end + 2
+        elif end + 1 < len(comp):
+            res.append(comp[end + 2:end + 3 + comp[end + 1]])
+            pos = end + 3 + comp[end + 1]
+        else:
+            break
+
+    return b''.join(res)
+
+
+def Compress(txt):
+    '''
+    Compress the message (provided as byte array) with the
+    SMAZ algorithm. The bytes are matched against the codebook
+    directly, the bytes that cannot be matched (e.g. non-ASCII
+    characters) are kept verbatim.
+
+    Args:
+        txt: The original message encoded as UFT-8 byte array.
+
+    Returns:
+        The smaz compressed text as byte array.
+    '''
+    return __compress(txt, __smazTrie)
+
+
+def Decompress(comp):
+    '''
+    Decompress the SMAZ compressed byte array.
+
+    Args:
+        comp: The smaz compressed message as byte array.
+
+    Returns:
+        The decompressed text as UTF-8 encoded byte array.
+    '''
+    return __decompress(comp, __smaz)
+
+
+def CompressTrained(txt):
+    '''
+    Compress the message (provided as byte array) like Compress,
+    but with the codebook trained on short messages (see
+    TrainCodebook) instead of the smaz codebook.
+
+    Args:
+        txt: The original message encoded as UFT-8 byte array.
+
+    Returns:
+        The compressed text as byte array.
+    '''
+    return __compress(txt, __trainedTrie)
+
+
+def DecompressTrained(comp):
+    '''
+    Decompress the byte array compressed with CompressTrained.
+
+    Args:
+        comp: The compressed message as byte array.
+
+    Returns:
+        The decompressed text as UTF-8 encoded byte array.
+    '''
+    return __decompress(comp, __trained)
+
+
+def TrainCodebook(msgs, size = 254, longest = 8, alphabet = b"abcdefghijklmnopqrstuvwxyz0123456789 .,?!'"):
+    '''
+    Train a codebook for the smaz-style compression on sample messages.
+    The codebook starts with the alphabet and the bytes found in the
+    messages, then the most frequent pair of neighbouring entries is
+    merged into a new entry, until the codebook is full or no pair
+    occurs more than once.
+
+    Args:
+        msgs: The sample messages as byte arrays.
+        size: The size of the codebook, at most 254.
+        longest: The maximum length of an entry in bytes.
+        alphabet: The bytes always included in the codebook.
+
+    Returns:
+        The sorted list of the codebook entries as byte arrays.
+    '''
+    seqs = [[m[i:i + 1] for i in range(0, len(m))] for m in msgs]
+    codebook = set(e for seq in seqs for e in seq) | set(alphabet[i:i + 1] for i in range(0, len(alphabet)))
+
+    while len(codebook) < size:
+        pairs = Counter()
+        for seq in seqs:
+            pairs.update(p for p in zip(seq, seq[1:]) if len(p[0]) + len(p[1]) <= longest)
+        if len(pairs) == 0 or pairs.most_common(1)[0][1] < 2:
+            break
+
+        # replace the occurrences of the most frequent pair with the new entry
+        (a, b), count = pairs.most_common(1)[0]
+        codebook.add(a + b)
+        for k in range(0, len(seqs)):
+            seq, merged, i = seqs[k], [], 0
+            while i < len(seq):
+                if i + 1 < len(seq) and seq[i] == a and seq[i + 1] == b:
+                    merged.append(a + b)
+                    i += 2
+                else:
+                    merged.append(seq[i])
+                    i += 1
+            seqs[k] = merged
+
+    return sorted(codebook)
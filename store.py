@@ -0,0 +1,157 @@
+import sqlite3
+import os.path
+import os
+from records import Message
+
+
+__all__ = ['MessageStore']
+
+
+# Database schema, the messages are keyed by the hash of the transaction
+# carrying the last block of the message
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS messages (
+    hash TEXT PRIMARY KEY,
+    account TEXT NOT NULL,
+    sender TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    paging_token INTEGER NOT NULL,
+    payload BLOB NOT NULL,
+    encoding INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_token ON messages (account, paging_token);
+CREATE INDEX IF NOT EXISTS messages_sender ON messages (account, sender, paging_token);
+CREATE INDEX IF NOT EXISTS messages_date ON messages (account, created_at);
+CREATE TABLE IF NOT EXISTS state (
+    account TEXT PRIMARY KEY,
+    cursor TEXT,
+    oldest TEXT,
+    exhausted INTEGER NOT NULL,
+    reassembly TEXT
+);
+'''
+
+
+class MessageStore:
+    def __init__(self, name = ':memory:'):
+        '''
+        Open (or create) the local message store.
+
+        Args:
+            name: Path to the SQLite database file. By default the
+                  store is kept in memory only.
+
+        Returns:
+            Instance of the object.
+        '''
+        if name != ':memory:':
+            name = os.path.expanduser(name)
+            if os.path.dirname(name) != '':
+                os.makedirs(os.path.dirname(name), exist_ok = True)
+        self.__db = sqlite3.connect(name, check_same_thread = False)
+        self.__db.executescript(SCHEMA)
+
+
+    def LoadState(self, account):
+        '''
+        Load the inbox synchronization state of the account.
+
+        Args:
+            account: The Stellar address of the inbox owner.
+
+        Returns:
+            The tuple (cursor, oldest, exhausted, reassembly), where cursor
+            and oldest are the paging tokens of the newest and oldest
+            processed transactions, exhausted tells if the history was
+            scanned back to the beginning, and reassembly is the state of
+            the reassembler holding the blocks of incomplete messages.
+        '''
+        row = self.__db.execute('SELECT cursor, oldest, exhausted, reassembly FROM state WHERE account = ?',
+                                (account,)).fetchone()
+        if row is None:
+            return None, None, False, None
+
+        return row[0], row[1], bool(row[2]), row[3]
+
+
+    def Save(self, account, messages, cursor, oldest, exhausted, reassembly):
+        '''
+        Atomically add the new messages and update the synchronization
+        state of the account.
+
+        Args:
+            account: The Stellar address of the inbox owner.
+            messages: List of Message records.
+            cursor: Paging token of the newest processed transaction.
+            oldest: Paging token of the oldest processed transaction.
+            exhausted: True if the whole history was processed.
+            reassembly: The state of the reassembler.
+
+        Returns:
+            None.
+        '''
+        with self.__db:
+            self.__db.executemany('INSERT OR IGNORE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                  [(m.hash, account, m.sender, m.date, int(m.paging_token), m.payload, m.encoding)
+                                   for m in messages])
+            self.__db.execute('INSERT OR REPLACE INTO state VALUES (?, ?, ?, ?, ?)',
+                              (account, cursor, oldest, int(exhausted), reassembly))
+
+
+    def Count(self, account, sender = None, cursor = None):
+        '''
+        Count the stored messages of the account.
+
+        Args:
+            account: The Stellar address of the inbox owner.
+            sender: Count only messages from this address.
+            cursor: Count only messages received after this paging token.
+
+        Returns:
+            The number of messages.
+        '''
+        query, args = MessageStore.__where(account, sender, cursor)
+        return self.__db.execute('SELECT COUNT(*) FROM messages' + query, args).fetchone()[0]
+
+
+    def Messages(self, account, sender = None, tail = 1, cursor = None):
+        '''
+        Return the last `tail` stored messages of the account.
+
+        Args:
+            account: The Stellar address of the inbox owner.
+            sender: Return only messages from this address.
+            tail: The number of messages to return, None for all.
+            cursor: Return only messages received after this paging token.
+
+        Returns:
+            List of Message records, starting with the most recent.
+        '''
+        query, args = MessageStore.__where(account, sender, cursor)
+        rows = self.__db.execute('SELECT created_at, sender, payload, encoding, hash, paging_token FROM messages'
+                                 + query + ' ORDER BY paging_token DESC LIMIT ?', args + [tail if tail is not None else -1])
+        return [Message(r[0], r[1], bytes(r[2]), r[3], r[4], str(r[5])) for r in rows]
+
+
+    def Close(self):
+        '''
+        Close the underlying database.
+        '''
+        self.__db.close()
+
+
+    @classmethod
+    def __where(cls, account, sender, cursor):
+        '''
+        Build the WHERE clause selecting the messages of the account.
+        '''
+        query = ' WHERE account = ?'
+        args = [account]
+        if sender is not None:
+            query += ' AND sender = ?'
+            args.append(sender)
+        if cursor is not None:
+            query += ' AND paging_token > ?'
+            args.append(int(cursor))
+
+        return query, args
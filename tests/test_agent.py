@@ -0,0 +1,89 @@
+import os
+import stat
+import threading
+
+import pytest
+from stellar_base.keypair import Keypair
+
+import agent
+import whisperer
+from agent import Agent, AgentClient
+from ledger import Ledger
+
+
+@pytest.fixture
+def served(tmp_path, monkeypatch):
+    # agent holding the wallet of bob, alice sending to it directly
+    ledger = Ledger(verify = False, ahead = whisperer.PIPELINE_DEPTH)
+    monkeypatch.setattr(whisperer, 'horizon', ledger)
+    alice, bob = Keypair.random(), Keypair.random()
+    for kp in (alice, bob):
+        ledger.Fund(kp.address().decode())
+
+    wallet, path = str(tmp_path / 'bob_wallet'), str(tmp_path / 'agent.sock')
+    server = Agent(bob.seed().decode(), wallet, path = path, timeout = 0)
+    assert server.Bind()
+    thread = threading.Thread(target = server.Serve, daemon = True)
+    thread.start()
+    yield whisperer.Whisperer(alice, horizon = ledger), wallet, path, thread
+
+    AgentClient(path).Stop()
+    thread.join(timeout = 10)
+
+
+def test_agent(served):
+    alice, wallet, path, thread = served
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+    client = AgentClient.Connect(wallet, path)
+    assert client is not None and client.Running()
+    assert client.ValidateAddress(alice.Address()) and not client.ValidateAddress('GUNKNOWN')
+
+    # the first fetch only records the position
+    assert client.Fetch() == []
+    msg = bytes(range(256))
+    assert all(s['success'] for s in alice.Send(client.Address(), msg, 0))
+    assert [m[2] for m in client.Fetch()] == [msg]
+    assert client.Fetch() == []
+    assert [m[1:] for m in client.Read(tail = 2)] == [[alice.Address(), msg]]
+
+    assert all(s['success'] for s in client.Send(alice.Address(), b'reply'))
+    status = client.SendMany([alice.Address()], b'to many')
+    assert all(s['success'] for s in status[alice.Address()])
+    assert [m[2] for m in alice.Read(tail = 2)] == [b'to many', b'reply']
+    assert client.Resume() == []
+
+    # stopping removes the socket
+    assert client.Stop()
+    thread.join(timeout = 10)
+    assert not thread.is_alive() and not os.path.exists(path)
+    assert not client.Running()
+
+
+def test_connect(served):
+    alice, wallet, path, thread = served
+    assert AgentClient.Connect(wallet + '.other', path) is None
+    assert AgentClient.Connect(wallet, path + '.missing') is None
+    # a second agent does not replace the running one
+    assert not Agent('S', wallet, path = path).Bind()
+
+
+def test_other_user(served, monkeypatch, capsys):
+    # the connections of other users are closed without a response
+    alice, wallet, path, thread = served
+    client = AgentClient.Connect(wallet, path)
+    uid = os.getuid()
+    with monkeypatch.context() as m:
+        m.setattr(agent.os, 'getuid', lambda: uid + 1)
+        assert not client.Running()
+        assert client.Read() == []
+    assert 'Error: the agent failed to read' in capsys.readouterr().out
+
+
+def test_timeout(tmp_path, monkeypatch):
+    monkeypatch.setattr(whisperer, 'horizon', Ledger(verify = False))
+    path = str(tmp_path / 'agent.sock')
+    server = Agent(Keypair.random().seed().decode(), str(tmp_path / 'wallet'), path = path, timeout = 0.2)
+    assert server.Bind()
+    server.Serve()
+    assert not os.path.exists(path)
@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer, unused_port
+from stellar_base.exceptions import HorizonError, HorizonRequestError
+
+from aiohorizon import AsyncHorizon
+
+
+ADDRESS = 'GCU2RRJHYBEIP6R6SJHLTCC32FVFGATYMTYB3ZBKT3OMPZLCTVSS7ZDH'
+
+# the transactions of the account, the paging tokens being 1 to 25
+RECORDS = [{'id': str(i), 'paging_token': str(i)} for i in range(1, 26)]
+
+
+def problem(status, title, extras = None):
+    # error reply in the Horizon problem format
+    reply = {'type': 'https://stellar.org/horizon-errors/' + title.lower().replace(' ', '_'),
+             'title': title, 'status': status}
+    if extras is not None:
+        reply['extras'] = extras
+    return web.json_response(reply, status = status)
+
+
+def fake_horizon(requests):
+    async def account(request):
+        requests.append(request)
+        if request.match_info['address'] != ADDRESS:
+            return problem(404, 'Resource Missing')
+        return web.json_response({'id': ADDRESS, 'sequence': '8589934592'})
+
+    async def transactions(request):
+        requests.append(request)
+        records = RECORDS if request.query.get('order', 'asc') == 'asc' else RECORDS[::-1]
+        if 'cursor' in request.query:
+            tokens = [r['paging_token'] for r in records]
+            records = records[tokens.index(request.query['cursor']) + 1:]
+        records = records[:int(request.query.get('limit', 10))]
+        return web.json_response({'_embedded': {'records': records}})
+
+    async def submit(request):
+        requests.append(request)
+        tx = (await request.post()).get('tx')
+        if tx == 'stale':
+            return problem(400, 'Transaction Failed', {'result_codes': {'transaction': 'tx_bad_seq'}})
+        return web.json_response({'hash': 'ab' * 32, 'ledger': 2, 'envelope_xdr': tx})
+
+    async def gateway(request):
+        return web.Response(status = 502, text = '<html>Bad Gateway</html>', content_type = 'text/html')
+
+    app = web.Application()
+    app.router.add_get('/accounts/{address}', account)
+    app.router.add_get('/accounts/{address}/transactions', transactions)
+    app.router.add_get('/accounts/{address}/payments', transactions)
+    app.router.add_post('/transactions', submit)
+    app.router.add_get('/gateway', gateway)
+    return app
+
+
+def run(test):
+    # run the test coroutine against a fresh fake Horizon server
+    async def main():
+        requests = []
+        async with TestServer(fake_horizon(requests)) as server:
+            async with AsyncHorizon(str(server.make_url('')), timeout = 5) as horizon:
+                await test(horizon, requests)
+
+    asyncio.run(main())
+
+
+def test_query():
+    async def test(horizon, requests):
+        assert (await horizon.account(ADDRESS))['sequence'] == '8589934592'
+        page = await horizon.query('/accounts/{}/payments'.format(ADDRESS),
+                                   {'order': 'desc', 'limit': 2, 'join': 'transactions'})
+        assert [r['id'] for r in page['_embedded']['records']] == ['25', '24']
+        assert dict(requests[-1].query) == {'order': 'desc', 'limit': '2', 'join': 'transactions'}
+        assert (await horizon.submit(b'envelope'))['envelope_xdr'] == 'envelope'
+
+    run(test)
+
+
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+def test_pagination(order):
+    async def test(horizon, requests):
+        records, cursor = [], None
+        while True:
+            page = (await horizon.account_transactions(ADDRESS, cursor = cursor, order = order, limit = 10))
+            page = page['_embedded']['records']
+            if len(page) == 0:
+                break
+            records += page
+            cursor = page[-1]['paging_token']
+        assert records == (RECORDS if order == 'asc' else RECORDS[::-1])
+        # 3 full or partial pages and the empty one
+        assert len(requests) == 4
+        assert requests[1].query['cursor'] == ('10' if order == 'asc' else '16')
+
+    run(test)
+
+
+def test_error_replies():
+    async def test(horizon, requests):
+        with pytest.raises(HorizonError) as e:
+            await horizon.account('GUNKNOWN')
+        assert e.value.status_code == 404
+
+        with pytest.raises(HorizonError) as e:
+            await horizon.submit('stale')
+        assert e.value.status_code == 400
+        assert 'tx_bad_seq' in e.value.message
+
+        # a reply that is not JSON, e.g. from a proxy
+        with pytest.raises(HorizonError) as e:
+            await horizon.query('/gateway')
+        assert e.value.status_code == 502
+        assert 'Bad Gateway' in e.value.message
+
+    run(test)
+
+
+def test_reconnect():
+    async def main():
+        port = unused_port()
+        horizon = AsyncHorizon('http://127.0.0.1:{}'.format(port), timeout = 5)
+        async with TestServer(fake_horizon([]), port = port):
+            await horizon.account(ADDRESS)
+
+        # the requests fail while the server is down
+        with pytest.raises(HorizonRequestError):
+            await horizon.account(ADDRESS)
+
+        # and the client connects again once the server is back
+        async with TestServer(fake_horizon([]), port = port):
+            assert (await horizon.account(ADDRESS))['id'] == ADDRESS
+        await horizon.Close()
+
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+import charsets
+
+
+GSM = ("@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞ\x1bÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+       "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ`¿abcdefghijklmnopqrstuvwxyzäöñüà")
+SIXBIT = "@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\\]^_ !\"#$%&'()*+,-./0123456789:;<=>?"
+
+CODECS = [(charsets.EncodeGSM, charsets.DecodeGSM, charsets.EncodeGSMMany, charsets.DecodeGSMMany, GSM, 7, False),
+          (charsets.EncodeSixbit, charsets.DecodeSixbit, charsets.EncodeSixbitMany, charsets.DecodeSixbitMany,
+           SIXBIT, 6, True)]
+
+
+def reference(txt, alphabet, width, upper):
+    # the bit string encoding of the original codecs, unsupported characters
+    # being blank spaces and the last byte padded with zeros
+    txt = txt.decode('utf-8', errors = 'ignore')
+    bits = ''.join('{:0{}b}'.format(alphabet.find(c) if c in alphabet else 32, width)
+                   for c in (txt.upper() if upper else txt))
+    bits += '0' * (-len(bits) % 8)
+    return int(bits, 2).to_bytes(len(bits) // 8, 'big') if bits else b''
+
+
+def texts(alphabet, n = 300, seed = 1):
+    rnd = random.Random(seed)
+    chars = alphabet + 'abcxyz€✓\t'
+    return [''.join(rnd.choice(chars) for j in range(0, rnd.randrange(0, 45))).encode('utf-8') for i in range(0, n)]
+
+
+@pytest.mark.parametrize('encode, decode, encodeMany, decodeMany, alphabet, width, upper', CODECS)
+def test_wire_format(encode, decode, encodeMany, decodeMany, alphabet, width, upper):
+    msgs = texts(alphabet)
+    expected = [reference(m, alphabet, width, upper) for m in msgs]
+    assert [encode(m) for m in msgs] == expected
+    assert encodeMany(msgs) == expected
+
+
+@pytest.mark.parametrize('encode, decode, encodeMany, decodeMany, alphabet, width, upper', CODECS)
+def test_roundtrip(encode, decode, encodeMany, decodeMany, alphabet, width, upper):
+    rnd = random.Random(2)
+    # a trailing '@' (index 0) cannot be told from the padding
+    msgs = [''.join(rnd.choice(alphabet) for j in range(0, rnd.randrange(0, 45))).rstrip('@').encode('utf-8')
+            for i in range(0, 300)]
+    assert [decode(encode(m)) for m in msgs] == msgs
+    assert decodeMany(encodeMany(msgs)) == msgs
+
+
+def test_padding():
+    # 7 GSM characters leave 7 padding bits, 8 fill 7 bytes exactly
+    assert charsets.EncodeGSM(b'abcdefg') == reference(b'abcdefg', GSM, 7, False)
+    assert len(charsets.EncodeGSM(b'abcdefg')) == len(charsets.EncodeGSM(b'abcdefgh')) == 7
+    assert charsets.DecodeGSM(charsets.EncodeGSM(b'abcdefg')) == b'abcdefg'
+    assert charsets.DecodeGSM(charsets.EncodeGSM(b'abcdefgh')) == b'abcdefgh'
+    assert charsets.DecodeSixbit(charsets.EncodeSixbit(b'abc')) == b'ABC'
+
+
+def test_unsupported():
+    assert charsets.DecodeGSM(charsets.EncodeGSM('a€b✓'.encode('utf-8'))) == b'a b '
+    assert charsets.DecodeSixbit(charsets.EncodeSixbit('é{x}'.encode('utf-8'))) == b'  X '
+    assert charsets.EncodeGSM(b'') == charsets.EncodeSixbit(b'') == b''
+    assert charsets.DecodeGSM(b'') == charsets.DecodeSixbit(b'') == b''
@@ -0,0 +1,55 @@
+import os
+
+import pytest
+from Crypto.Cipher import AES
+
+from cipher import BuildIVs, EncryptBlocks, DecryptBlocks
+
+
+def reference_iv(pk, sequence):
+    # the IV of the original per-block encryption
+    return (int.from_bytes(pk[0:16], 'big') + sequence).to_bytes(17, 'big')[-16:]
+
+
+def test_ivs():
+    pk = b'\xff' * 15 + b'\xfe' + os.urandom(16)
+    sequences = [0, 1, 2, 8589934593]
+    IVs = BuildIVs(pk, sequences)
+    # the sum wraps around at 128 bits
+    assert [IVs[16 * i:16 * i + 16] for i in range(0, len(sequences))] == [reference_iv(pk, s) for s in sequences]
+
+
+@pytest.mark.parametrize('n', [0, 1, 2, 17])
+def test_per_block_cbc(n):
+    k, pk = os.urandom(32), os.urandom(32)
+    blocks = [os.urandom(32) for i in range(0, n)]
+    sequences = range(1000, 1000 + n)
+    IVs = BuildIVs(pk, sequences)
+
+    encrypted = EncryptBlocks(blocks, k, IVs)
+    assert encrypted == [AES.new(k, AES.MODE_CBC, reference_iv(pk, s)).encrypt(b) for s, b in zip(sequences, blocks)]
+    assert DecryptBlocks(encrypted, k, IVs) == blocks
+
+
+def test_wrong_key():
+    k, pk = os.urandom(32), os.urandom(32)
+    blocks = [os.urandom(32) for i in range(0, 3)]
+    IVs = BuildIVs(pk, range(0, 3))
+    assert DecryptBlocks(EncryptBlocks(blocks, k, IVs), os.urandom(32), IVs) != blocks
+    # a wrong IV only garbles the first AES block of each message block
+    decrypted = DecryptBlocks(EncryptBlocks(blocks, k, IVs), k, BuildIVs(pk, range(1, 4)))
+    assert [d[16:] for d in decrypted] == [b[16:] for b in blocks]
+    assert all(d[:16] != b[:16] for d, b in zip(decrypted, blocks))
+
+
+def test_invalid_blocks():
+    k, IVs = os.urandom(32), BuildIVs(os.urandom(32), [1])
+    with pytest.raises(ValueError):
+        EncryptBlocks([b'short'], k, IVs)
+    with pytest.raises(ValueError):
+        DecryptBlocks([b'x' * 31], k, IVs)
+    with pytest.raises(ValueError):
+        EncryptBlocks([b'x' * 32], b'bad key', IVs)
+    # a longer block would shift the following ones
+    with pytest.raises(ValueError):
+        DecryptBlocks([b'x' * 48, b'x' * 16], k, BuildIVs(os.urandom(32), [1, 2]))
@@ -0,0 +1,35 @@
+import pytest
+
+import charsets
+import encoders
+import smaz
+
+
+TEXT = b'This is a test like Lorem Ipsum'
+
+
+@pytest.mark.parametrize('code', sorted(encoders.ENCODINGS))
+def test_roundtrip(code):
+    encoding = encoders.GetEncoding(code)
+    decoded = TEXT.upper() if code == 2 else TEXT
+    assert encoding.Decode(encoding.Encode(TEXT)) == decoded
+    assert encoding.DecodeMany(encoding.EncodeMany([TEXT, b'', TEXT])) == [decoded, b'', decoded]
+
+
+@pytest.mark.parametrize('encode, decode, module', [('EncodeGSM', 'DecodeGSM', charsets),
+                                                    ('EncodeSixbit', 'DecodeSixbit', charsets),
+                                                    ('EncodeGSMMany', 'DecodeGSMMany', charsets),
+                                                    ('EncodeSixbitMany', 'DecodeSixbitMany', charsets),
+                                                    ('Compress', 'Decompress', smaz),
+                                                    ('CompressTrained', 'DecompressTrained', smaz)])
+def test_exported_codecs(encode, decode, module):
+    # the functions of the former encoders module use the registered codecs
+    assert encode in encoders.__all__ and decode in encoders.__all__
+    msg = [TEXT, TEXT[::-1]] if encode.endswith('Many') else TEXT
+    encoded = getattr(encoders, encode)(msg)
+    assert encoded == getattr(module, encode)(msg)
+    assert getattr(encoders, decode)(encoded) == getattr(module, decode)(encoded)
+
+
+def test_unknown_encoding():
+    assert encoders.GetEncoding(8) is None
@@ -0,0 +1,45 @@
+from journal import SendJournal
+
+
+def envelopes(first, n):
+    return [(first + i, 'h{}'.format(first + i), 'envelope {}'.format(first + i).encode()) for i in range(n)]
+
+
+def test_pending():
+    journal = SendJournal()
+    a = journal.Begin('X', 'R1', 1, 100, envelopes(10, 3))
+    b = journal.Begin('X', 'R2', 0, 5, envelopes(13, 1))
+    journal.Begin('Y', 'R1', 0, 5, envelopes(20, 1))
+
+    journal.Confirm('h11')
+    assert journal.Pending('X') == [
+        [a, 'R1', 1, 100, [(10, 'h10', b'envelope 10', False),
+                           (11, 'h11', b'envelope 11', True),
+                           (12, 'h12', b'envelope 12', False)]],
+        [b, 'R2', 0, 5, [(13, 'h13', b'envelope 13', False)]]]
+
+    journal.Finish(a)
+    assert [p[0] for p in journal.Pending('X')] == [b]
+    assert len(journal.Pending('Y')) == 1
+    assert journal.Pending('Z') == []
+
+
+def test_resigned():
+    # re-signing a fragment under the same hash replaces the earlier one
+    journal = SendJournal()
+    journal.Begin('X', 'R', 0, 5, envelopes(10, 1))
+    journal.Begin('X', 'R', 0, 5, envelopes(10, 1))
+    assert [p[4] for p in journal.Pending('X')] == [[], [(10, 'h10', b'envelope 10', False)]]
+
+
+def test_persistence(tmp_path):
+    name = str(tmp_path / 'sub' / 'journal.db')
+    journal = SendJournal(name)
+    entry = journal.Begin('X', 'R', 0, 5, envelopes(10, 2))
+    journal.Confirm('h10')
+    journal.Close()
+
+    journal = SendJournal(name)
+    assert journal.Pending('X') == [[entry, 'R', 0, 5, [(10, 'h10', b'envelope 10', True),
+                                                        (11, 'h11', b'envelope 11', False)]]]
+    journal.Close()
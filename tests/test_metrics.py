@@ -0,0 +1,29 @@
+from urllib.request import urlopen
+
+from metrics import Metrics, DESCRIPTIONS
+
+
+def test_prometheus():
+    metrics = Metrics()
+    metrics.Count('resubmissions_total', 3)
+    with metrics.Time('submit_seconds'):
+        pass
+
+    text = metrics.Prometheus()
+    assert '# HELP whisper_resubmissions_total {}'.format(DESCRIPTIONS['resubmissions_total']) in text
+    assert 'whisper_resubmissions_total 3' in text
+    assert 'whisper_submit_seconds_count 1' in text
+
+
+def test_serve_loopback():
+    metrics = Metrics()
+    metrics.Count('messages_sent_total')
+    server = metrics.Serve(0)
+    try:
+        address, port = server.server_address
+        assert address == '127.0.0.1'
+        with urlopen('http://127.0.0.1:{}/metrics'.format(port), timeout = 5) as response:
+            assert b'whisper_messages_sent_total 1' in response.read()
+    finally:
+        server.shutdown()
+        server.server_close()
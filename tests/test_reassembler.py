@@ -0,0 +1,101 @@
+import random
+
+import pytest
+
+from reassembler import Reassembler, REASSEMBLY_SPAN
+from records import Block
+
+
+def blocks(sender, first, payload, encoding = 0, second = 0):
+    # the (transaction, block) pairs of a message sent with the sequence
+    # numbers following first, all but the last block carrying 31 bytes
+    chunks = [payload[i:i + 31] for i in range(0, max(len(payload), 1), 31)]
+    result = []
+    for i, chunk in enumerate(chunks):
+        length = len(chunk) if i == len(chunks) - 1 else 0
+        data = bytes([length << 3 | encoding]) + chunk.ljust(31, b'\0')
+        created_at = '2018-01-01T00:{:02d}:{:02d}Z'.format((second + i) // 60, (second + i) % 60)
+        t = Block(sender, first + i + 1, None, created_at, 'h{}'.format(first + i + 1), str(first + i + 1))
+        result.append((t, data))
+    return result
+
+
+def feed(reassembler, pairs):
+    return [m for t, block in pairs for m in reassembler.Add(t, block)]
+
+
+def test_in_order():
+    r = Reassembler()
+    first = blocks('A', 100, b'hello')
+    second = blocks('A', 101, b'x' * 70, encoding = 3)
+    messages = feed(r, first + second)
+    # the start of the first message is unknown until the window reaches it
+    assert [m.payload for m in messages] == [b'x' * 70]
+    assert messages[0].encoding == 3 and messages[0].hash == 'h104' and messages[0].sender == 'A'
+    assert r.Waiting()
+    assert [m.payload for m in r.Window(None, True)] == [b'hello']
+    assert not r.Waiting()
+
+
+@pytest.mark.parametrize('descending', [False, True])
+def test_order(descending):
+    # the blocks arrive in the order of the stream, or of the history read back
+    payloads = [b'first message, in two blocks ' * 2, b'second', b'third ' * 20]
+    pairs, q = [], 0
+    for p in payloads:
+        pairs += blocks('A', q, p)
+        q = pairs[-1][0].sequence
+
+    r = Reassembler()
+    messages = feed(r, pairs[::-1] if descending else pairs) + r.Window(None, True)
+    assert sorted(m.payload for m in messages) == sorted(payloads)
+
+
+def test_senders():
+    r = Reassembler()
+    pairs = blocks('A', 0, b'a' * 40) + blocks('B', 0, b'b' * 40)
+    messages = feed(r, pairs[0::2] + pairs[1::2]) + r.Window(None, True)
+    assert sorted((m.sender, m.payload) for m in messages) == [('A', b'a' * 40), ('B', b'b' * 40)]
+
+
+def test_earlier_transaction():
+    # a transaction of the sender not addressed to us marks the boundary
+    r = Reassembler()
+    feed(r, blocks('A', 0, b'older'))
+    assert [m.payload for m in feed(r, blocks('A', 5, b'y' * 40))] == [b'y' * 40]
+
+
+def test_window_span():
+    r = Reassembler()
+    assert feed(r, blocks('A', 10, b'late', second = 59 * 60)) == []
+    assert r.Window('2018-01-01T00:55:00Z', False) == []
+    edge = '2018-01-01T00:{:02d}:00Z'.format(59 - REASSEMBLY_SPAN // 60)
+    assert [m.payload for m in r.Window(edge, False)] == [b'late']
+
+
+def test_aborted_message():
+    # the zero-length blocks followed by a gap belong to an aborted message
+    r = Reassembler()
+    feed(r, blocks('A', -2, b'before'))
+    assert [m.payload for m in r.Window(None, True)] == [b'before']
+    feed(r, blocks('A', 0, b'z' * 70)[:-1])
+    assert [m.payload for m in feed(r, blocks('A', 10, b'after'))] == [b'after']
+    assert r.State() == Reassembler().State().replace('"exhausted": false', '"exhausted": true')
+
+
+def test_state():
+    r = Reassembler()
+    pairs = blocks('A', 0, b'q' * 70)
+    feed(r, pairs[1:])
+    assert r.Waiting()
+
+    resumed = Reassembler(r.State())
+    assert resumed.Waiting()
+    assert [m.payload for m in feed(resumed, pairs[:1]) + resumed.Window(None, True)] == [b'q' * 70]
+
+
+@pytest.mark.parametrize('state', [None, '', 'not json', '{}'])
+def test_invalid_state(state):
+    r = Reassembler(state)
+    assert not r.Waiting()
+    assert [m.payload for m in feed(r, blocks('A', 0, b'ok')) + r.Window(None, True)] == [b'ok']
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+
+from sequencer import Sequencer
+
+
+class Horizon:
+    # stand-in for the account sequence number lookup
+    def __init__(self, sequence = 100):
+        self.sequence = sequence
+        self.calls = 0
+
+
+    def fetch(self):
+        self.calls += 1
+        return self.sequence
+
+
+def test_reserve():
+    horizon, sequencer = Horizon(), Sequencer()
+    assert sequencer.Sequence() is None
+    assert sequencer.Reserve(3, horizon.fetch) == 100
+    assert sequencer.Reserve(2, horizon.fetch) == 103
+    assert sequencer.Sequence() == 105
+    assert horizon.calls == 1
+
+
+def test_release():
+    horizon, sequencer = Horizon(), Sequencer()
+    first = sequencer.Reserve(3, horizon.fetch)
+    last = sequencer.Reserve(2, horizon.fetch)
+
+    # the last range is taken back
+    sequencer.Release(last, 2)
+    assert sequencer.Sequence() == 103
+    assert sequencer.Reserve(1, horizon.fetch) == 103 and horizon.calls == 1
+
+    # an earlier one leaves a gap, so the sequence number is requested again
+    sequencer.Release(first, 3)
+    assert sequencer.Sequence() is None
+    horizon.sequence = 104
+    assert sequencer.Reserve(1, horizon.fetch) == 104 and horizon.calls == 2
+
+
+def test_invalidate():
+    horizon, sequencer = Horizon(), Sequencer()
+    sequencer.Reserve(1, horizon.fetch)
+    sequencer.Invalidate()
+    horizon.sequence = 200
+    assert sequencer.Reserve(1, horizon.fetch) == 200 and horizon.calls == 2
+
+
+def test_outdated_fetch():
+    # a sequence number fetched before Invalidate is not used
+    sequencer, fetched = Sequencer(), []
+
+    def fetch():
+        if len(fetched) == 0:
+            sequencer.Invalidate()
+        fetched.append(100 + 10 * len(fetched))
+        return fetched[-1]
+
+    assert sequencer.Reserve(1, fetch) == 110
+    assert fetched == [100, 110]
+
+
+def test_threads():
+    horizon, sequencer, reserved = Horizon(), Sequencer(), []
+
+    def reserve():
+        for i in range(100):
+            reserved.append(sequencer.Reserve(3, horizon.fetch))
+
+    threads = [threading.Thread(target = reserve) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(reserved) == list(range(100, 100 + 3 * 800, 3))
+    assert sequencer.Sequence() == 100 + 3 * 800
+
+
+def test_reserve_async():
+    sequencer, calls = Sequencer(), []
+
+    async def fetch():
+        calls.append(None)
+        await asyncio.sleep(0.01)
+        return 100
+
+    async def main():
+        return await asyncio.gather(*[sequencer.ReserveAsync(2, fetch) for i in range(10)])
+
+    # the concurrent reservations fetch at once, and only one result is kept
+    assert sorted(asyncio.run(main())) == list(range(100, 120, 2))
+    assert len(calls) == 10
@@ -0,0 +1,80 @@
+import os
+import random
+
+import pytest
+
+import smaz
+
+
+MESSAGES = [b'', b'the quick brown fox', b'Please send me the payment tomorrow.', 'café ✓'.encode('utf-8'),
+            bytes(range(0, 256)), b'x' * 600]
+
+
+@pytest.mark.parametrize('msg', MESSAGES)
+def test_roundtrip(msg):
+    assert smaz.Decompress(smaz.Compress(msg)) == msg
+    assert smaz.DecompressTrained(smaz.CompressTrained(msg)) == msg
+
+
+def test_verbatim_runs():
+    # single bytes use code 254, longer runs code 255 and the length
+    assert smaz.Compress(b'\x00') == b'\xfe\x00'
+    assert smaz.Compress(b'\x00\x01') == b'\xff\x01\x00\x01'
+    assert smaz.Compress(b'\x00' * 300)[:2] == b'\xff\xff'
+
+
+@pytest.mark.parametrize('comp', [b'\xff', b'\xfe', b'\x01\xff', b'\x01\xfe', b'\xff\x05', b'\xff\x05ab'])
+def test_truncated(comp):
+    for decompress in (smaz.Decompress, smaz.DecompressTrained):
+        assert isinstance(decompress(comp), bytes)
+
+
+def test_truncated_keeps_prefix():
+    assert smaz.Decompress(smaz.Compress(b'the') + b'\xff') == b'the'
+    assert smaz.Decompress(b'\xff\x05ab') == b'ab'
+
+
+def test_garbage():
+    rnd = random.Random(1)
+    for i in range(0, 2000):
+        comp = bytes(rnd.randrange(0, 256) for j in range(0, rnd.randrange(0, 32)))
+        for decompress in (smaz.Decompress, smaz.DecompressTrained):
+            assert isinstance(decompress(comp), bytes)
+
+
+@pytest.mark.parametrize('msg', [b'the quick brown fox', b'Please send me the payment tomorrow.',
+                                 b'see http://example.com <div>x</div>', bytes(range(32, 127))])
+def test_smaz_format(msg):
+    # the codes of the reference implementation, without its UTF-8 round trip
+    pysmaz = pytest.importorskip('lib.smaz')
+    reference = bytes(ord(c) for c in pysmaz.compress(msg.decode('ascii')))
+    assert smaz.Decompress(reference) == msg
+    assert pysmaz.decompress(''.join(chr(c) for c in smaz.Compress(msg))) == msg.decode('ascii')
+
+
+def training():
+    with open(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'training.txt'), 'rb') as f:
+        return [l.rstrip(b'\n') for l in f if l.strip()]
+
+
+def test_trained_codebook():
+    # the codes 254 and 255 mark the verbatim bytes
+    codebook = getattr(smaz, '__trained')
+    assert len(codebook) <= 254 and len(set(codebook)) == len(codebook)
+    msgs = training()
+    assert sum(len(smaz.CompressTrained(m)) for m in msgs) < sum(len(smaz.Compress(m)) for m in msgs)
+
+
+def test_train_codebook():
+    msgs = training()
+    codebook = smaz.TrainCodebook(msgs, size = 100, longest = 4)
+    assert len(codebook) == 100 and codebook == sorted(set(codebook))
+    assert all(len(e) <= 4 for e in codebook)
+    assert all(bytes([b]) in codebook for b in b'abcdefghijklmnopqrstuvwxyz0123456789 .,?!\'')
+    assert all(bytes([b]) in codebook for m in msgs for b in m)
+
+
+def test_train_codebook_stops():
+    # no pair occurs more than once
+    assert smaz.TrainCodebook([b'abcd'], alphabet = b'') == [b'a', b'b', b'c', b'd']
+    assert smaz.TrainCodebook([b'abab'], alphabet = b'') == [b'a', b'ab', b'b']
@@ -0,0 +1,52 @@
+from records import Message
+from store import MessageStore
+
+
+def message(token, sender = 'A', payload = None):
+    return Message('2018-01-01T00:00:{:02d}Z'.format(token % 60), sender, payload or 'm{}'.format(token).encode(),
+                   0, 'h{}'.format(token), str(token))
+
+
+def test_state():
+    store = MessageStore()
+    assert store.LoadState('X') == (None, None, False, None)
+    store.Save('X', [], '20', '5', True, '{"edge": null}')
+    assert store.LoadState('X') == ('20', '5', True, '{"edge": null}')
+    assert store.LoadState('Y') == (None, None, False, None)
+
+
+def test_messages():
+    store = MessageStore()
+    # the paging tokens are ordered as numbers
+    store.Save('X', [message(9), message(10, 'B'), message(100)], '100', '9', False, None)
+    store.Save('Y', [message(11)], '11', '11', False, None)
+
+    assert [m.hash for m in store.Messages('X')] == ['h100']
+    assert [m.hash for m in store.Messages('X', tail = None)] == ['h100', 'h10', 'h9']
+    assert [m.hash for m in store.Messages('X', sender = 'B', tail = 5)] == ['h10']
+    assert [m.hash for m in store.Messages('X', tail = 5, cursor = '9')] == ['h100', 'h10']
+    assert store.Count('X') == 3 and store.Count('X', sender = 'A') == 2 and store.Count('X', cursor = '10') == 1
+
+    m = store.Messages('Y')[0]
+    assert (m.date, m.sender, m.payload, m.encoding, m.hash, m.paging_token) == \
+           ('2018-01-01T00:00:11Z', 'A', b'm11', 0, 'h11', '11')
+
+
+def test_duplicates():
+    # a message saved again, e.g. after reading back the history, is kept once
+    store = MessageStore()
+    store.Save('X', [message(1, payload = b'first')], '1', '1', False, None)
+    store.Save('X', [message(1, payload = b'again'), message(2)], '2', '1', False, None)
+    assert [m.payload for m in store.Messages('X', tail = None)] == [b'm2', b'first']
+
+
+def test_persistence(tmp_path):
+    name = str(tmp_path / 'sub' / 'messages.db')
+    store = MessageStore(name)
+    store.Save('X', [message(1)], '1', '1', True, 'state')
+    store.Close()
+
+    store = MessageStore(name)
+    assert store.LoadState('X') == ('1', '1', True, 'state')
+    assert [m.hash for m in store.Messages('X')] == ['h1']
+    store.Close()
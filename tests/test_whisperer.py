@@ -0,0 +1,185 @@
+import pytest
+from stellar_base.exceptions import HorizonError
+from stellar_base.keypair import Keypair
+
+import encoders
+import whisperer
+from ledger import Ledger
+
+
+@pytest.fixture
+def accounts():
+    ledger = Ledger(verify = False, ahead = whisperer.PIPELINE_DEPTH)
+    alice, bob = Keypair.random(), Keypair.random()
+    for kp in (alice, bob):
+        ledger.Fund(kp.address().decode())
+    return ledger, whisperer.Whisperer(alice, horizon = ledger), whisperer.Whisperer(bob, horizon = ledger)
+
+
+class Failing(encoders.Encoding):
+    def Decode(self, msg):
+        if msg.startswith(b'bad'):
+            raise ValueError('malformed message')
+        return msg
+
+
+def test_undecodable_message(accounts, monkeypatch):
+    ledger, alice, bob = accounts
+    monkeypatch.setitem(encoders.ENCODINGS, 7, Failing(7, 'failing', chars = 31, binary = True))
+    for msg in (b'first', b'bad message', b'last'):
+        assert all(s['success'] for s in alice.Send(bob.Address(), msg, 7))
+
+    # the malformed message is kept as received and does not hide the others
+    for sync in (True, False):
+        assert [m[2] for m in bob.Read(tail = 5, sync = sync)] == [b'last', b'bad message', b'first']
+
+
+def test_listen_new_senders(accounts):
+    import queue
+    import threading
+    import time
+
+    ledger, alice, bob = accounts
+    carol = whisperer.Whisperer(Keypair.random(), horizon = ledger)
+    ledger.Fund(carol.Address())
+    alice.Send(bob.Address(), b'before listening')
+
+    received = queue.Queue()
+    listener = bob.Listen()
+    started = threading.Event()
+
+    def listen():
+        started.set()
+        for message in listener:
+            received.put(message[2])
+
+    threading.Thread(target = listen, daemon = True).start()
+    started.wait()
+    # let Listen record the position before the messages arrive
+    while bob.Cursor() is None:
+        time.sleep(0.01)
+
+    alice.Send(bob.Address(), b'hello from alice')
+    carol.Send(bob.Address(), b'first message from carol, in several fragments')
+    assert sorted(received.get(timeout = 10) for i in range(0, 2)) == \
+           [b'first message from carol, in several fragments', b'hello from alice']
+
+
+class Limited:
+    def __init__(self, ledger, status):
+        # Horizon failing the first payment listing with the status
+        self.ledger = ledger
+        self.status = status
+        self.unfiltered = 0
+
+    def __getattr__(self, name):
+        return getattr(self.ledger, name)
+
+    def query(self, rel_url, params = None):
+        if rel_url.endswith('/payments') and self.status is not None:
+            status, self.status = self.status, None
+            raise HorizonError('Invalid horizon reply: [{}] {{}}'.format(status), status)
+        return self.ledger.query(rel_url, params)
+
+    def account_transactions(self, *args, **kwargs):
+        self.unfiltered += 1
+        return self.ledger.account_transactions(*args, **kwargs)
+
+
+@pytest.mark.parametrize('status, unsupported', [(429, False), (503, False), (404, True), (400, True)])
+def test_payments_fallback(status, unsupported):
+    ledger = Ledger(verify = False)
+    alice, bob = Keypair.random(), Keypair.random()
+    for kp in (alice, bob):
+        ledger.Fund(kp.address().decode())
+    whisperer.Whisperer(alice, horizon = ledger).Send(bob.address().decode(), b'hello')
+
+    horizon = Limited(ledger, status)
+    reader = whisperer.Whisperer(bob, horizon = horizon)
+    if not unsupported:
+        # a transient error is raised, and the payments are still listed
+        with pytest.raises(HorizonError):
+            reader.Read()
+    assert [m[2] for m in reader.Read()] == [b'hello']
+    assert (horizon.unfiltered > 0) == unsupported
+
+
+def test_outdated_sequence(accounts):
+    ledger, alice, bob = accounts
+    kp = Keypair.random()
+    ledger.Fund(kp.address().decode())
+    alice = whisperer.Whisperer(kp, horizon = ledger)
+    alice.Send(bob.Address(), b'first')
+    # another instance using the same account advances the sequence
+    # number by fewer transactions than the next message has fragments
+    other = whisperer.Whisperer(kp, horizon = ledger)
+    other.Send(bob.Address(), b'second')
+
+    message = b'third message, long enough to be sent in several fragments ' * 4
+    status = alice.Send(bob.Address(), message)
+    assert len(status) > 2 and all(s['success'] for s in status)
+    # no fragment landed with the outdated sequence numbers
+    assert ledger.Transactions() == 2 + len(status)
+    assert [m[2] for m in bob.Read(tail = 5)] == [message, b'second', b'first']
+
+
+def test_pipeline_without_queue():
+    # the ledger rejects the transactions overtaking their predecessor,
+    # verifying the signatures makes the submissions overlap
+    ledger = Ledger()
+    alice, bob = Keypair.random(), Keypair.random()
+    for kp in (alice, bob):
+        ledger.Fund(kp.address().decode())
+    sender = whisperer.Whisperer(alice, horizon = ledger)
+
+    message = b'a message long enough to be sent in many fragments, ' * 20
+    for i in range(0, 3):
+        status = sender.Send(bob.address().decode(), message, 0)
+        assert len(status) > 2 * whisperer.PIPELINE_DEPTH and all(s['success'] for s in status)
+    # at most one window of rejected submissions per message
+    assert ledger.Rejected() <= 3 * whisperer.PIPELINE_DEPTH
+    assert [m[2] for m in whisperer.Whisperer(bob, horizon = ledger).Read(tail = 3)] == [message] * 3
+
+
+def test_evicted_secrets(accounts, monkeypatch):
+    ledger, alice, bob = accounts
+    # the recipients evict each other's shared secret while encrypting
+    monkeypatch.setattr(whisperer, 'SHARED_CACHE_SIZE', 1)
+    recipients = [Keypair.random() for i in range(0, 8)]
+    for kp in recipients:
+        ledger.Fund(kp.address().decode())
+
+    message = b'the same message for everybody, in several fragments ' * 4
+    for i in range(0, 3):
+        result = alice.SendMany([kp.address().decode() for kp in recipients], message, 0)
+        assert all(s['success'] for status in result.values() for s in status)
+    for kp in recipients:
+        assert [m[2] for m in whisperer.Whisperer(kp, horizon = ledger).Read(tail = 3)] == [message] * 3
+
+
+@pytest.mark.parametrize('msg, encoding', [(bytes(range(124)), 0), (b'HELLO WORLD', 0),
+                                           (b'HELLO WORLD, SEE YOU AT NOON. ' * 4, 2),
+                                           (b'lower case text {with} braces. ' * 4, 3)])
+def test_select_encoding(msg, encoding):
+    # fewer fragments than raw, with the encodings reproducing the message only,
+    # e.g. Sixbit ties with smaz for the lower case text but loses the case
+    assert whisperer.Whisperer.SelectEncoding(msg) == encoding
+
+
+def test_send_many(accounts, capsys):
+    ledger, alice, bob = accounts
+    carol = Keypair.random()
+    ledger.Fund(carol.address().decode())
+    addresses = [bob.Address(), carol.address().decode()]
+
+    message = b'the same message for everybody, in several fragments. ' * 3
+    result = alice.SendMany(addresses + [bob.Address(), alice.Address()], message)
+    assert sorted(result) == sorted(addresses + [alice.Address()])
+    assert len(result[bob.Address()]) > 1 and all(s['success'] for s in result[bob.Address()] + result[addresses[1]])
+    # duplicate addresses are sent to once, and never to ourselves
+    assert result[alice.Address()] == []
+    assert 'sending to yourself' in capsys.readouterr().out
+
+    assert [m[2] for m in bob.Read(tail = 2)] == [message]
+    assert [m[2] for m in whisperer.Whisperer(carol, horizon = ledger).Read(tail = 2)] == [message]
+    assert alice.SendMany([alice.Address()], message) == {alice.Address(): []}
@@ -0,0 +1,76 @@
+#!/usr/bin/python3
+
+'''
+Usage:
+  whisper-agent.py [-k FILE] [-d FILE] [-t SEC] [-S SOCK] [-f]
+  whisper-agent.py -x [-S SOCK]
+  whisper-agent.py -h | --help
+  whisper-agent.py -v | --version
+
+Options:
+  -k FILE       Path to the file containing the password-protected stellar
+                seed for your account [default: ~/.stellar/wallet].
+  -d FILE       Path to the local store of received messages and of the
+                messages being sent [default: ~/.stellar/messages.db].
+  -t SEC        Forget the seed and exit after SEC seconds without requests,
+                0 to keep it until stopped [default: 3600].
+  -S SOCK       Path to the agent socket (by default $WHISPER_AGENT_SOCK,
+                or ~/.stellar/agent.sock if not set).
+  -f            Stay in the foreground.
+  -x            Stop the running agent.
+  -v --version  Display version and exit.
+  -h --help     Show this screen.
+'''
+from docopt import docopt
+from getpass import getpass
+import os
+
+# Stellar Whisper
+from agent import Agent, AgentClient, AGENT_ENV
+
+
+if __name__ == '__main__':
+
+    # Get cmdline arguments
+    arguments = docopt(__doc__, version = 'Interstellar Whisper 0.1')
+
+    if arguments.get('-x'):
+        client = AgentClient(arguments.get('-S'))
+        if not client.Running() or not client.Stop():
+            print('\nError: no agent is running!')
+            exit(-1)
+        exit(0)
+
+    import wallet
+
+    # Load seed
+    try:
+        password = getpass('Enter password: ')
+    except KeyboardInterrupt:
+        print()
+        exit(-1)
+    name = os.path.expanduser(arguments.get('-k'))
+    seed = wallet.LoadWallet(name, password)
+    if seed == None:
+        exit(-1)
+
+    agent = Agent(seed, name, arguments.get('-d'), arguments.get('-S'), int(arguments.get('-t')))
+    if not agent.Bind():
+        exit(-1)
+
+    # Print the environment for the shell, as ssh-agent does
+    if not arguments.get('-f'):
+        if os.fork() > 0:
+            print('{}={}; export {};'.format(AGENT_ENV, agent.Path(), AGENT_ENV))
+            exit(0)
+        os.setsid()
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in range(0, 3):
+            os.dup2(devnull, fd)
+    else:
+        print('Serving {} on {}...'.format(name, agent.Path()))
+
+    try:
+        agent.Serve()
+    except KeyboardInterrupt:
+        print()
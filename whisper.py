@@ -2,37 +2,38 @@
 
 '''
 Usage:
-  whisper.py (-r [-n N] | -s MSG -a ADDR) [-k FILE] [-e ENC]
+  whisper.py (-r [-n N] | -l | -s MSG -a ADDR...) [-k FILE] [-d FILE] [-e ENC]
   whisper.py -h | --help
   whisper.py -v | --version
 
 Options:
   -r            Read messages.
+  -l            Listen for new messages until interrupted.
   -s MSG        The message text to send.
-  -a ADDR       The destination address (required for sending).
+  -a ADDR       The destination address (required for sending), repeat
+                to send the message to many addresses.
   -n N          Read last N messages (optional for reading) [default: 1].
   -k FILE       Path to the file containing the password-protected stellar
                 seed for your account [default: ~/.stellar/wallet].
-  -e ENC        Required encoding for the message text [default: 0].
+  -d FILE       Path to the local store of received messages and of the
+                messages being sent [default: ~/.stellar/messages.db].
+  -e ENC        Required encoding for the message text [default: auto].
                 Valid options are:
+                  auto = the one producing the fewest fragments,
                   0 = raw (no) encoding,
                   1 = GSM 03.38 encoding,
                   2 = Sixbit ASCII encoding,
-                  3 = smaz compression.
+                  3 = smaz compression,
+                  4 = trained codebook compression.
   -v --version  Display version and exit.
   -h --help     Show this screen.
 '''
 from docopt import docopt
-import wallet
 from getpass import getpass
 import textwrap
 
-# stellar-base
-from stellar_base.address import Address
-from stellar_base.keypair import Keypair
-from stellar_base.utils import StellarMnemonic
-# Stellar Whisper
-from whisperer import Whisperer
+# stellar-base, nacl and the wallet are imported only once the arguments
+# are parsed, so that -h and -v (and argument errors) return immediately
 
 
 def banner():
@@ -50,6 +51,27 @@ def banner():
     print(banner)
 
 
+def report(status):
+    '''
+    Print the sending status of a message.
+
+    Args:
+        status: The sending status of the message fragments.
+
+    Returns:
+        True if all fragments were sent, False otherwise.
+    '''
+    if len(status) > 0 and all(s['success'] for s in status):
+        print('Done ({} fragments, encoding {}).'.format(len(status), status[0]['encoding']))
+        return True
+
+    print('Failed.')
+    for s in status:
+        if not s['success']:
+            print(' - fragment with sequence number {} was not sent'.format(s['sequence']))
+    return False
+
+
 if __name__ == '__main__':
 
     banner()
@@ -57,19 +79,32 @@ if __name__ == '__main__':
     # Get cmdline arguments
     arguments = docopt(__doc__, version = 'Interstellar Whisper 0.1')
 
-    # Load seed and kreate keypair
-    try:
-        password = getpass('Enter password: ')
-    except KeyboardInterrupt:
-        print()
-        exit(-1)
-    seed = wallet.LoadWallet(arguments.get('-k'), password)
-    if seed == None:
-        exit(-1)
+    # Use the agent holding the unlocked wallet if there is one
+    from agent import AgentClient
+    W = AgentClient.Connect(arguments.get('-k'))
+
+    if W is None:
+        import wallet
+        # stellar-base
+        from stellar_base.keypair import Keypair
+        # Stellar Whisper
+        from whisperer import Whisperer
+        from store import MessageStore
+        from journal import SendJournal
+
+        # Load seed and kreate keypair
+        try:
+            password = getpass('Enter password: ')
+        except KeyboardInterrupt:
+            print()
+            exit(-1)
+        seed = wallet.LoadWallet(arguments.get('-k'), password)
+        if seed == None:
+            exit(-1)
 
-    # Create a Whisperer instance
-    kp = Keypair.from_seed(seed)
-    W = Whisperer(kp)
+        # Create a Whisperer instance
+        kp = Keypair.from_seed(seed)
+        W = Whisperer(kp, MessageStore(arguments.get('-d')), journal = SendJournal(arguments.get('-d')))
 
     # Parse arguments
     if arguments.get('-r'):
@@ -87,16 +122,46 @@ if __name__ == '__main__':
           for m in msgparts[1:]:
             print('                            {}'.format(m))
 
+    elif arguments.get('-l'):
+
+        # Display messages as they arrive
+        print('\033[4m' + 'Date        From            Message                                  ' + '\033[0m')
+        try:
+            for msg in W.Listen(printable = False):
+                msgparts = textwrap.wrap(msg[2].decode('utf-8', errors = 'ignore'), 41)
+                print('{:<10}  {:<12}…   {}'.format(msg[0][0:10], msg[1][0:12], msgparts[0] if len(msgparts) > 0 else ''))
+                for m in msgparts[1:]:
+                    print('                            {}'.format(m))
+        except KeyboardInterrupt:
+            print()
+
     elif arguments.get('-s') is not None:
         # Check if message is provided
         msg = arguments.get('-s')
 
-        #Check if receiving address is provided
-        address = arguments.get('-a')
-        if not Whisperer.ValidateAddress(address):
+        #Check if receiving addresses are provided
+        addresses = arguments.get('-a')
+        if not all(W.ValidateAddress(address) for address in addresses):
             print('\nError: No valid Stellar destination address provided!')
             exit(-1)
 
-        print('\nSending message to {}...\t'.format(address), end = '')
-        W.Send(address, msg.encode(), int(arguments.get('-e')))
-        print('Done.')
+        # Complete the messages interrupted earlier first
+        failed = False
+        for address, status in W.Resume():
+            print('\nResuming message to {}...\t'.format(address), end = '')
+            failed = not report(status) or failed
+
+        encoding = None if arguments.get('-e') == 'auto' else int(arguments.get('-e'))
+        if len(addresses) == 1:
+            print('\nSending message to {}...\t'.format(addresses[0]), end = '')
+            result = {addresses[0]: W.Send(addresses[0], msg.encode(), encoding)}
+        else:
+            print('\nSending message to {} addresses...'.format(len(addresses)))
+            result = W.SendMany(addresses, msg.encode(), encoding)
+
+        for address, status in result.items():
+            if len(addresses) > 1:
+                print(' {}...\t'.format(address), end = '')
+            failed = not report(status) or failed
+        if failed:
+            exit(-1)
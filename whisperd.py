@@ -0,0 +1,94 @@
+#!/usr/bin/python3
+
+'''
+Usage:
+  whisperd.py -k FILE... [-d FILE] [-i SEC] [-r RATE] [-u URL] [-m PORT] [-b ADDR]
+  whisperd.py -h | --help
+  whisperd.py -v | --version
+
+Options:
+  -k FILE       Path to a file containing the password-protected stellar
+                seed of a monitored account (repeat for more accounts).
+                All the wallets are unlocked with the same password.
+  -d FILE       Path to the local store of received messages
+                [default: ~/.stellar/messages.db].
+  -i SEC        Polling interval of each account in seconds [default: 5].
+  -r RATE       Maximum number of Horizon requests per second [default: 10].
+  -u URL        The Horizon server [default: https://horizon-testnet.stellar.org].
+  -m PORT       Serve the metrics in the Prometheus format on the port.
+  -b ADDR       The address the metrics are served on, 0.0.0.0 for all
+                interfaces [default: 127.0.0.1].
+  -v --version  Display version and exit.
+  -h --help     Show this screen.
+'''
+from docopt import docopt
+import wallet
+from getpass import getpass
+import asyncio
+
+# stellar-base
+from stellar_base.keypair import Keypair
+# Stellar Whisper
+from aiohorizon import AsyncHorizon
+from monitor import Monitor
+from store import MessageStore
+from metrics import Metrics
+
+
+def Show(address, msg):
+    '''
+    Print a newly received message to the standard output.
+
+    Args:
+        address: The Stellar address of the receiving account.
+        msg: The message as [date, sender, message] list.
+
+    Returns:
+        None.
+    '''
+    print('{:<20}  {:<12}…  {:<12}…  {}'.format(msg[0][0:19], address[0:12], msg[1][0:12],
+                                                 msg[2].decode('utf-8', errors = 'ignore')), flush = True)
+
+
+async def Main(keypairs, arguments):
+    '''
+    Monitor the accounts until interrupted.
+    '''
+    metrics = None
+    if arguments.get('-m') is not None:
+        metrics = Metrics()
+        metrics.Serve(int(arguments.get('-m')), arguments.get('-b'))
+
+    async with AsyncHorizon(arguments.get('-u')) as horizon:
+        monitor = Monitor(keypairs, horizon, MessageStore(arguments.get('-d')), callback = Show,
+                          interval = float(arguments.get('-i')), rate = float(arguments.get('-r')),
+                          metrics = metrics)
+        await monitor.Run()
+
+
+if __name__ == '__main__':
+
+    # Get cmdline arguments
+    arguments = docopt(__doc__, version = 'Interstellar Whisper 0.1')
+
+    # Load seeds and create keypairs
+    try:
+        password = getpass('Enter password: ')
+    except KeyboardInterrupt:
+        print()
+        exit(-1)
+
+    keypairs = []
+    for name in arguments.get('-k'):
+        seed = wallet.LoadWallet(name, password)
+        if seed is not None:
+            keypairs.append(Keypair.from_seed(seed))
+    if len(keypairs) == 0:
+        exit(-1)
+
+    print('Monitoring {} accounts...'.format(len(keypairs)))
+    print('\033[4m' + 'Date                  To              From            Message                   ' + '\033[0m')
+    try:
+        asyncio.run(Main(keypairs, arguments))
+    except KeyboardInterrupt:
+        print()
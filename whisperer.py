@@ -1,25 +1,93 @@
-from stellar_base import Address
-from stellar_base.keypair import Keypair
-from stellar_base.utils import encode_check, decode_check
-from stellar_base.horizon import horizon_testnet
-from stellar_base.builder import Builder
 from nacl.signing import SigningKey, VerifyKey
 from nacl.bindings import crypto_box_beforenm
-from Crypto.Cipher import AES
+from collections import OrderedDict
+import threading
 import base64
-import pprint
+import os
+import binascii
+import json
+import re
+import time
 from encoders import *
+from cipher import *
+from store import MessageStore
+from journal import SendJournal
+from reassembler import Reassembler
+from records import Block
+from sequencer import Sequencer
+from metrics import NULL_TIMER
 
 
-__all__ = ['Whisperer']
+__all__ = ['Whisperer', 'DefaultHorizon']
 
 
-# This creates a new Horizon Livenet instance
-horizon = horizon_testnet()
+# The Horizon testnet instance, created on first use (see DefaultHorizon)
+horizon = None
 
 # Set to non-zero for debugging
 DEBUG = 0
 
+# Fee (in stroops) of each fragment transaction, the network base fee. Given
+# explicitly, so that the transactions are built without asking Horizon
+FRAGMENT_FEE = 100
+
+# Number of fragment transactions that are submitted concurrently
+PIPELINE_DEPTH = 8
+
+# How many times a fragment that overtook its predecessor, or whose
+# submission failed with a transient error, is resubmitted
+PIPELINE_RETRIES = 5
+
+# Delay (in seconds) before resubmitting a fragment, doubles with each attempt
+PIPELINE_BACKOFF = 0.5
+
+# Maximum delay (in seconds) before resubmitting a fragment
+PIPELINE_BACKOFF_MAX = 8.0
+
+# The Horizon response statuses of the submissions worth retrying
+TRANSIENT_STATUS = (429, 500, 502, 503, 504)
+
+# The Horizon response statuses telling that a listing is not supported
+UNSUPPORTED_STATUS = (400, 404)
+
+# The transaction result code in a Horizon reply printed as dictionary
+RESULT_CODE = re.compile(r'''['"]transaction['"]: ['"](tx_\w+)['"]''')
+
+# Number of recipients of SendMany that are encrypted for concurrently
+BROADCAST_WORKERS = 8
+
+# Number of transactions requested from Horizon per page
+PAGE_LIMIT = 200
+
+# Number of threads decrypting the message blocks in a history scan (see Scan)
+SCAN_WORKERS = os.cpu_count() or 1
+
+# Number of pages fetched ahead of the decryption in a history scan
+SCAN_PREFETCH = 4
+
+# Number of counterparties for which the shared secrets are cached
+SHARED_CACHE_SIZE = 256
+
+# Delay (in seconds) before reconnecting a broken transaction stream
+LISTEN_RETRY = 5.0
+
+
+def DefaultHorizon():
+    '''
+    Return the Horizon instance used by Whisperer instances
+    that were not given their own. The instance (and the HTTP
+    client behind it) is created on the first call.
+
+    Returns:
+        The module-wide Horizon instance.
+    '''
+    global horizon
+    if horizon is None:
+        from stellar_base.horizon import horizon_testnet
+        horizon = horizon_testnet()
+
+    return horizon
+
 
 def DumpBlocks(blocks):
     '''
@@ -76,13 +144,25 @@ def Printable(msg):
 
 
 class Whisperer:
-    def __init__(self, kp):
+    def __init__(self, kp, store = None, horizon = None, metrics = None, journal = None):
         '''
         Initialize the Whisper class using your Stellar.
 
         Args:
             kp: This is your Stellar keypair, as encoded by the
                 stellar_base.keypair class.
+            store: The MessageStore keeping the received messages.
+                   By default the messages are kept in memory only.
+            horizon: The Horizon client used for all network access. The
+                     asynchronous methods (SendAsync, ReadAsync) require an
+                     asynchronous client such as aiohorizon.AsyncHorizon.
+                     By default the module-wide Horizon instance is used.
+            metrics: The metrics.Metrics instance collecting the timings
+                     and the counters of this instance, None to disable.
+            journal: The journal.SendJournal keeping the fragments of the
+                     messages being sent, so that interrupted messages can
+                     be completed by Resume. By default the journal is
+                     kept in memory only.
 
         Returns:
             Instance of the object.
@@ -92,6 +172,54 @@ class Whisperer:
         self.__pk = VerifyKey(kp.raw_public_key()).to_curve25519_public_key()._public_key
         self.__address = kp.address().decode()
         self.__seed = kp.seed().decode()
+        self.__horizon = horizon if horizon is not None else DefaultHorizon()
+        self.__metrics = metrics
+        self.__journal = journal if journal is not None else SendJournal()
+
+        # the sequence numbers of our account are allocated locally
+        self.__sequencer = Sequencer()
+
+        # journal entries of the messages being sent, hidden from Resume,
+        # with the sequence number of their first fragment
+        self.__sending = {}
+        self.__sendingLock = threading.Lock()
+
+        # list only the payments to us, until Horizon turns out not to support it
+        self.__filtered = True
+
+        # LRU cache of counterparty address -> (curve25519 key, shared secret)
+        self.__secrets = OrderedDict()
+        self.__secretsLock = threading.Lock()
+
+        # inbox state, the received messages are kept in the store
+        self.__store = store if store is not None else MessageStore()
+        self.__cursor, self.__oldest, self.__exhausted, state = self.__store.LoadState(self.__address)
+        self.__reassembler = Reassembler(state)
+
+
+    def __timed(self, name):
+        '''
+        Time a block of code if the metrics are enabled.
+
+        Args:
+            name: Name of the timing histogram (see metrics.DESCRIPTIONS).
+
+        Returns:
+            The context manager timing the block.
+        '''
+        return self.__metrics.Time(name) if self.__metrics is not None else NULL_TIMER
+
+
+    def __count(self, name, n = 1):
+        '''
+        Increment a counter if the metrics are enabled.
+
+        Args:
+            name: Name of the counter (see metrics.DESCRIPTIONS).
+            n: The increment.
+        '''
+        if self.__metrics is not None:
+            self.__metrics.Count(name, n)
 
 
     @classmethod
@@ -106,6 +234,8 @@ class Whisperer:
         Returns:
             curve25519 public key as byte array.
         '''
+        from stellar_base.utils import decode_check
+
         return VerifyKey(decode_check('account', address)).to_curve25519_public_key()._public_key
 
 
@@ -122,40 +252,12 @@ class Whisperer:
         Returns:
             The encoded message as byte array.
         '''
-        # raw bytes, no encoding
-        if enc == 0:
-            return msg
-
-        # SMS TEXT encoding, not implemented yet
-        if enc == 1:
-            return EncodeGSM(msg)
-
-        # Sixbit ASCII, not implemented yet
-        if enc == 2:
-            return EncodeSixbit(msg)
-
-        # not implemented yet
-        if enc == 3:
-            return Compress(msg)
-
-        # reserved, not implemented
-        if enc == 4:
-            return msg
-
-        # reserved, not implemented
-        if enc == 5:
-            return msg
-
-        # reserved, not implemented
-        if enc == 6:
-            return msg
-
-        # reserved, not implemented
-        if enc == 7:
-            return msg
+        encoding = GetEncoding(enc)
+        if encoding is None:
+            print('\nError: wrong encoding {} specified!'.format(enc))
+            return None
 
-        print('\nError: wrong encoding {} specified!'.format(enc))
-        return None
+        return encoding.Encode(msg)
 
 
     @classmethod
@@ -170,51 +272,85 @@ class Whisperer:
         Returns:
             The decoded message as byte array.
         '''
+        return Whisperer.__decodeMany([msg], enc, printable)[0]
 
-        # raw bytes, no encoding
-        if enc == 0:
-            if printable:
-                return Printable(msg)
-            return msg
 
-        # SMS TEXT encoding, not implemented yet
-        if enc == 1:
-            return DecodeGSM(msg)
+    @classmethod
+    def __decodeMany(cls, msgs, enc, printable):
+        '''
+        Decode the messages using the provided encoding, all in one go.
+
+        Args:
+            mgss: The encoded messages as byte arrays.
+            enc: The respective encoding used.
+            printable: Convert binary messages to printable characters.
+
+        Returns:
+            List of the decoded messages as byte arrays.
+        '''
+        encoding = GetEncoding(enc)
+        if encoding is None:
+            print('Error: wrong encoding {} specified!'.format(enc))
+            return [None] * len(msgs)
+
+        try:
+            decoded = encoding.DecodeMany(msgs)
+        except Exception:
+            decoded = [Whisperer.__decodeRaw(encoding, m) for m in msgs]
+        if printable and encoding.binary:
+            return [Printable(m) for m in decoded]
+
+        return decoded
+
+
+    @classmethod
+    def __decodeRaw(cls, encoding, msg):
+        '''
+        Decode a single message, or return it as received in printable
+        form if it cannot be decoded. Anyone can send us a malformed
+        message, which must not prevent reading the others.
+
+        Args:
+            encoding: The encoders.Encoding of the message.
+            msg: The encoded message as byte array.
 
-        # Sixbit ASCII, not implemented yet
-        if enc == 2:
-            return DecodeSixbit(msg)
+        Returns:
+            The decoded message as byte array.
+        '''
+        try:
+            return encoding.DecodeMany([msg])[0]
+        except Exception as e:
+            print('\nError: unable to decode a message with the {} encoding ({})!'.format(encoding.name, e))
+            return Printable(msg)
 
-        # not implemented yet
-        if enc == 3:
-            return Decompress(msg)
 
-        # reserved, not implemented
-        if enc == 4:
-            if printable:
-                return Printable(msg)
-            return msg
+    @classmethod
+    def SelectEncoding(cls, msg):
+        '''
+        Select the encoding producing the fewest message fragments. Only
+        the encodings that reproduce the message exactly are considered,
+        e.g. Sixbit ASCII only for upper case text. In case of a tie the
+        encoding with the lower number wins.
 
-        # reserved, not implemented
-        if enc == 5:
-            if printable:
-                return Printable(msg)
-            return msg
+        Args:
+            msg: The message (byte array) that you want to transmit.
 
-        # reserved, not implemented
-        if enc == 6:
-            if printable:
-                return Printable(msg)
-            return msg
+        Returns:
+            The selected encoding.
+        '''
+        best, fragments = 0, (len(msg) + 30) // 31
+        for enc in sorted(c for c, e in ENCODINGS.items() if not e.binary):
+            try:
+                encoded = Whisperer.__encode(msg, enc)
+                if Whisperer.__decode(encoded, enc, False) != msg:
+                    continue
+            except Exception:
+                continue
 
-        # reserved, not implemented
-        if enc == 7:
-            if printable:
-                return Printable(msg)
-            return msg
+            if (len(encoded) + 30) // 31 < fragments:
+                best, fragments = enc, (len(encoded) + 30) // 31
 
-        print('Error: wrong encoding {} specified!'.format(enc))
-        return None
+        return best
 
 
     @classmethod
@@ -243,41 +379,36 @@ class Whisperer:
 
 
     @classmethod
-    def __encrypt(cls, blocks, k, baseIV):
+    def __encrypt(cls, blocks, k, IVs):
         '''
         Encrypt the message blocks using the provided shared secret
-        and initialization vector sequence start.
+        and initialization vectors.
 
         Args:
             k: The shared secret.
-            baseIV: The initialization vector for encrypting the first block.
+            IVs: The concatenated initialization vectors, one for each block.
 
         Returns:
             List of encrypted message blocks (byte arrays).
         '''
-        encrypted = []
-        for i in range(0, len(blocks)):
-            iv = (int.from_bytes(baseIV, 'big') + i).to_bytes(17, 'big')[-16:]
-            cypher = AES.new(k, AES.MODE_CBC, iv)
-            encrypted += [cypher.encrypt(blocks[i])]
-
-        return encrypted
+        return EncryptBlocks(blocks, k, IVs)
 
 
     @classmethod
-    def __decrypt(cls, encrypted, k, IV):
+    def __decrypt(cls, encrypted, k, IVs):
         '''
-        Decrypt the single message block using the provided
-        shared secret and initialization vector.
+        Decrypt the message blocks using the provided shared secret
+        and initialization vectors.
 
         Args:
+            encrypted: List of encrypted message blocks.
             k: The shared secret.
-            IV: The initialization vector.
-        '''
-        cypher = AES.new(k, AES.MODE_CBC, IV)
-        decrypted = cypher.decrypt(encrypted)
+            IVs: The concatenated initialization vectors, one for each block.
 
-        return decrypted
+        Returns:
+            List of decrypted message blocks (byte arrays).
+        '''
+        return DecryptBlocks(encrypted, k, IVs)
 
 
     @classmethod
@@ -308,10 +439,11 @@ class Whisperer:
         return block[0] &  7
 
 
-    def __send(self, address, encrypted, sequence_number):
+    def __build(self, address, encrypted, sequence_number):
         '''
-        Sends the encrypted blocks to the recipient as sequential
-        payment transactions.
+        Build and sign the payment transactions carrying the encrypted
+        blocks, one transaction per block with consecutive sequence numbers.
+        No network access is required, as the sequence number is given.
 
         Args:
             address: The Stellar address of the recipient.
@@ -320,21 +452,440 @@ class Whisperer:
                              sending account.
 
         Returns:
-            True if successful, False otherwise.
+            List of (sequence, hash, envelope) tuples, one for each block,
+            where sequence is the sequence number of the transaction, hash
+            its hex encoded hash and envelope the signed XDR envelope.
+        '''
+        from stellar_base.builder import Builder
+
+        envelopes = []
+        for i in range(0, len(encrypted)):
+            # the transaction carrying block i has the sequence number
+            # sequence_number + i + 1, which matches the IV used for block i
+            builder = Builder(secret = self.__seed, sequence = str(sequence_number + i), fee = FRAGMENT_FEE)
+            builder.append_payment_op(address, '0.0000001', 'XLM')
+            builder.add_hash_memo(encrypted[i])
+            builder.sign()
+            xdr = builder.gen_xdr()
+            h = binascii.hexlify(builder.te.hash_meta()).decode()
+            envelopes.append((sequence_number + i + 1, h, xdr))
+
+        return envelopes
+
+
+    @classmethod
+    def __status(cls, envelope, result):
+        '''
+        Interpret the Horizon response to a fragment submission. When
+        submitted in a pipeline, a transaction may reach the network before
+        its predecessor and gets rejected with a bad sequence error. In this
+        case the submission should be retried after a short delay.
+
+        Args:
+            envelope: The (sequence, hash, envelope) tuple of the transaction.
+            result: The response received from Horizon.
+
+        Returns:
+            The tuple (status, retry), where status is a dictionary with the
+            sending status of the fragment containing the keys 'sequence',
+            'hash', 'success' and 'result', and retry tells if the submission
+            should be retried.
+        '''
+        sequence, h, _ = envelope
+        if result.get('hash') is not None and result.get('ledger') is not None:
+            return {'sequence': sequence, 'hash': h, 'success': True, 'result': result}, False
+
+        return {'sequence': sequence, 'hash': h, 'success': False, 'result': result}, \
+               Whisperer.__badSequence(result)
+
+
+    @classmethod
+    def __badSequence(cls, result):
+        '''
+        Tell if the transaction was rejected because of its sequence number.
+
+        Args:
+            result: The response received from Horizon.
+
+        Returns:
+            True if the transaction failed with a bad sequence error.
+        '''
+        return result.get('extras', {}).get('result_codes', {}).get('transaction') == 'tx_bad_seq'
+
+
+    @classmethod
+    def __rejection(cls, e):
+        '''
+        Convert the error raised by the Horizon client into a response. The
+        stellar_base client raises on every error reply, with the status
+        code and the reply (as JSON or as printed dictionary) in the message.
+        Only the transaction result code is recovered from a printed reply,
+        as parsing it (ast.literal_eval) is not thread-safe.
+
+        Args:
+            e: The HorizonError exception.
+
+        Returns:
+            The Horizon error response as dictionary, with the key 'status',
+            or with the key 'error' if no reply was received.
         '''
+        if getattr(e, 'status_code', None) is None:
+            return {'error': str(e)}
+
+        message = getattr(e, 'message', str(e))
+        body = message[message.find('] ') + 2:] if '] ' in message else ''
         try:
-            for i in range(0, len(encrypted)):
-                sequence = str(sequence_number + i)
-                builder = Builder(secret = self.__seed, sequence = sequence)
-                builder.append_payment_op(address, '0.0000001', 'XLM')
-                builder.add_hash_memo(encrypted[i])
-                builder.sign()
-                builder.submit()
-        except:
-            return False
+            response = json.loads(body)
+        except ValueError:
+            response = None
+        if not isinstance(response, dict):
+            response = {'title': message}
+            code = RESULT_CODE.search(body)
+            if code is not None:
+                response['extras'] = {'result_codes': {'transaction': code.group(1)}}
+        response['status'] = e.status_code
 
-        # todo: check sending status
-        return True
+        return response
+
+
+    @classmethod
+    def __transient(cls, result):
+        '''
+        Tell if the submission failed for a reason unrelated to the
+        transaction, e.g. a network error or an overloaded Horizon. The
+        transaction may have been applied nevertheless.
+
+        Args:
+            result: The response received from Horizon.
+
+        Returns:
+            True if the submission should be retried.
+        '''
+        return 'error' in result or result.get('status') in TRANSIENT_STATUS
+
+
+    @classmethod
+    def __backoff(cls, attempt):
+        '''
+        Return the delay (in seconds) before resubmitting a fragment.
+        '''
+        return min(PIPELINE_BACKOFF * 2 ** attempt, PIPELINE_BACKOFF_MAX)
+
+
+    def __landed(self, h):
+        '''
+        Look up a transaction that may have been applied although its
+        submission was not confirmed.
+
+        Args:
+            h: The hash of the transaction.
+
+        Returns:
+            The transaction details, None if it was not applied.
+        '''
+        from stellar_base.exceptions import HorizonError
+
+        try:
+            result = self.__horizon.query('/transactions/{}'.format(h))
+        except HorizonError as e:
+            if e.status_code != 404:
+                self.__count('request_errors_total')
+            return None
+        except Exception:
+            self.__count('request_errors_total')
+            return None
+
+        return result if result.get('hash') == h and result.get('ledger') is not None else None
+
+
+    async def __landedAsync(self, h):
+        '''
+        Asynchronous version of __landed.
+        '''
+        from stellar_base.exceptions import HorizonError
+
+        try:
+            result = await self.__horizon.query('/transactions/{}'.format(h))
+        except HorizonError as e:
+            if e.status_code != 404:
+                self.__count('request_errors_total')
+            return None
+        except Exception:
+            self.__count('request_errors_total')
+            return None
+
+        return result if result.get('hash') == h and result.get('ledger') is not None else None
+
+
+    def __submit(self, envelope, uncertain = False, overtaking = True):
+        '''
+        Submit a single signed fragment transaction to Horizon, retrying
+        with exponential backoff if it overtook its predecessor (see
+        __status) or if the submission failed with a transient error.
+        Once a submission failed with a transient error, a bad sequence
+        error may mean that the transaction was applied after all, which
+        is then looked up.
+
+        Args:
+            envelope: The (sequence, hash, envelope) tuple of the transaction.
+            uncertain: True if the transaction may have been applied already.
+            overtaking: False if the transaction cannot have overtaken its
+                        predecessor, i.e. a bad sequence error is final.
+
+        Returns:
+            Dictionary with the sending status of the fragment (see __status).
+        '''
+        from stellar_base.exceptions import HorizonError
+
+        for attempt in range(0, PIPELINE_RETRIES + 1):
+            try:
+                with self.__timed('submit_seconds'):
+                    result = self.__horizon.submit(envelope[2])
+            except HorizonError as e:
+                result = Whisperer.__rejection(e)
+            except Exception as e:
+                result = {'error': str(e)}
+            if Whisperer.__transient(result):
+                self.__count('request_errors_total')
+
+            status, retry = Whisperer.__status(envelope, result)
+            if retry and uncertain:
+                landed = self.__landed(envelope[1])
+                if landed is not None:
+                    status, retry = Whisperer.__status(envelope, landed)
+            retry = retry and overtaking
+
+            transient = Whisperer.__transient(result) and not status['success']
+            uncertain = uncertain or transient
+            if not (retry or transient) or attempt == PIPELINE_RETRIES:
+                break
+            self.__count('resubmissions_total')
+            time.sleep(Whisperer.__backoff(attempt))
+
+        if status['success']:
+            self.__journal.Confirm(envelope[1])
+
+        return status
+
+
+    async def __submitAsync(self, envelope, uncertain = False, overtaking = True):
+        '''
+        Asynchronous version of __submit.
+
+        Args:
+            envelope: The (sequence, hash, envelope) tuple of the transaction.
+            uncertain: True if the transaction may have been applied already.
+            overtaking: False if a bad sequence error is final.
+
+        Returns:
+            Dictionary with the sending status of the fragment (see __status).
+        '''
+        from stellar_base.exceptions import HorizonError
+        import asyncio
+
+        for attempt in range(0, PIPELINE_RETRIES + 1):
+            try:
+                with self.__timed('submit_seconds'):
+                    result = await self.__horizon.submit(envelope[2])
+            except HorizonError as e:
+                result = Whisperer.__rejection(e)
+            except Exception as e:
+                result = {'error': str(e)}
+            if Whisperer.__transient(result):
+                self.__count('request_errors_total')
+
+            status, retry = Whisperer.__status(envelope, result)
+            if retry and uncertain:
+                landed = await self.__landedAsync(envelope[1])
+                if landed is not None:
+                    status, retry = Whisperer.__status(envelope, landed)
+            retry = retry and overtaking
+
+            transient = Whisperer.__transient(result) and not status['success']
+            uncertain = uncertain or transient
+            if not (retry or transient) or attempt == PIPELINE_RETRIES:
+                break
+            self.__count('resubmissions_total')
+            await asyncio.sleep(Whisperer.__backoff(attempt))
+
+        if status['success']:
+            self.__journal.Confirm(envelope[1])
+
+        return status
+
+
+    def __send(self, envelopes, uncertain = False):
+        '''
+        Sends the signed fragment transactions to the network. The
+        transactions are submitted in a pipelined way, in the order
+        of their sequence numbers, without waiting for the previous
+        one to be included in a ledger. The first transaction is
+        submitted alone, as its sequence number may have been made
+        outdated by another sender using the same account, so that no
+        following one lands when it is rejected. It is resubmitted after
+        a bad sequence error only while the preceding messages are still
+        being sent. Once a pipelined transaction overtook its predecessor
+        and was rejected, no further one is pipelined: the rejected and
+        the held back transactions are submitted one by one, so that a
+        Horizon without a submission queue is not flooded with rejected
+        resubmissions.
+
+        Args:
+            envelopes: The signed transactions (see __build).
+            uncertain: True if the transactions may have been applied
+                       already (see __submit).
+
+        Returns:
+            List with the sending status of each fragment (see __status).
+        '''
+        from concurrent.futures import ThreadPoolExecutor
+
+        status = []
+        if len(envelopes) > 0:
+            status.append(self.__submit(envelopes[0], uncertain, self.__preceded(envelopes[0][0])))
+            envelopes = envelopes[1:]
+
+        if len(status) > 0 and not status[0]['success']:
+            status += Whisperer.__unsent(envelopes)
+        elif len(envelopes) > 0:
+            overtaken = threading.Event()
+
+            def submit(envelope):
+                # hold back the remaining transactions after a bad sequence
+                if overtaken.is_set():
+                    return None
+                result = self.__submit(envelope, uncertain, False)
+                if Whisperer.__overtook(result):
+                    overtaken.set()
+                return result
+
+            with ThreadPoolExecutor(max_workers = PIPELINE_DEPTH) as executor:
+                pipelined = list(executor.map(submit, envelopes))
+
+            for i in range(0, len(envelopes)):
+                if not Whisperer.__overtook(pipelined[i]):
+                    continue
+                if i > 0 and not pipelined[i - 1]['success']:
+                    pipelined[i] = Whisperer.__unsent([envelopes[i]])[0]
+                    continue
+                if pipelined[i] is not None:
+                    self.__count('resubmissions_total')
+                pipelined[i] = self.__submit(envelopes[i], uncertain, False)
+            status += pipelined
+
+        if DEBUG:
+            Whisperer.__dumpStatus(status)
+
+        return status
+
+
+    async def __sendAsync(self, envelopes, uncertain = False):
+        '''
+        Asynchronous version of __send.
+
+        Args:
+            envelopes: The signed transactions (see __build).
+            uncertain: True if the transactions may have been applied
+                       already (see __submit).
+
+        Returns:
+            List with the sending status of each fragment (see __status).
+        '''
+        import asyncio
+
+        status = []
+        if len(envelopes) > 0:
+            status.append(await self.__submitAsync(envelopes[0], uncertain, self.__preceded(envelopes[0][0])))
+            envelopes = envelopes[1:]
+
+        if len(status) > 0 and not status[0]['success']:
+            status += Whisperer.__unsent(envelopes)
+        elif len(envelopes) > 0:
+            semaphore = asyncio.Semaphore(PIPELINE_DEPTH)
+            overtaken = False
+
+            async def submit(envelope):
+                nonlocal overtaken
+                async with semaphore:
+                    # hold back the remaining transactions after a bad sequence
+                    if overtaken:
+                        return None
+                    result = await self.__submitAsync(envelope, uncertain, False)
+                    if Whisperer.__overtook(result):
+                        overtaken = True
+                    return result
+
+            pipelined = await asyncio.gather(*[submit(e) for e in envelopes])
+
+            for i in range(0, len(envelopes)):
+                if not Whisperer.__overtook(pipelined[i]):
+                    continue
+                if i > 0 and not pipelined[i - 1]['success']:
+                    pipelined[i] = Whisperer.__unsent([envelopes[i]])[0]
+                    continue
+                if pipelined[i] is not None:
+                    self.__count('resubmissions_total')
+                pipelined[i] = await self.__submitAsync(envelopes[i], uncertain, False)
+            status += pipelined
+
+        if DEBUG:
+            Whisperer.__dumpStatus(status)
+
+        return status
+
+
+    @classmethod
+    def __dumpStatus(cls, status):
+        '''
+        Dumps the sending status of the fragments to the standard output.
+        '''
+        for s in status:
+            print('Fragment {} {}: {}'.format(s['sequence'], s['hash'], 'OK' if s['success'] else 'FAILED'))
+
+
+    def __counterparty(self, address):
+        '''
+        Return the curve25519 public key of the counterparty and the
+        shared secret according to X25519. Both are cached for the
+        most recently used counterparties, the shared secrets of the
+        evicted ones are overwritten with zeros. As this may happen while
+        other threads are still using them, a copy of the shared secret
+        is returned.
+
+        Args:
+            address: Stellar address of the counterparty.
+
+        Returns:
+            The tuple (pk, k) of the curve25519 public key of the
+            counterparty as bytes and a copy of the shared secret as
+            bytearray.
+        '''
+        with self.__secretsLock:
+            entry = self.__secrets.get(address)
+            if entry is not None:
+                self.__secrets.move_to_end(address)
+                return entry[0], bytearray(entry[1])
+
+        with self.__timed('dh_seconds'):
+            # convert the recipient public address to curve25519 public key
+            pk = Whisperer.__addressToPk(address)
+
+            # calculate the shared secret according to X25519
+            k = bytearray(crypto_box_beforenm(pk, self.__sk))
+        if DEBUG:
+            print('\nShared secret = {}'.format(base64.b16encode(k).decode()))
+
+        with self.__secretsLock:
+            # another thread may have cached it meanwhile
+            previous = self.__secrets.pop(address, None)
+            if previous is not None:
+                previous[1][:] = bytes(len(previous[1]))
+            self.__secrets[address] = (pk, k)
+            while len(self.__secrets) > SHARED_CACHE_SIZE:
+                _, (_, evicted) = self.__secrets.popitem(last = False)
+                evicted[:] = bytes(len(evicted))
+
+            return pk, bytearray(k)
 
 
     def __shared(self, address):
@@ -347,170 +898,1615 @@ class Whisperer:
         Returns:
             The shared secred according to X25519 as byte array.
         '''
-        # convert the recipient public address to curve25519 public key
-        pk = Whisperer.__addressToPk(address)
+        return self.__counterparty(address)[1]
 
-        # calculate the shared secret according to X25519
-        k = crypto_box_beforenm(pk, self.__sk)
-        if DEBUG:
-            print('\nShared secret = {}'.format(base64.b16encode(k).decode()))
 
-        return k
+    def Forget(self):
+        '''
+        Overwrite all cached shared secrets with zeros and empty the cache.
+
+        Returns:
+            None.
+        '''
+        with self.__secretsLock:
+            for _, k in self.__secrets.values():
+                k[:] = bytes(len(k))
+            self.__secrets.clear()
 
 
-    def Send(self, address, msg, encoding):
+    def __fragment(self, msg, encoding):
         '''
-        Send the message to the Stellar address using the requested
-        encoding.
+        Encode and encapsulate the message.
 
         Args:
-            address: This is the public Stellar address of your receiver.
             msg: The message (byte array) that you want to transmit.
             encoding: The encoding to use for the message.
 
         Returns:
-            The return value. True if sending was successful, False otherwise.
+            List of message blocks, one for each fragment.
         '''
-
-        if address == self.__address:
-            print('\nError: sending to yourself is not yet supported!')
-            return False
-
         # encode message
-        encoded = Whisperer.__encode(msg, encoding)
+        with self.__timed('encode_seconds'):
+            encoded = Whisperer.__encode(msg, encoding)
 
         # encapsulate message
-        blocks = Whisperer.__encapsulate(encoded, encoding)
+        with self.__timed('encapsulate_seconds'):
+            blocks = Whisperer.__encapsulate(encoded, encoding)
         if DEBUG:
             DumpBlocks(blocks)
 
-        # calculate shared secret
-        k = self.__shared(address)
+        return blocks
+
+
+    def __seal(self, address, blocks, sequence_number):
+        '''
+        Encrypt the message blocks and build the signed transactions
+        carrying them.
+
+        Args:
+            address: This is the public Stellar address of your receiver.
+            blocks: The message blocks (see __fragment).
+            sequence_number: The sequence number preceding the ones of
+                             the fragments.
 
-        # obtain the account sequence number
-        sequence_number = int(horizon.account(self.__address).get('sequence'))
+        Returns:
+            The signed transactions (see __build).
+        '''
+        # calculate shared secret
+        pk, k = self.__counterparty(address)
 
-        # build the IV
-        pk = Whisperer.__addressToPk(address)
-        IV = (int.from_bytes(pk[0:16], 'big') + sequence_number).to_bytes(17, 'big')[-16:]
+        # build the IVs, block i is sent with sequence number sequence_number + i + 1
+        IVs = BuildIVs(pk, range(sequence_number, sequence_number + len(blocks)))
         if DEBUG:
-            print('Base IV = {}'.format(base64.b16encode(IV).decode()))
+            print('Base IV = {}'.format(base64.b16encode(IVs[0:16]).decode()))
 
         # encrypt
-        encrypted = Whisperer.__encrypt(blocks, k, IV)
+        with self.__timed('encrypt_seconds'):
+            encrypted = Whisperer.__encrypt(blocks, k, IVs)
         if DEBUG:
             DumpEncrypted(encrypted)
 
-        # actually perform the sending of the encrypted blocks
-        return self.__send(address, encrypted, sequence_number)
+        with self.__timed('sign_seconds'):
+            return self.__build(address, encrypted, sequence_number)
 
 
-    def Read(self, address = None, tail = 1, cursor = None, printable = False):
+    def __sequence(self):
         '''
-        Read the last `tail` received messages. The function will:
-        - Iterate through the received payment operations with the hash
-          memo type field populated in the reverse order, starting with
-          the last.
-        - Decrypt the encrypted blocks one after another using the
-          (deterministic) shared secret and IV.
-        - Check which blocks fit together by considering the length field
-          as a separator (the last block with non-zero length header field
-          marks the start of the preceding message).
-
-        Args:
-            address: This is the public Stellar address of the sender.
-            tail: Read n = `tail` last messages.
-            cursor: Read all messages received after this sequence number.
-            printable:
+        Request the sequence number of our account from Horizon.
 
         Returns:
-            The secret messages.
+            The current sequence number of the account.
         '''
+        with self.__timed('account_seconds'):
+            return int(self.__horizon.account(self.__address).get('sequence'))
 
-        # Get all transactions
-        tr = horizon.account_transactions(self.__address, order='desc', limit=100).get('_embedded').get('records')
 
-        if DEBUG > 1:
-            pprint.pprint(tr)
+    async def __sequenceAsync(self):
+        '''
+        Asynchronous version of __sequence.
 
-        # filter out only transations from specified address and with memo type = hash
-        tr = [t for t in tr if (t.get('source_account') == address or address is None) \
-                                and t.get('source_account') != self.__address \
-                                and t.get('memo_type') == 'hash']
+        Returns:
+            The current sequence number of the account.
+        '''
+        with self.__timed('account_seconds'):
+            return int((await self.__horizon.account(self.__address)).get('sequence'))
 
-        # decrypt memo blocks until a message is found
-        messages = []
-        encodings = []
-        sender = []
-        dates = []
-        nfound = 0
-        for t in tr:
-            # get the transaction source address
-            address = t.get('source_account')
-
-            # calcul01ate shared secret
-            k = self.__shared(address)
-
-            # get sequence number
-            sequence_number = int(t.get('source_account_sequence')) - 1
-
-            # build the IV and decrypt
-            pk = Whisperer.__addressToPk(self.__address)
-            IV = (int.from_bytes(pk[0:16], 'big') + sequence_number).to_bytes(17, 'big')[-16:]
-            encrypted = base64.b64decode(t.get('memo'))
-            block = Whisperer.__decrypt(encrypted, k, IV)
-
-            if DEBUG:
-                DumpBlocks([block])
-
-            # check if we have found the message
-            l = Whisperer.__getLength(block)
-            # this is not the last block of a message
-            if l == 0:
-                # either we have not yet found the last message
-                if len(messages) == 0:
-                    continue
-                # or this is a block of the current message
-                messages[len(messages)-1].append(block[1:])
-            # we found a new message
-            if l > 0:
-                nfound += 1
-                # we already found enough messages
-                if (nfound > tail):
-                    break
-                messages.append([block[1:(l + 1)]])
-                encodings.append(Whisperer.__getEncoding(block))
-                sender.append(t.get('source_account'))
-                dates.append(t.get('created_at'))
 
-        if DEBUG:
-            print(encodings)
+    def __record(self, addresses, encoding, length, envelopes):
+        '''
+        Write the signed transactions of the messages to the journal
+        before submitting them.
 
-        # assemble the encoded messages
-        messages = [b''.join(reversed(m)) for m in messages]
+        Args:
+            addresses: The public Stellar addresses of the receivers.
+            encoding: The encoding used for the message.
+            length: The length of the message before encoding.
+            envelopes: List with the signed transactions (see __build)
+                       for each receiver.
 
-        # decode the messages
-        messages = [Whisperer.__decode(messages[i], encodings[i], printable) for i in range(0, len(messages))]
+        Returns:
+            List with the journal entry of each message.
+        '''
+        with self.__sendingLock:
+            entries = [self.__journal.Begin(self.__address, addresses[i], encoding, length, envelopes[i])
+                       for i in range(0, len(addresses))]
+            self.__sending.update((entries[i], envelopes[i][0][0]) for i in range(0, len(entries)))
 
-        return [[dates[i], sender[i], messages[i]] for i in range(0, len(messages))]
+        return entries
 
 
-    @classmethod
-    def ValidateAddress(cls, address):
+    def __settle(self, status, entries):
         '''
-        Validate the given Stellar address.
+        Check the sending status of the fragments using a reserved range
+        of sequence numbers. If any of them failed, the sequence number
+        of our account is no longer known and it is requested again for
+        the next message. The completely sent messages are removed from
+        the journal, the others are left for Resume.
 
         Args:
-            address: The public address of a Stellar account.
+            status: The sending status of the fragments (see __status).
+            entries: The journal entries of the messages (see __record),
+                     each having an equal share of the fragments.
 
-        Return:
-            True if public address is valid, False otherwise.
+        Returns:
+            True if the first fragment was rejected because of its sequence
+            number and no other fragment landed, i.e. the allocated sequence
+            numbers were outdated and nothing was sent, False otherwise.
         '''
-        try:
-            decode_check('account', address)
-            return True
-        except:
-            return False
+        stale = False
+        if not all(s['success'] for s in status):
+            self.__sequencer.Invalidate()
+            stale = Whisperer.__badSequence(status[0]['result']) and not any(s['success'] for s in status)
+
+        n = len(status) // len(entries)
+        for i in range(0, len(entries)):
+            if stale or all(s['success'] for s in status[i * n:(i + 1) * n]):
+                self.__journal.Finish(entries[i])
+
+        with self.__sendingLock:
+            for entry in entries:
+                del self.__sending[entry]
+
+        return stale
+
+
+    def __preceded(self, sequence):
+        '''
+        Tell if messages sent with lower sequence numbers are still being
+        submitted, i.e. if a transaction rejected because of its sequence
+        number may have overtaken their fragments.
+
+        Args:
+            sequence: The sequence number of the transaction.
+
+        Returns:
+            True if a preceding message is being sent.
+        '''
+        with self.__sendingLock:
+            return any(s < sequence for s in self.__sending.values())
+
+
+    def __interrupted(self, resumed):
+        '''
+        Tell if messages interrupted by a failure are still pending after
+        resuming them. No new message can be sent until they are completed,
+        as its fragments would directly follow the ones already sent of an
+        interrupted message, and the receiver would join them into one.
+
+        Args:
+            resumed: The result of Resume (see Resume).
+
+        Returns:
+            True if the sending must be refused.
+        '''
+        if len(resumed) == 0 or len(self.__pending()) == 0:
+            return False
+
+        print('\nError: unable to complete the previously interrupted messages!')
+        return True
+
+
+    def Send(self, address, msg, encoding = None):
+        '''
+        Send the message to the Stellar address using the requested
+        encoding. The messages previously interrupted by a failure are
+        completed first (see Resume), nothing is sent if this fails.
+
+        Args:
+            address: This is the public Stellar address of your receiver.
+            msg: The message (byte array) that you want to transmit.
+            encoding: The encoding to use for the message, None to select
+                      the one producing the fewest fragments (see
+                      SelectEncoding).
+
+        Returns:
+            List with the sending status of each message fragment. Each
+            status is a dictionary with the keys 'sequence', 'hash',
+            'success', 'result' and 'encoding' (the encoding used). The
+            list is empty if nothing was sent.
+        '''
+
+        if address == self.__address:
+            print('\nError: sending to yourself is not yet supported!')
+            return []
+
+        if encoding is None:
+            encoding = Whisperer.SelectEncoding(msg)
+
+        try:
+            blocks = self.__fragment(msg, encoding)
+        except Exception as e:
+            print('\nError: unable to build the transactions ({})!'.format(e))
+            return []
+
+        # send once more if another sender made the sequence numbers outdated
+        for attempt in range(0, 2):
+            if self.__interrupted(self.Resume()):
+                return []
+            sequence_number = self.__sequencer.Reserve(len(blocks), self.__sequence)
+            try:
+                envelopes = self.__seal(address, blocks, sequence_number)
+                entries = self.__record([address], encoding, len(msg), [envelopes])
+            except Exception as e:
+                self.__sequencer.Release(sequence_number, len(blocks))
+                print('\nError: unable to build the transactions ({})!'.format(e))
+                return []
+
+            # actually perform the sending of the encrypted blocks
+            status = self.__send(envelopes)
+            if not self.__settle(status, entries):
+                break
+
+        return self.__sent(len(msg), encoding, status)
+
+
+    async def SendAsync(self, address, msg, encoding = None):
+        '''
+        Asynchronous version of Send, requires an asynchronous
+        Horizon client.
+
+        Args:
+            address: This is the public Stellar address of your receiver.
+            msg: The message (byte array) that you want to transmit.
+            encoding: The encoding to use for the message, None to select
+                      it automatically.
+
+        Returns:
+            List with the sending status of each message fragment.
+        '''
+
+        if address == self.__address:
+            print('\nError: sending to yourself is not yet supported!')
+            return []
+
+        if encoding is None:
+            encoding = Whisperer.SelectEncoding(msg)
+
+        try:
+            blocks = self.__fragment(msg, encoding)
+        except Exception as e:
+            print('\nError: unable to build the transactions ({})!'.format(e))
+            return []
+
+        # send once more if another sender made the sequence numbers outdated
+        for attempt in range(0, 2):
+            if self.__interrupted(await self.ResumeAsync()):
+                return []
+            sequence_number = await self.__sequencer.ReserveAsync(len(blocks), self.__sequenceAsync)
+            try:
+                envelopes = self.__seal(address, blocks, sequence_number)
+                entries = self.__record([address], encoding, len(msg), [envelopes])
+            except Exception as e:
+                self.__sequencer.Release(sequence_number, len(blocks))
+                print('\nError: unable to build the transactions ({})!'.format(e))
+                return []
+
+            # actually perform the sending of the encrypted blocks
+            status = await self.__sendAsync(envelopes)
+            if not self.__settle(status, entries):
+                break
+
+        return self.__sent(len(msg), encoding, status)
+
+
+    def __prepareMany(self, addresses, blocks, sequence_number):
+        '''
+        Encrypt the message blocks for each recipient and build the signed
+        transactions. The recipients are processed concurrently, the
+        fragments of each recipient get a contiguous range of sequence
+        numbers, following the ones of the previous recipient.
+
+        Args:
+            addresses: The public Stellar addresses of the receivers.
+            blocks: The message blocks (see __fragment).
+            sequence_number: The sequence number preceding the ones of
+                             the fragments.
+
+        Returns:
+            List with the signed transactions (see __build) of each
+            recipient.
+        '''
+        n = len(blocks)
+
+        def prepare(i):
+            # the fragments for recipient i follow the ones for recipient i - 1
+            return self.__seal(addresses[i], blocks, sequence_number + i * n)
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers = BROADCAST_WORKERS) as executor:
+            return list(executor.map(prepare, range(0, len(addresses))))
+
+
+    def __recipients(self, addresses):
+        '''
+        Drop the duplicate addresses and our own address.
+
+        Args:
+            addresses: The public Stellar addresses of the receivers.
+
+        Returns:
+            The addresses to send to, in the original order.
+        '''
+        recipients = []
+        for address in addresses:
+            if address == self.__address:
+                print('\nError: sending to yourself is not yet supported!')
+            elif address not in recipients:
+                recipients.append(address)
+
+        return recipients
+
+
+    def SendMany(self, addresses, msg, encoding = None):
+        '''
+        Send the same message to many Stellar addresses. The message is
+        encoded once and encrypted for all the recipients concurrently.
+        All the fragment transactions are submitted as one pipelined
+        stream, the fragments for each recipient having consecutive
+        sequence numbers.
+
+        Args:
+            addresses: The public Stellar addresses of the receivers.
+            msg: The message (byte array) that you want to transmit.
+            encoding: The encoding to use for the message, None to select
+                      the one producing the fewest fragments (see
+                      SelectEncoding).
+
+        Returns:
+            Dictionary with the sending status of the message fragments
+            (see Send) for each address. The list is empty if nothing was
+            sent to the address.
+        '''
+        recipients = self.__recipients(addresses)
+        result = {address: [] for address in addresses}
+        if len(recipients) == 0:
+            return result
+
+        if encoding is None:
+            encoding = Whisperer.SelectEncoding(msg)
+
+        try:
+            blocks = self.__fragment(msg, encoding)
+        except Exception as e:
+            print('\nError: unable to build the transactions ({})!'.format(e))
+            return result
+        n = len(blocks) * len(recipients)
+
+        # send once more if another sender made the sequence numbers outdated
+        for attempt in range(0, 2):
+            if self.__interrupted(self.Resume()):
+                return result
+            sequence_number = self.__sequencer.Reserve(n, self.__sequence)
+            try:
+                envelopes = self.__prepareMany(recipients, blocks, sequence_number)
+                entries = self.__record(recipients, encoding, len(msg), envelopes)
+            except Exception as e:
+                self.__sequencer.Release(sequence_number, n)
+                print('\nError: unable to build the transactions ({})!'.format(e))
+                return result
+
+            # send all the fragments in one go
+            status = self.__send([e for r in envelopes for e in r])
+            if not self.__settle(status, entries):
+                break
+
+        # split the status by recipient
+        for i in range(0, len(recipients)):
+            result[recipients[i]] = self.__sent(len(msg), encoding, status[i * len(blocks):(i + 1) * len(blocks)])
+
+        return result
+
+
+    async def SendManyAsync(self, addresses, msg, encoding = None):
+        '''
+        Asynchronous version of SendMany, requires an asynchronous
+        Horizon client.
+
+        Args:
+            addresses: The public Stellar addresses of the receivers.
+            msg: The message (byte array) that you want to transmit.
+            encoding: The encoding to use for the message, None to select
+                      it automatically.
+
+        Returns:
+            Dictionary with the sending status of the message fragments
+            for each address.
+        '''
+        recipients = self.__recipients(addresses)
+        result = {address: [] for address in addresses}
+        if len(recipients) == 0:
+            return result
+
+        if encoding is None:
+            encoding = Whisperer.SelectEncoding(msg)
+
+        try:
+            blocks = self.__fragment(msg, encoding)
+        except Exception as e:
+            print('\nError: unable to build the transactions ({})!'.format(e))
+            return result
+        n = len(blocks) * len(recipients)
+
+        # send once more if another sender made the sequence numbers outdated
+        for attempt in range(0, 2):
+            if self.__interrupted(await self.ResumeAsync()):
+                return result
+            sequence_number = await self.__sequencer.ReserveAsync(n, self.__sequenceAsync)
+            try:
+                envelopes = self.__prepareMany(recipients, blocks, sequence_number)
+                entries = self.__record(recipients, encoding, len(msg), envelopes)
+            except Exception as e:
+                self.__sequencer.Release(sequence_number, n)
+                print('\nError: unable to build the transactions ({})!'.format(e))
+                return result
+
+            # send all the fragments in one go
+            status = await self.__sendAsync([e for r in envelopes for e in r])
+            if not self.__settle(status, entries):
+                break
+
+        # split the status by recipient
+        for i in range(0, len(recipients)):
+            result[recipients[i]] = self.__sent(len(msg), encoding, status[i * len(blocks):(i + 1) * len(blocks)])
+
+        return result
+
+
+    def __pending(self):
+        '''
+        Return the messages left in the journal by an interrupted sending,
+        except the messages being sent.
+
+        Returns:
+            List of the journal entries (see SendJournal.Pending) with the
+            fragments split into the confirmed and the remaining ones.
+        '''
+        with self.__sendingLock:
+            entries = [p for p in self.__journal.Pending(self.__address) if p[0] not in self.__sending]
+
+        pending = []
+        for entry, recipient, encoding, length, fragments in entries:
+            confirmed = [{'sequence': f[0], 'hash': f[1], 'success': True, 'result': None}
+                         for f in fragments if f[3]]
+            remaining = [(f[0], f[1], f[2]) for f in fragments if not f[3]]
+            pending.append((entry, recipient, encoding, length, confirmed, remaining))
+
+        return pending
+
+
+    @classmethod
+    def __overtook(cls, status):
+        '''
+        Tell if a pipelined fragment was held back, or rejected because it
+        reached the network before its predecessor (see __send).
+        '''
+        return status is None or (not status['success'] and Whisperer.__badSequence(status['result']))
+
+
+    @classmethod
+    def __unsent(cls, envelopes):
+        '''
+        Return the sending status of the fragments that were not submitted.
+        '''
+        return [Whisperer.__status(e, {'error': 'not submitted'})[0] for e in envelopes]
+
+
+    def __resumed(self, entry, recipient, encoding, length, confirmed, status):
+        '''
+        Remove the resumed message from the journal if it was completely
+        sent, or if its remaining fragments can no longer be sent as their
+        sequence numbers were used by other transactions.
+
+        Returns:
+            The [recipient, status] list of the message (see Resume), the
+            status of the fragments being in the order of their sequence
+            numbers.
+        '''
+        if all(s['success'] for s in status) or Whisperer.__badSequence(status[0]['result']):
+            self.__journal.Finish(entry)
+
+        status = sorted(confirmed + status, key = lambda s: s['sequence'])
+
+        return [recipient, self.__sent(length, encoding, status)]
+
+
+    def Resume(self):
+        '''
+        Complete the messages interrupted by a failure or a crash, by
+        submitting their remaining fragments from the journal, without
+        encrypting and signing them again. The remaining fragments can be
+        sent only if the sequence numbers reserved for them were not used
+        by other transactions, so Resume is called by Send before sending
+        a new message. Calling it first allows to report the resumed
+        messages.
+
+        Returns:
+            List of [recipient, status] lists, one for each resumed message
+            in the order they were sent, where status is the list with the
+            sending status of each message fragment (see Send).
+        '''
+        pending = self.__pending()
+        resumed = []
+        for entry, recipient, encoding, length, confirmed, remaining in pending:
+            if len(remaining) == 0:
+                self.__journal.Finish(entry)
+                continue
+            # the first remaining fragment tells if the others can still be sent
+            status = self.__send(remaining, True)
+            resumed.append(self.__resumed(entry, recipient, encoding, length, confirmed, status))
+
+        # the sequence number of our account has changed
+        if len(pending) > 0:
+            self.__sequencer.Invalidate()
+
+        return resumed
+
+
+    async def ResumeAsync(self):
+        '''
+        Asynchronous version of Resume, requires an asynchronous
+        Horizon client.
+
+        Returns:
+            List of [recipient, status] lists, one for each resumed message.
+        '''
+        pending = self.__pending()
+        resumed = []
+        for entry, recipient, encoding, length, confirmed, remaining in pending:
+            if len(remaining) == 0:
+                self.__journal.Finish(entry)
+                continue
+            # the first remaining fragment tells if the others can still be sent
+            status = await self.__sendAsync(remaining, True)
+            resumed.append(self.__resumed(entry, recipient, encoding, length, confirmed, status))
+
+        # the sequence number of our account has changed
+        if len(pending) > 0:
+            self.__sequencer.Invalidate()
+
+        return resumed
+
+
+    def __sent(self, length, encoding, status):
+        '''
+        Count the sent message and fragments, and add the encoding
+        to the sending status of the fragments.
+
+        Args:
+            length: The length of the message before encoding.
+            encoding: The encoding used for the message.
+            status: The sending status of the fragments (see __status).
+
+        Returns:
+            The sending status of the fragments (see Send).
+        '''
+        if self.__metrics is not None:
+            sent = sum(1 for s in status if s['success'])
+            self.__count('fragments_sent_total', sent)
+            self.__count('fragments_failed_total', len(status) - sent)
+            if sent == len(status):
+                self.__count('messages_sent_total')
+                self.__count('bytes_sent_total', length)
+
+        return [dict(s, encoding = encoding) for s in status]
+
+
+    @classmethod
+    def __records(cls, response):
+        '''
+        Extract the transaction records from a Horizon response.
+
+        Args:
+            response: The response to a transaction listing request.
+
+        Returns:
+            List of transaction records.
+        '''
+        records = response.get('_embedded', {}).get('records', [])
+        if DEBUG > 1:
+            import pprint
+            pprint.pprint(records)
+
+        return records
+
+
+    @classmethod
+    def __params(cls, cursor, order, limit):
+        '''
+        Build the query parameters of a page of payments.
+
+        Args:
+            cursor: The paging token to start after, None for the start
+                    (or end) of the transaction history.
+            order: Either 'asc' or 'desc'.
+            limit: The maximum number of records.
+
+        Returns:
+            The query parameters as dictionary.
+        '''
+        params = {'order': order, 'limit': limit, 'join': 'transactions'}
+        if cursor is not None:
+            params['cursor'] = cursor
+
+        return params
+
+
+    def __payments(self, response, cursor, order):
+        '''
+        Extract the transactions carrying payments to us from a page of
+        payment operations joined with their transactions.
+
+        Args:
+            response: The response to a payment listing request.
+            cursor: The paging token the page started after.
+            order: Either 'asc' or 'desc'.
+
+        Returns:
+            The tuple (records, count, first, last), where records are the
+            Block records of the transactions, count is the number of
+            operations on the page and first and last are the paging tokens
+            of the first and last operation, or None if Horizon does not
+            support the request.
+        '''
+        if response.get('status') in UNSUPPORTED_STATUS:
+            return None
+        operations = Whisperer.__records(response)
+        if any('transaction' not in op for op in operations):
+            return None
+
+        records = []
+        for op in operations:
+            t = op.get('transaction')
+            if op.get('type') != 'payment' or op.get('to') != self.__address or t.get('memo_type') != 'hash':
+                continue
+            # skip the further operations of the same transaction, and the
+            # transaction of a transaction paging token cursor
+            if len(records) > 0 and records[-1].hash == t.get('hash'):
+                continue
+            if order == 'asc' and cursor is not None and int(t.get('paging_token')) <= int(cursor):
+                continue
+            # operation paging tokens keep the cursors between the transactions
+            records.append(Block.FromRecord(t, op.get('paging_token')))
+
+        if len(operations) == 0:
+            return records, 0, None, None
+
+        return records, len(operations), operations[0].get('paging_token'), operations[-1].get('paging_token')
+
+
+    def __page(self, response, cursor, order):
+        '''
+        Extract the records from a page of transactions.
+
+        Args:
+            response: The response to a transaction listing request.
+            cursor: The paging token the page started after.
+            order: Either 'asc' or 'desc'.
+
+        Returns:
+            The tuple (records, count, first, last), see __payments.
+        '''
+        records = [Block.FromRecord(t) for t in Whisperer.__records(response)]
+        if len(records) == 0:
+            return records, 0, None, None
+
+        return records, len(records), records[0].paging_token, records[-1].paging_token
+
+
+    def __fetch(self, cursor, order, limit = PAGE_LIMIT):
+        '''
+        Fetch a page of the transactions that may carry messages to us.
+        Only the payments to us are requested, joined with their
+        transactions. If Horizon does not support this, all the
+        transactions of the account are requested from then on. The
+        other errors (e.g. rate limiting) are raised.
+
+        Args:
+            cursor: The paging token to start after, None for the start
+                    (or end) of the transaction history.
+            order: Either 'asc' or 'desc'.
+            limit: The maximum number of records.
+
+        Returns:
+            The tuple (records, count, first, last), see __payments.
+        '''
+        from stellar_base.exceptions import HorizonError
+
+        if self.__filtered:
+            try:
+                page = self.__payments(self.__horizon.query('/accounts/{}/payments'.format(self.__address),
+                                                            Whisperer.__params(cursor, order, limit)), cursor, order)
+                if page is not None:
+                    return page
+            except AttributeError:
+                pass
+            except HorizonError as e:
+                if e.status_code not in UNSUPPORTED_STATUS:
+                    raise
+            self.__filtered = False
+
+        return self.__page(self.__horizon.account_transactions(self.__address, cursor = cursor,
+                                                               order = order, limit = limit), cursor, order)
+
+
+    async def __fetchAsync(self, cursor, order, limit = PAGE_LIMIT):
+        '''
+        Asynchronous version of __fetch.
+        '''
+        from stellar_base.exceptions import HorizonError
+
+        if self.__filtered:
+            try:
+                page = self.__payments(await self.__horizon.query('/accounts/{}/payments'.format(self.__address),
+                                                                  Whisperer.__params(cursor, order, limit)), cursor, order)
+                if page is not None:
+                    return page
+            except AttributeError:
+                pass
+            except HorizonError as e:
+                if e.status_code not in UNSUPPORTED_STATUS:
+                    raise
+            self.__filtered = False
+
+        return self.__page(await self.__horizon.account_transactions(self.__address, cursor = cursor,
+                                                                     order = order, limit = limit), cursor, order)
+
+
+    def __transactions(self, cursor, order):
+        '''
+        Iterate through the transactions of the account, following the
+        Horizon paging tokens page by page.
+
+        Args:
+            cursor: The paging token to start after, None for the start
+                    (or end) of the transaction history.
+            order: Either 'asc' or 'desc'.
+
+        Returns:
+            Generator of (records, first, last) tuples for the non-empty
+            pages, where first and last are the paging tokens of the first
+            and last item on the page (the records might be filtered).
+        '''
+        while True:
+            with self.__timed('fetch_seconds'):
+                records, count, first, cursor = self.__fetch(cursor, order)
+            self.__count('pages_total')
+            if count > 0:
+                yield records, first, cursor
+
+            if count < PAGE_LIMIT:
+                return
+
+
+    async def __transactionsAsync(self, cursor, order):
+        '''
+        Asynchronous version of __transactions.
+
+        Args:
+            cursor: The paging token to start after, None for the start
+                    (or end) of the transaction history.
+            order: Either 'asc' or 'desc'.
+
+        Returns:
+            Asynchronous generator of (records, first, last) tuples.
+        '''
+        while True:
+            with self.__timed('fetch_seconds'):
+                records, count, first, cursor = await self.__fetchAsync(cursor, order)
+            self.__count('pages_total')
+            if count > 0:
+                yield records, first, cursor
+
+            if count < PAGE_LIMIT:
+                return
+
+
+    def __group(self, records):
+        '''
+        Group the message blocks carried by the transactions by sender,
+        skipping our own transactions and the ones without a hash memo.
+
+        Args:
+            records: List of Block records of the transactions.
+
+        Returns:
+            Dictionary of sender address -> (indices, encrypted, sequences),
+            the lists of the indices of the transactions, the encrypted
+            blocks and the sequence numbers used for the IVs.
+        '''
+        groups = {}
+        for i in range(0, len(records)):
+            t = records[i]
+            if t.sender == self.__address or t.data is None:
+                continue
+            group = groups.setdefault(t.sender, ([], [], []))
+            group[0].append(i)
+            group[1].append(t.data)
+            group[2].append(t.sequence - 1)
+
+        return groups
+
+
+    def __decryptGroup(self, address, encrypted, sequences):
+        '''
+        Decrypt the message blocks of a single sender in one go.
+
+        Args:
+            address: Stellar address of the sender.
+            encrypted: The encrypted blocks.
+            sequences: The sequence numbers of the sending account
+                       preceding the ones of the transactions.
+
+        Returns:
+            List of decrypted blocks.
+        '''
+        # calculate shared secret with the sender
+        k = self.__shared(address)
+
+        # build the IVs from the sequence numbers and decrypt
+        IVs = BuildIVs(self.__pk, sequences)
+        with self.__timed('decrypt_seconds'):
+            decrypted = Whisperer.__decrypt(encrypted, k, IVs)
+        self.__count('blocks_received_total', len(decrypted))
+
+        return decrypted
+
+
+    def __dispatch(self, records, executor):
+        '''
+        Start decrypting the message blocks carried by the transactions,
+        the blocks of each sender being decrypted by a worker thread.
+
+        Args:
+            records: List of Block records of the transactions.
+            executor: The thread pool.
+
+        Returns:
+            List of (indices, future) tuples, one for each sender.
+        '''
+        return [(idx, executor.submit(self.__decryptGroup, address, encrypted, sequences))
+                for address, (idx, encrypted, sequences) in self.__group(records).items()]
+
+
+    @classmethod
+    def __gather(cls, records, tasks):
+        '''
+        Collect the decrypted blocks (see __dispatch).
+
+        Args:
+            records: List of Block records of the transactions.
+            tasks: The (indices, future) tuples of the senders.
+
+        Returns:
+            List of decrypted blocks, one for each transaction (see __blocks).
+        '''
+        blocks = [None] * len(records)
+        for idx, task in tasks:
+            for i, block in zip(idx, task.result()):
+                blocks[i] = block
+
+        if DEBUG:
+            DumpBlocks([b for b in blocks if b is not None])
+
+        return blocks
+
+
+    def __blocks(self, records):
+        '''
+        Decrypt the message blocks carried by the transactions. The blocks
+        are grouped by sender and each group is decrypted in one go.
+
+        Args:
+            records: List of Block records of the transactions.
+
+        Returns:
+            List of decrypted blocks, one for each transaction, None if the
+            transaction does not carry a message block addressed to us.
+        '''
+        blocks = [None] * len(records)
+        for address, (idx, encrypted, sequences) in self.__group(records).items():
+            for i, block in zip(idx, self.__decryptGroup(address, encrypted, sequences)):
+                blocks[i] = block
+
+        if DEBUG:
+            DumpBlocks([b for b in blocks if b is not None])
+
+        return blocks
+
+
+    def __syncPage(self, records, first, last, messages):
+        '''
+        Decrypt a page of transactions received after the last processed
+        paging token, pass the blocks to the reassembler and advance the
+        paging token.
+
+        Args:
+            records: The transaction records in chronological order.
+            first: The paging token of the first item on the page.
+            last: The paging token of the last item on the page.
+            messages: The list collecting the completed messages.
+        '''
+        blocks = self.__blocks(records)
+        with self.__timed('reassemble_seconds'):
+            for t, block in zip(records, blocks):
+                if block is not None:
+                    messages += self.__reassembler.Add(t, block)
+
+        self.__cursor = last
+        if self.__oldest is None:
+            self.__oldest = first
+            edge = records[0].created_at if len(records) > 0 else None
+            messages += self.__reassembler.Window(edge, self.__exhausted)
+
+
+    def __save(self, messages):
+        '''
+        Add the completed messages to the inbox and save the sync state.
+
+        Args:
+            messages: The completed messages.
+
+        Returns:
+            The completed messages.
+        '''
+        with self.__timed('store_seconds'):
+            self.__store.Save(self.__address, messages, self.__cursor, self.__oldest, self.__exhausted,
+                              self.__reassembler.State())
+        if self.__metrics is not None:
+            self.__count('messages_received_total', len(messages))
+            self.__count('bytes_received_total', sum(len(m.payload) for m in messages))
+
+        return messages
+
+
+    def __sync(self):
+        '''
+        Fetch and decrypt the transactions received after the last
+        processed paging token and add the new messages to the inbox.
+
+        Returns:
+            The completed messages.
+        '''
+        messages = []
+        for records, first, last in self.__transactions(self.__cursor, 'asc'):
+            self.__syncPage(records, first, last, messages)
+        return self.__save(messages)
+
+
+    async def __syncAsync(self):
+        '''
+        Asynchronous version of __sync.
+        '''
+        messages = []
+        async for records, first, last in self.__transactionsAsync(self.__cursor, 'asc'):
+            self.__syncPage(records, first, last, messages)
+        return self.__save(messages)
+
+
+    def __backfillStart(self, address, tail, cursor):
+        '''
+        Start walking back through the history.
+
+        Args:
+            address: Stellar address of the sender, None for any.
+            tail: The number of required messages, None for all.
+            cursor: Paging token before which messages are not needed.
+
+        Returns:
+            Dictionary with the scan state, holding the keys 'address',
+            'tail', 'cursor', 'found' and 'messages'.
+        '''
+        return {'address': address, 'tail': tail, 'cursor': cursor, 'messages': [],
+                'found': self.__store.Count(self.__address, address, cursor)}
+
+
+    def __backfillEnough(self, scan):
+        '''
+        Check if the scan back through the history can stop, i.e. if enough
+        messages were found, or the cursor was passed, and no message is
+        waiting for its first blocks.
+
+        Args:
+            scan: The scan state (see __backfillStart).
+
+        Returns:
+            True if the scan can stop, False otherwise.
+        '''
+        cursor = scan['cursor']
+        passed = cursor is not None and self.__oldest is not None and int(self.__oldest) <= int(cursor)
+        enough = scan['tail'] is not None and scan['found'] >= scan['tail']
+        return (enough or passed) and not self.__reassembler.Waiting()
+
+
+    def __backfillPage(self, records, first, last, scan, blocks = None):
+        '''
+        Decrypt a page of earlier transactions, given in reverse chronological
+        order, and pass the blocks to the reassembler.
+
+        Args:
+            records: The transaction records in reverse chronological order.
+            first: The paging token of the first (newest) item on the page.
+            last: The paging token of the last (oldest) item on the page.
+            scan: The scan state (see __backfillStart).
+            blocks: The decrypted blocks if already available (see __blocks).
+
+        Returns:
+            True if the scan can stop, False otherwise.
+        '''
+        messages = []
+        if blocks is None:
+            blocks = self.__blocks(records)
+        with self.__timed('reassemble_seconds'):
+            for t, block in zip(records, blocks):
+                if block is not None:
+                    messages += self.__reassembler.Add(t, block)
+
+        # the newest transaction of the first scan is the initial cursor
+        if self.__cursor is None:
+            self.__cursor = first
+        self.__oldest = last
+        if len(records) > 0:
+            messages += self.__reassembler.Window(records[-1].created_at, False)
+
+        cursor = scan['cursor']
+        for m in messages:
+            if (scan['address'] is None or m.sender == scan['address']) and (cursor is None or int(m.paging_token) > int(cursor)):
+                scan['found'] += 1
+        scan['messages'] += messages
+
+        return self.__backfillEnough(scan)
+
+
+    def __backfillDone(self, scan, exhausted):
+        '''
+        Finish walking back through the history and add the completed
+        messages to the inbox.
+
+        Args:
+            scan: The scan state (see __backfillStart).
+            exhausted: True if the beginning of the history was reached.
+
+        Returns:
+            The completed messages.
+        '''
+        if exhausted:
+            self.__exhausted = True
+            scan['messages'] += self.__reassembler.Window(None, True)
+
+        return self.__save(scan['messages'])
+
+
+    def __position(self):
+        '''
+        Record the current position in the transaction history, by
+        processing only the newest transaction (see __backfillPage).
+        '''
+        with self.__timed('fetch_seconds'):
+            records, count, first, last = self.__fetch(None, 'desc', 1)
+        self.__count('pages_total')
+
+        scan = self.__backfillStart(None, 1, None)
+        if count > 0:
+            self.__backfillPage(records, first, last, scan)
+        self.__backfillDone(scan, count == 0)
+
+
+    async def __positionAsync(self):
+        '''
+        Asynchronous version of __position.
+        '''
+        with self.__timed('fetch_seconds'):
+            records, count, first, last = await self.__fetchAsync(None, 'desc', 1)
+        self.__count('pages_total')
+
+        scan = self.__backfillStart(None, 1, None)
+        if count > 0:
+            self.__backfillPage(records, first, last, scan)
+        self.__backfillDone(scan, count == 0)
+
+
+    @classmethod
+    def __after(cls, messages, cursor):
+        '''
+        Return the messages whose last block was received after the
+        paging token, None for all.
+        '''
+        return [m for m in messages if cursor is None or int(m.paging_token) > int(cursor)]
+
+
+    def __confirm(self, cursor):
+        '''
+        Scan back through the history only as far as needed to confirm
+        the start of the messages waiting in the reassembler.
+
+        Args:
+            cursor: The paging token processed before the new transactions.
+
+        Returns:
+            The messages completed after the cursor.
+        '''
+        if not self.__reassembler.Waiting():
+            return []
+
+        return Whisperer.__after(self.__backfill(None, 0, None), cursor)
+
+
+    async def __confirmAsync(self, cursor):
+        '''
+        Asynchronous version of __confirm.
+        '''
+        if not self.__reassembler.Waiting():
+            return []
+
+        return Whisperer.__after(await self.__backfillAsync(None, 0, None), cursor)
+
+
+    def __backfill(self, address, tail, cursor):
+        '''
+        Walk back through the history before the oldest processed
+        transaction until the inbox holds at least `tail` messages
+        from the given address received after the cursor, or the
+        history is exhausted.
+
+        Args:
+            address: Stellar address of the sender, None for any.
+            tail: The number of required messages.
+            cursor: Paging token before which messages are not needed.
+
+        Returns:
+            The completed messages.
+        '''
+        scan = self.__backfillStart(address, tail, cursor)
+        if self.__cursor is not None and self.__backfillEnough(scan):
+            return []
+
+        for records, first, last in self.__transactions(self.__oldest, 'desc'):
+            if self.__backfillPage(records, first, last, scan):
+                return self.__backfillDone(scan, False)
+        return self.__backfillDone(scan, True)
+
+
+    async def __backfillAsync(self, address, tail, cursor):
+        '''
+        Asynchronous version of __backfill.
+        '''
+        scan = self.__backfillStart(address, tail, cursor)
+        if self.__cursor is not None and self.__backfillEnough(scan):
+            return []
+
+        async for records, first, last in self.__transactionsAsync(self.__oldest, 'desc'):
+            if self.__backfillPage(records, first, last, scan):
+                return self.__backfillDone(scan, False)
+        return self.__backfillDone(scan, True)
+
+
+    def __prefetch(self, pages):
+        '''
+        Iterate through the pages of transactions, fetching up to
+        SCAN_PREFETCH pages ahead in a background thread. The paging
+        tokens chain the pages, so they cannot be requested concurrently,
+        but the requests can overlap with the processing of the pages.
+
+        Args:
+            pages: Generator of pages (see __transactions).
+
+        Returns:
+            Generator of the same pages.
+        '''
+        import queue
+
+        fetched = queue.Queue(SCAN_PREFETCH)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    fetched.put(item, timeout = 0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def fetch():
+            try:
+                for page in pages:
+                    if not put(page):
+                        return
+                put(None)
+            except Exception as e:
+                put(e)
+
+        threading.Thread(target = fetch, daemon = True).start()
+        try:
+            while True:
+                page = fetched.get()
+                if page is None:
+                    return
+                if isinstance(page, Exception):
+                    raise page
+                yield page
+        finally:
+            stop.set()
+
+
+    def __scan(self, address, tail, cursor, workers, stats = None):
+        '''
+        Parallel version of __backfill. The pages are fetched ahead by
+        a background thread (see __prefetch) and the blocks of each sender
+        on a page are decrypted on a thread pool, where the nacl and Crypto
+        calls run without holding the GIL. Up to `workers` pages are being
+        decrypted while the earlier ones are passed to the reassembler, in
+        the original order.
+
+        Args:
+            address: Stellar address of the sender, None for any.
+            tail: The number of required messages, None for all.
+            cursor: Paging token before which messages are not needed.
+            workers: The number of decrypting threads.
+            stats: Dictionary counting the scanned 'pages', 'transactions'
+                   and 'blocks'.
+
+        Returns:
+            The completed messages.
+        '''
+        from concurrent.futures import ThreadPoolExecutor
+        from collections import deque
+
+        stats = stats if stats is not None else {}
+        scan = self.__backfillStart(address, tail, cursor)
+        if self.__cursor is not None and self.__backfillEnough(scan):
+            return []
+
+        def process(page):
+            records, first, last, tasks = page
+            blocks = Whisperer.__gather(records, tasks)
+            stats['pages'] = stats.get('pages', 0) + 1
+            stats['transactions'] = stats.get('transactions', 0) + len(records)
+            stats['blocks'] = stats.get('blocks', 0) + sum(1 for b in blocks if b is not None)
+            return self.__backfillPage(records, first, last, scan, blocks)
+
+        pages = self.__prefetch(self.__transactions(self.__oldest, 'desc'))
+        inflight = deque()
+        with ThreadPoolExecutor(max_workers = workers) as executor:
+            try:
+                for records, first, last in pages:
+                    inflight.append((records, first, last, self.__dispatch(records, executor)))
+                    if len(inflight) > workers and process(inflight.popleft()):
+                        return self.__backfillDone(scan, False)
+                while len(inflight) > 0:
+                    if process(inflight.popleft()):
+                        return self.__backfillDone(scan, False)
+            finally:
+                pages.close()
+                for _, _, _, tasks in inflight:
+                    for _, task in tasks:
+                        task.cancel()
+
+        return self.__backfillDone(scan, True)
+
+
+    def Scan(self, workers = SCAN_WORKERS, address = None, tail = None, cursor = None):
+        '''
+        Scan back through the transaction history in parallel (see Read),
+        e.g. to rebuild the inbox of an account with a long history. The
+        pages are fetched ahead of the decryption, and the blocks of each
+        sender are decrypted on a pool of threads.
+
+        Args:
+            workers: The number of decrypting threads.
+            address: Stellar address of the sender, None for any.
+            tail: Stop once the inbox holds n = `tail` messages from the
+                  sender, None to scan the whole history.
+            cursor: Paging token before which messages are not needed.
+
+        Returns:
+            Dictionary with the number of scanned 'pages', 'transactions'
+            and decrypted 'blocks', the number of completed 'messages', the
+            elapsed 'seconds' and the throughputs 'transactions_per_second'
+            and 'messages_per_second'.
+        '''
+        stats = {'pages': 0, 'transactions': 0, 'blocks': 0}
+        start = time.perf_counter()
+        messages = self.__scan(address, tail, cursor, workers, stats) if not self.__exhausted else []
+        stats['seconds'] = time.perf_counter() - start
+        stats['messages'] = len(messages)
+        stats['transactions_per_second'] = stats['transactions'] / stats['seconds'] if stats['seconds'] > 0 else 0.0
+        stats['messages_per_second'] = stats['messages'] / stats['seconds'] if stats['seconds'] > 0 else 0.0
+
+        return stats
+
+
+    def Cursor(self):
+        '''
+        Return the paging token of the last processed transaction.
+
+        Returns:
+            The paging token, or None if nothing was read yet.
+        '''
+        return self.__cursor
+
+
+    def Read(self, address = None, tail = 1, cursor = None, printable = False, sync = True, workers = None):
+        '''
+        Read the last `tail` received messages. The messages are kept in
+        the local message store, and the network is only consulted to
+        fill the gaps. The function will:
+        - Fetch only the transactions received after the last processed
+          paging token.
+        - If more messages are requested than available in the store,
+          iterate through the earlier received transactions with the hash
+          memo type field populated in the reverse order, page by page,
+          until enough messages are found.
+        - Decrypt the encrypted blocks using the (deterministic) shared
+          secret and IV.
+        - Reassemble the messages per sender: the blocks of a message have
+          consecutive sequence numbers of the sending account, and the
+          block with non-zero length header field marks the end of the
+          message (see Reassembler).
+
+        Args:
+            address: This is the public Stellar address of the sender.
+            tail: Read n = `tail` last messages.
+            cursor: Read only messages received after this paging token.
+            printable: Convert raw messages to printable characters.
+            sync: If False, only the local message store is consulted.
+            workers: Scan back through the history with this many
+                     decrypting threads (see Scan), None to process the
+                     pages one by one.
+
+        Returns:
+            The secret messages as [date, sender, message] lists,
+            starting with the most recent.
+        '''
+
+        if sync:
+            # fetch the new transactions, or scan back on the very first call
+            if self.__cursor is not None or self.__exhausted:
+                self.__sync()
+            if not self.__exhausted:
+                if workers is not None:
+                    self.__scan(address, tail, cursor, workers)
+                else:
+                    self.__backfill(address, tail, cursor)
+
+        return self.__select(address, tail, cursor, printable)
+
+
+    async def ReadAsync(self, address = None, tail = 1, cursor = None, printable = False, sync = True):
+        '''
+        Asynchronous version of Read, requires an asynchronous Horizon
+        client. Must not run concurrently with another Read or ReadAsync
+        call on the same instance.
+
+        Args:
+            address: This is the public Stellar address of the sender.
+            tail: Read n = `tail` last messages.
+            cursor: Read only messages received after this paging token.
+            printable: Convert raw messages to printable characters.
+            sync: If False, only the local message store is consulted.
+
+        Returns:
+            The secret messages as [date, sender, message] lists,
+            starting with the most recent.
+        '''
+
+        if sync:
+            # fetch the new transactions, or scan back on the very first call
+            if self.__cursor is not None or self.__exhausted:
+                await self.__syncAsync()
+            if not self.__exhausted:
+                await self.__backfillAsync(address, tail, cursor)
+
+        return self.__select(address, tail, cursor, printable)
+
+
+    def Fetch(self, printable = False):
+        '''
+        Fetch the messages received since the previous call. The very
+        first call for an account only records the current position in
+        the transaction history, i.e. the newest transaction, and returns
+        no messages. The history before is scanned only as far as needed
+        to confirm the start of the new messages (see Reassembler).
+
+        Args:
+            printable: Convert raw messages to printable characters.
+
+        Returns:
+            The new secret messages as [date, sender, message] lists,
+            in chronological order.
+        '''
+        if self.__cursor is None and not self.__exhausted:
+            self.__position()
+            return []
+
+        cursor = self.__cursor
+        messages = self.__sync()
+        messages += self.__confirm(cursor)
+        with self.__timed('decode_seconds'):
+            return Whisperer.__decodeAll(messages, printable)
+
+
+    async def FetchAsync(self, printable = False):
+        '''
+        Asynchronous version of Fetch, requires an asynchronous Horizon
+        client.
+
+        Args:
+            printable: Convert raw messages to printable characters.
+
+        Returns:
+            The new secret messages as [date, sender, message] lists,
+            in chronological order.
+        '''
+        if self.__cursor is None and not self.__exhausted:
+            await self.__positionAsync()
+            return []
+
+        cursor = self.__cursor
+        messages = await self.__syncAsync()
+        messages += await self.__confirmAsync(cursor)
+        with self.__timed('decode_seconds'):
+            return Whisperer.__decodeAll(messages, printable)
+
+
+    def Listen(self, printable = False):
+        '''
+        Listen for new messages. The generator first yields the messages
+        received since the last processed transaction (see Fetch), then
+        subscribes to the transaction stream of the account (server-sent
+        events) and yields each message as soon as its last block arrives.
+        The stream is resumed from the last processed paging token if the
+        connection breaks. The partially received messages are kept across
+        events (and in the message store).
+
+        Args:
+            printable: Convert raw messages to printable characters.
+
+        Returns:
+            Generator of the new secret messages as [date, sender, message]
+            lists, in chronological order.
+        '''
+        for message in self.Fetch(printable):
+            yield message
+
+        while True:
+            try:
+                events = self.__horizon.account_transactions(self.__address, cursor = self.__cursor or 'now', sse = True)
+                for event in events:
+                    for message in self.__receive(event, printable):
+                        yield message
+            except Exception as e:
+                print('\nError: transaction stream broken ({}), reconnecting...'.format(e))
+
+            time.sleep(LISTEN_RETRY)
+
+
+    def __receive(self, event, printable):
+        '''
+        Process a single event of the transaction stream.
+
+        Args:
+            event: The server-sent event carrying a transaction record.
+            printable: Convert raw messages to printable characters.
+
+        Returns:
+            List of the messages completed by the transaction.
+        '''
+        try:
+            t = json.loads(event.data)
+        except (AttributeError, ValueError):
+            return []
+
+        # skip the stream greetings and replayed transactions
+        if not isinstance(t, dict) or t.get('paging_token') is None:
+            return []
+        if self.__cursor is not None and int(t.get('paging_token')) <= int(self.__cursor):
+            return []
+
+        cursor = self.__cursor
+        messages = []
+        self.__syncPage([Block.FromRecord(t)], t.get('paging_token'), t.get('paging_token'), messages)
+        self.__save(messages)
+        messages += self.__confirm(cursor)
+        with self.__timed('decode_seconds'):
+            return Whisperer.__decodeAll(messages, printable)
+
+
+    def Address(self):
+        '''
+        Return the Stellar address of the account.
+
+        Returns:
+            The public address starting with letter 'G'.
+        '''
+        return self.__address
+
+
+    def __select(self, address, tail, cursor, printable):
+        '''
+        Select and decode the last `tail` messages from the inbox.
+
+        Args:
+            address: This is the public Stellar address of the sender.
+            tail: Select n = `tail` last messages, None for all.
+            cursor: Select only messages received after this paging token.
+            printable: Convert raw messages to printable characters.
+
+        Returns:
+            The secret messages as [date, sender, message] lists,
+            starting with the most recent.
+        '''
+        # select the messages using the store index
+        messages = self.__store.Messages(self.__address, address, tail, cursor) if tail is None or tail > 0 else []
+
+        if DEBUG:
+            print([m.encoding for m in messages])
+
+        # decode the messages
+        with self.__timed('decode_seconds'):
+            return Whisperer.__decodeMessages(messages, printable)
+
+
+    @classmethod
+    def __decodeAll(cls, messages, printable):
+        '''
+        Decode the newly completed messages.
+
+        Args:
+            messages: The completed messages (Message records).
+            printable: Convert raw messages to printable characters.
+
+        Returns:
+            The secret messages as [date, sender, message] lists,
+            in chronological order.
+        '''
+        return Whisperer.__decodeMessages(sorted(messages, key = lambda m: int(m.paging_token)), printable)
+
+
+    @classmethod
+    def __decodeMessages(cls, messages, printable):
+        '''
+        Decode the messages, the messages with the same encoding are
+        decoded together.
+
+        Args:
+            messages: The messages (Message records).
+            printable: Convert raw messages to printable characters.
+
+        Returns:
+            The secret messages as [date, sender, message] lists.
+        '''
+        groups = {}
+        for i in range(0, len(messages)):
+            groups.setdefault(messages[i].encoding, []).append(i)
+
+        decoded = [None] * len(messages)
+        for enc, idx in groups.items():
+            for i, msg in zip(idx, Whisperer.__decodeMany([messages[i].payload for i in idx], enc, printable)):
+                decoded[i] = msg
+
+        return [[m.date, m.sender, msg] for m, msg in zip(messages, decoded)]
+
+
+    @classmethod
+    def ValidateAddress(cls, address):
+        '''
+        Validate the given Stellar address.
+
+        Args:
+            address: The public address of a Stellar account.
+
+        Return:
+            True if public address is valid, False otherwise.
+        '''
+        from stellar_base.utils import decode_check
+
+        try:
+            decode_check('account', address)
+            return True
+        except:
+            return False
 
 
     @classmethod
@@ -524,4 +2520,6 @@ class Whisperer:
         Return:
             True if the secret key is valid, False otherwise.
         '''
+        from stellar_base.utils import decode_check
+
         return decode_check('seed', seed)